@@ -1,104 +1,144 @@
 
 import tkinter as tk
 from tkinter import messagebox, ttk
-import hashlib
-import json
+import io
 import os
-import uuid
-from datetime import datetime, timedelta
-from PIL import Image, ImageTk
-import requests
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import BackgroundCache, ResponsiveBackground
+from catalog import available_of, copies_of
+from config import CRAWL_QUERIES, DATA_DIR, OVERDUE_CHECK_SECONDS, ROW_THUMBNAIL_SIZE, SCREEN_LATENCY_LOG
+from live_query import LiveQuery
+from metrics import PROFILER, MetricsDumper, timer
+from router import ScreenRouter
+from service import BOOK_SORT_FIELDS, BORROW_SORT_FIELDS, ServiceError, open_service
+from shards import ShardedService
+from thumbnails import ThumbnailLoader
+from virtual_table import PagedSource, VirtualTable
 
-
-try:
-    import matplotlib.pyplot as plt
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-
-DATA_FILE = "data/books.json"
-USER_FILE = "data/users.json"
-BORROW_FILE = "data/borrows.json"
 BG_IMAGE = "bg3.jpg"  # Hình nền mới
-STATS_IMAGE = "data/stats.png"
-
-os.makedirs("data", exist_ok=True)
+BOOK_THUMBNAIL_KEYS = 2048  # Số sách nhớ khóa ảnh bìa gần nhất (các dòng vừa hiện trên bảng)
+SHOWN_FACETS = 6  # Số thể loại nhiều kết quả nhất hiện dưới ô tìm kiếm
 
-def hash_password(pw):
-    return hashlib.md5(pw.encode()).hexdigest()
+os.makedirs(DATA_DIR, exist_ok=True)
 
 class LibraryApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Hệ Thống Quản Lý Thư Viện")
         self.root.geometry("800x600")
+        self.background = ResponsiveBackground(self.root, BackgroundCache(BG_IMAGE))
         self.user_role = None
         self.username = None
-        self.books = []
-        self.borrows = []
-        self.load_data()
+        # Nạp dữ liệu ở luồng nền để màn hình đăng nhập hiện ngay; chỉ chờ khi lần đầu cần đến self.service
+        loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="library-loader")
+        self.service_future = loader.submit(open_service)
+        loader.shutdown(wait=False)
+        self.crawl_events = None
+        self.http_cache = None
+        self.overdue_seq = None
+        self.setup_styles()
+        self.router = ScreenRouter(self.root, log=SCREEN_LATENCY_LOG)
+        # Số liệu thời gian ghi ra LIBRARY_METRICS_FILE (nếu đặt); Ctrl+F12 bật/tắt đo cProfile
+        self.metrics_dumper = MetricsDumper().start()
+        PROFILER.start_from_config()
+        self.root.bind("<Control-F12>", self.toggle_profile)
+        self.welcome_labels = {}
+        # Tìm khi đang gõ: truy vấn chạy ở luồng nền, chỉ lấy trang đầu, kết quả cũ bị bỏ
+        self.live_search = LiveQuery(self.root, self.run_search, self.show_search_results,
+                                     self.show_search_error, name="live-search")
+        # Phân tích lịch sử mượn và vẽ biểu đồ ở luồng nền (có thể mất vài giây với hàng triệu lượt mượn)
+        self.analytics_query = LiveQuery(self.root, self.run_analytics, self.show_analytics,
+                                         self.show_analytics_error, name="analytics")
+        # Ảnh bìa nhỏ chỉ nạp cho các dòng sách đang hiện; book_row ghi lại mã ảnh của từng sách
+        self.thumbnail_loader = ThumbnailLoader(self.root, self.fetch_thumbnail, self.refresh_thumbnails)
+        self.book_thumbnails = OrderedDict()
+        self.register_screens()
         self.login_screen()
-
-    def load_data(self):
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                self.books = json.load(f)
-        else:
-            self.books = []
-        
-        if os.path.exists(BORROW_FILE):
-            with open(BORROW_FILE, "r", encoding="utf-8") as f:
-                self.borrows = json.load(f)
-        else:
-            self.borrows = []
-
-    def save_data(self):
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.books, f, indent=4)
-        with open(BORROW_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.borrows, f, indent=4)
-
-    def crawl_books(self):
+        # Giải mã ảnh nền (và nhập PIL) sau khi khung đăng nhập đã vẽ
+        self.root.after_idle(self.set_background)
+
+    @property
+    def service(self):
+        if not self.service_future.done():
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            try:
+                self.service_future.result()
+            finally:
+                self.root.config(cursor="")
+        return self.service_future.result()
+
+    def crawl_books(self, queries=CRAWL_QUERIES):
+        # Tải ở luồng nền; sách mới được thêm vào catalog trên luồng Tk trong poll_crawl
+        from http_cache import HttpCache
+        from ingest import BookIngestor
+
+        if self.http_cache is None:
+            self.http_cache = HttpCache()
+        self.crawl_events = BookIngestor(cache=self.http_cache).start(queries)
+        self.crawl_added = 0
+        self.crawl_errors = []
+        self.root.after(100, self.poll_crawl)
+
+    def poll_crawl(self):
         try:
-            response = requests.get("https://www.googleapis.com/books/v1/volumes?q=python+programming")
-            data = response.json()
-            items = data.get("items", [])
-            
-            for item in items[:5]:
-                volume_info = item.get("volumeInfo", {})
-                title = volume_info.get("title", "Tiêu Đề Không Xác Định")
-                authors = volume_info.get("authors", ["Tác Giả Không Xác Định"])
-                category = volume_info.get("categories", ["Chung"])[0]
-                
-                if not any(book["title"] == title for book in self.books):
-                    self.books.append({
-                        "id": str(uuid.uuid4()),
-                        "title": title,
-                        "author": ", ".join(authors),
-                        "category": category,
-                        "status": "available"
-                    })
-            self.save_data()
-            return True
-        except Exception as e:
-            print(f"Lỗi thu thập dữ liệu: {e}")
-            return False
-
-    def login_screen(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
-
-        self.set_background()
-
-        login_frame = ttk.Frame(self.root, padding=20, style="Login.TFrame")
-        login_frame.place(relx=0.5, rely=0.5, anchor="center", width=400, height=400)
-
+            while True:
+                kind, payload = self.crawl_events.get_nowait()
+                if kind == "books":
+                    self.crawl_added += self.service.import_books(payload)
+                elif kind == "progress":
+                    self.root.title("Hệ Thống Quản Lý Thư Viện - Đang thu thập %d/%d trang" % payload)
+                elif kind == "error":
+                    print(f"Lỗi thu thập dữ liệu: {payload}")
+                    self.crawl_errors.append(payload)
+                elif kind == "done":
+                    self.crawl_events = None
+                    self.root.title("Hệ Thống Quản Lý Thư Viện")
+                    stats = self.http_cache.stats()
+                    if self.crawl_added or not self.crawl_errors:
+                        messagebox.showinfo("Thành Công", f"Đã thu thập và thêm {self.crawl_added} sách.\n"
+                                            f"Bộ đệm: {stats['hits'] + stats['revalidated']} trúng, {stats['misses']} tải mới.")
+                    else:
+                        messagebox.showerror("Lỗi", "Không thể thu thập sách.")
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(100, self.poll_crawl)
+
+    def setup_styles(self):
         style = ttk.Style()
         style.configure("Login.TFrame", background="white")
         style.configure("TLabel", font=("Arial", 12))
         style.configure("TButton", font=("Arial", 11))
         style.configure("TEntry", padding=5)
 
+    def register_screens(self):
+        self.router.register("login", self.build_login_screen, on_show=self.show_login_screen, width=400, height=400)
+        self.router.register("register", self.build_register_screen, on_show=self.show_register_screen, width=400, height=500)
+        for role in ("admin", "thuthu", "docgia"):
+            self.router.register(f"main_{role}", lambda role=role: self.build_main_screen(role),
+                                 on_show=lambda role=role: self.show_main_screen(role), width=400, height=400)
+        self.router.register("manage_books", self.build_manage_books, on_show=self.update_book_list, width=600, height=580)
+        self.router.register("search_books", self.build_search_books_screen, on_show=self.show_search_books_screen,
+                             on_hide=self.hide_search_books_screen, width=600, height=580)
+        self.router.register("manage_borrows", self.build_manage_borrows, on_show=self.update_borrow_list, width=600, height=400)
+        self.router.register("my_borrows", self.build_my_borrows, on_show=self.update_my_borrows, width=600, height=400)
+        self.router.register("stats", self.build_stats_screen, on_show=self.update_stats,
+                             on_hide=lambda: self.analytics_query.cancel(), width=680, height=580)
+
+    def login_screen(self):
+        self.router.show("login")
+
+    def show_login_screen(self):
+        self.username_entry.delete(0, "end")
+        self.password_entry.delete(0, "end")
+
+    def build_login_screen(self):
+        login_frame = ttk.Frame(self.root, padding=20, style="Login.TFrame")
+
         # Căn chỉnh lưới
         login_frame.grid_columnconfigure(0, weight=1)
         login_frame.grid_columnconfigure(1, weight=1)
@@ -119,22 +159,27 @@ class LibraryApp:
         ttk.Button(login_frame, text="Đăng Nhập", command=self.login).grid(row=4, column=0, columnspan=2, pady=10)
         ttk.Button(login_frame, text="Đăng Ký", command=self.register_screen).grid(row=5, column=0, columnspan=2, pady=10)
         ttk.Button(login_frame, text="Thu Thập Sách", command=self.crawl_and_update).grid(row=6, column=0, columnspan=2, pady=10)
+        return login_frame
 
     def set_background(self):
-        try:
-            bg = Image.open(BG_IMAGE)
-            bg = bg.resize((800, 600), Image.LANCZOS)
-            self.bg_image = ImageTk.PhotoImage(bg)
-            self.canvas = tk.Canvas(self.root, width=800, height=600)
-            self.canvas.pack(fill="both", expand=True)
-            self.canvas.create_image(0, 0, image=self.bg_image, anchor="nw")
-        except:
-            self.canvas = tk.Canvas(self.root, width=800, height=600)
-            self.canvas.pack(fill="both", expand=True)
-            for i in range(600):
-                blue = int(255 * (i / 600))
-                color = f"#{0:02x}{0:02x}{blue:02x}"
-                self.canvas.create_line(0, i, 800, i, fill=color)
+        with timer("screen.background"):
+            self.canvas = self.background.show()
+
+    def toggle_profile(self, event=None):
+        files = PROFILER.toggle()
+        if files:
+            messagebox.showinfo("Đo Hiệu Năng", "Đã ghi:\n" + "\n".join(files))
+        else:
+            messagebox.showinfo("Đo Hiệu Năng", "Đang đo cProfile, nhấn Ctrl+F12 lần nữa để dừng và ghi file.")
+
+    def close(self):
+        self.live_search.close()
+        self.analytics_query.close()
+        self.thumbnail_loader.close()
+        self.service.close()
+        self.metrics_dumper.stop()
+        if PROFILER.active:
+            PROFILER.stop()
 
     def toggle_password(self):
         if self.show_password_var.get():
@@ -143,18 +188,21 @@ class LibraryApp:
             self.password_entry.config(show="*")
 
     def crawl_and_update(self):
-        if self.crawl_books():
-            messagebox.showinfo("Thành Công", "Đã thu thập và thêm sách thành công.")
-        else:
-            messagebox.showerror("Lỗi", "Không thể thu thập sách.")
+        if self.crawl_events is not None:
+            messagebox.showinfo("Đang Thu Thập", "Đang thu thập sách, vui lòng đợi.")
+            return
+        self.crawl_books()
 
     def register_screen(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        self.router.show("register")
 
-        self.set_background()
+    def show_register_screen(self):
+        for var in (self.reg_username, self.reg_password, self.reg_name, self.reg_phone, self.reg_email, self.reg_address):
+            var.set("")
+        self.reg_role.set("docgia")
+
+    def build_register_screen(self):
         reg_frame = ttk.Frame(self.root, padding=20, style="Login.TFrame")
-        reg_frame.place(relx=0.5, rely=0.5, anchor="center", width=400, height=500)
 
         reg_frame.grid_columnconfigure(0, weight=1)
         reg_frame.grid_columnconfigure(1, weight=1)
@@ -186,10 +234,11 @@ class LibraryApp:
 
         ttk.Button(reg_frame, text="Đăng Ký", command=self.register).grid(row=len(fields)+1, column=0, columnspan=2, pady=10)
         ttk.Button(reg_frame, text="Quay Lại", command=self.login_screen).grid(row=len(fields)+2, column=0, columnspan=2, pady=10)
+        return reg_frame
 
     def register(self):
         username = self.reg_username.get()
-        password = hash_password(self.reg_password.get())
+        password = self.reg_password.get()
         name = self.reg_name.get()
         phone = self.reg_phone.get()
         email = self.reg_email.get()
@@ -200,99 +249,97 @@ class LibraryApp:
             messagebox.showwarning("Thiếu Thông Tin", "Vui lòng điền đầy đủ tất cả các trường.")
             return
 
-        users = []
-        if os.path.exists(USER_FILE):
-            with open(USER_FILE, "r", encoding="utf-8") as f:
-                users = json.load(f)
-
-        for user in users:
-            if user["username"] == username:
-                messagebox.showwarning("Lỗi", "Tên đăng nhập đã tồn tại.")
-                return
-
-        users.append({
-            "username": username,
-            "password": password,
-            "role": role,
-            "name": name,
-            "phone": phone,
-            "email": email,
-            "address": address
-        })
-
-        with open(USER_FILE, "w", encoding="utf-8") as f:
-            json.dump(users, f, indent=4)
+        try:
+            self.service.register(username, password, role, name, phone, email, address)
+        except ServiceError as e:
+            messagebox.showwarning("Lỗi", e.message)
+            return
 
         messagebox.showinfo("Thành Công", "Đăng ký thành công. Vui lòng đăng nhập.")
         self.login_screen()
 
     def login(self):
         username = self.username_entry.get()
-        password = hash_password(self.password_entry.get())
+        password = self.password_entry.get()
 
-        if not os.path.exists(USER_FILE):
+        if not self.service.has_users():
             messagebox.showerror("Lỗi", "Không có dữ liệu người dùng.")
             return
 
-        with open(USER_FILE, "r", encoding="utf-8") as f:
-            users = json.load(f)
-
-        for user in users:
-            if user["username"] == username and user["password"] == password:
-                self.user_role = user["role"]
-                self.username = username
-                self.main_screen()
-                return
+        try:
+            user = self.service.login(username, password)
+        except ServiceError as e:
+            messagebox.showerror("Lỗi", e.message)
+            return
 
-        messagebox.showerror("Lỗi", "Tên đăng nhập hoặc mật khẩu không đúng.")
+        self.user_role = user["role"]
+        self.username = username
+        # Quầy chi nhánh chỉ nạp kho của mình; quản trị viên xem toàn hệ thống, các kho còn lại nạp song song ở nền
+        if isinstance(self.service, ShardedService):
+            self.service.set_global_view(self.user_role == "admin")
+        if self.user_role in ("admin", "thuthu") and self.overdue_seq is None:
+            self.overdue_seq = 0
+            self.poll_overdue()
+        self.main_screen()
+
+    def poll_overdue(self):
+        # Bộ lập lịch của dịch vụ gom lượt mượn vừa quá hạn; thủ thư thấy số lượng trên thanh tiêu đề
+        if self.user_role in ("admin", "thuthu"):
+            try:
+                notices = self.service.overdue_notices(self.overdue_seq)
+            except ServiceError:
+                notices = None
+            if notices and notices["items"] and self.crawl_events is None:
+                self.root.title(f"Hệ Thống Quản Lý Thư Viện - {len(notices['items'])} lượt mượn mới quá hạn")
+            if notices:
+                self.overdue_seq = notices["seq"]
+        self.root.after(OVERDUE_CHECK_SECONDS * 1000, self.poll_overdue)
 
     def main_screen(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        self.router.show(f"main_{self.user_role}")
+
+    def show_main_screen(self, role):
+        self.welcome_labels[role].config(text=f"Chào mừng, {self.username} ({role})")
 
-        self.set_background()
+    def build_main_screen(self, role):
         main_frame = ttk.Frame(self.root, padding=20, style="Login.TFrame")
-        main_frame.place(relx=0.5, rely=0.5, anchor="center", width=400, height=400)
 
         main_frame.grid_columnconfigure(0, weight=1)
         main_frame.grid_columnconfigure(1, weight=1)
         main_frame.grid_rowconfigure(tuple(range(6)), weight=1)
 
-        ttk.Label(main_frame, text=f"Chào mừng, {self.username} ({self.user_role})", font=("Arial", 16, "bold")).grid(row=0, column=0, columnspan=2, pady=10)
+        self.welcome_labels[role] = ttk.Label(main_frame, font=("Arial", 16, "bold"))
+        self.welcome_labels[role].grid(row=0, column=0, columnspan=2, pady=10)
 
-        if self.user_role == "admin":
+        if role == "admin":
             ttk.Label(main_frame, text="(Quản lý toàn bộ hệ thống)").grid(row=1, column=0, columnspan=2, pady=10)
             ttk.Button(main_frame, text="Quản Lý Sách", command=self.manage_books).grid(row=2, column=0, columnspan=2, pady=10)
             ttk.Button(main_frame, text="Thống Kê Sách", command=self.stats_screen).grid(row=3, column=0, columnspan=2, pady=10)
             ttk.Button(main_frame, text="Quản Lý Mượn Sách", command=self.manage_borrows).grid(row=4, column=0, columnspan=2, pady=10)
-        elif self.user_role == "thuthu":
+        elif role == "thuthu":
             ttk.Label(main_frame, text="(Quản lý sách và mượn sách)").grid(row=1, column=0, columnspan=2, pady=10)
             ttk.Button(main_frame, text="Quản Lý Sách", command=self.manage_books).grid(row=2, column=0, columnspan=2, pady=10)
             ttk.Button(main_frame, text="Quản Lý Mượn Sách", command=self.manage_borrows).grid(row=3, column=0, columnspan=2, pady=10)
-        elif self.user_role == "docgia":
+        elif role == "docgia":
             ttk.Label(main_frame, text="(Tìm kiếm và mượn sách)").grid(row=1, column=0, columnspan=2, pady=10)
             ttk.Button(main_frame, text="Tìm Kiếm Sách", command=self.search_books_screen).grid(row=2, column=0, columnspan=2, pady=10)
             ttk.Button(main_frame, text="Sách Đang Mượn", command=self.my_borrows).grid(row=3, column=0, columnspan=2, pady=10)
 
         ttk.Button(main_frame, text="Đăng Xuất", command=self.login_screen).grid(row=5, column=0, columnspan=2, pady=10)
+        return main_frame
 
     def manage_books(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        self.router.show("manage_books")
 
-        self.set_background()
+    def build_manage_books(self):
         book_frame = ttk.Frame(self.root, padding=20)
-        book_frame.place(relx=0.5, rely=0.5, anchor="center", width=600, height=500)
 
         book_frame.grid_columnconfigure(0, weight=1)
         book_frame.grid_columnconfigure(1, weight=1)
-        book_frame.grid_rowconfigure(tuple(range(6)), weight=1)
+        book_frame.grid_rowconfigure(tuple(range(8)), weight=1)
 
         columns = ("ID", "Tiêu Đề", "Tác Giả", "Thể Loại", "Trạng Thái")
-        self.tree = ttk.Treeview(book_frame, columns=columns, show="headings")
-        for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=120)
+        self.tree = VirtualTable(book_frame, columns, image=self.book_thumbnail, row_height=ROW_THUMBNAIL_SIZE[1] + 4)
         self.tree.grid(row=0, column=0, columnspan=2, pady=10)
 
         ttk.Label(book_frame, text="Tiêu Đề").grid(row=1, column=0, pady=10, sticky="e")
@@ -307,12 +354,16 @@ class LibraryApp:
         self.book_category = tk.StringVar()
         ttk.Entry(book_frame, textvariable=self.book_category).grid(row=3, column=1, pady=10, sticky="w")
 
-        ttk.Button(book_frame, text="Thêm Sách", command=self.add_book).grid(row=4, column=0, pady=10)
-        ttk.Button(book_frame, text="Sửa Sách", command=self.edit_book).grid(row=4, column=1, pady=10)
-        ttk.Button(book_frame, text="Xóa Sách", command=self.delete_book).grid(row=5, column=0, pady=10)
-        ttk.Button(book_frame, text="Quay Lại", command=self.main_screen).grid(row=5, column=1, pady=10)
+        ttk.Label(book_frame, text="Số Bản").grid(row=4, column=0, pady=10, sticky="e")
+        self.book_copies = tk.StringVar(value="1")
+        ttk.Entry(book_frame, textvariable=self.book_copies).grid(row=4, column=1, pady=10, sticky="w")
 
-        self.update_book_list()
+        ttk.Button(book_frame, text="Thêm Sách", command=self.add_book).grid(row=5, column=0, pady=10)
+        ttk.Button(book_frame, text="Sửa Sách", command=self.edit_book).grid(row=5, column=1, pady=10)
+        ttk.Button(book_frame, text="Xóa Sách", command=self.delete_book).grid(row=6, column=0, pady=10)
+        ttk.Button(book_frame, text="Thêm Bản Sao", command=self.add_copies).grid(row=6, column=1, pady=10)
+        ttk.Button(book_frame, text="Quay Lại", command=self.main_screen).grid(row=7, column=0, columnspan=2, pady=10)
+        return book_frame
 
     def add_book(self):
         title = self.book_title.get()
@@ -323,28 +374,41 @@ class LibraryApp:
             messagebox.showwarning("Thiếu Thông Tin", "Vui lòng điền đầy đủ tất cả các trường.")
             return
 
-        book = {
-            "id": str(uuid.uuid4()),
-            "title": title,
-            "author": author,
-            "category": category,
-            "status": "available"
-        }
-        self.books.append(book)
-        self.save_data()
-        self.update_book_list()
+        try:
+            self.service.add_book(title, author, category, self.book_copies.get())
+        except ServiceError as e:
+            messagebox.showwarning("Lỗi", e.message)
+            return
+
+        self.tree.refresh()
         self.book_title.set("")
         self.book_author.set("")
         self.book_category.set("")
+        self.book_copies.set("1")
         messagebox.showinfo("Thành Công", "Đã thêm sách thành công.")
 
+    def add_copies(self):
+        book_id = self.tree.selected_key()
+        if book_id is None:
+            messagebox.showwarning("Chưa Chọn", "Vui lòng chọn một cuốn sách để thêm bản sao.")
+            return
+
+        try:
+            self.service.add_copies(book_id, self.book_copies.get())
+        except ServiceError as e:
+            messagebox.showwarning("Lỗi", e.message)
+            return
+
+        self.tree.refresh_rows([book_id])
+        self.book_copies.set("1")
+        messagebox.showinfo("Thành Công", "Đã thêm bản sao thành công.")
+
     def edit_book(self):
-        selected = self.tree.selection()
-        if not selected:
+        book_id = self.tree.selected_key()
+        if book_id is None:
             messagebox.showwarning("Chưa Chọn", "Vui lòng chọn một cuốn sách để sửa.")
             return
 
-        book_id = self.tree.item(selected)["values"][0]
         title = self.book_title.get()
         author = self.book_author.get()
         category = self.book_category.get()
@@ -353,265 +417,381 @@ class LibraryApp:
             messagebox.showwarning("Thiếu Thông Tin", "Vui lòng điền đầy đủ tất cả các trường.")
             return
 
-        for book in self.books:
-            if book["id"] == book_id:
-                book["title"] = title
-                book["author"] = author
-                book["category"] = category
-                break
+        try:
+            self.service.edit_book(book_id, title, author, category)
+        except ServiceError as e:
+            messagebox.showwarning("Lỗi", e.message)
+            return
 
-        self.save_data()
-        self.update_book_list()
+        self.tree.refresh_rows([book_id])
         self.book_title.set("")
         self.book_author.set("")
         self.book_category.set("")
         messagebox.showinfo("Thành Công", "Đã cập nhật sách thành công.")
 
     def delete_book(self):
-        selected = self.tree.selection()
-        if not selected:
+        book_id = self.tree.selected_key()
+        if book_id is None:
             messagebox.showwarning("Chưa Chọn", "Vui lòng chọn một cuốn sách để xóa.")
             return
 
-        book_id = self.tree.item(selected)["values"][0]
-        if any(borrow["book_id"] == book_id and not borrow["returned"] for borrow in self.borrows):
-            messagebox.showwarning("Lỗi", "Không thể xóa sách đang được mượn.")
+        try:
+            self.service.delete_book(book_id)
+        except ServiceError as e:
+            messagebox.showwarning("Lỗi", e.message)
             return
 
-        self.books = [book for book in self.books if book["id"] != book_id]
-        self.save_data()
-        self.update_book_list()
+        self.tree.refresh()
         messagebox.showinfo("Thành Công", "Đã xóa sách thành công.")
 
     def update_book_list(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        for book in self.books:
-            status = "Có Sẵn" if book["status"] == "available" else "Đang Mượn"
-            self.tree.insert("", "end", values=(book["id"], book["title"], book["author"], book["category"], status))
+        self.service.refresh()
+        self.tree.set_source(PagedSource(self.service.list_books, self.service.get_book, self.book_row, BOOK_SORT_FIELDS))
+
+    def book_thumbnail(self, book_id):
+        if book_id not in self.book_thumbnails:
+            return None
+        self.book_thumbnails.move_to_end(book_id)
+        return self.thumbnail_loader.photo(self.book_thumbnails[book_id])
+
+    def fetch_thumbnail(self, key):
+        # Chạy ở luồng nạp ảnh; sách chưa có ảnh trong kho thì bỏ qua
+        try:
+            return self.service_future.result().thumbnail(key)
+        except ServiceError:
+            return None
+
+    def refresh_thumbnails(self):
+        if self.router.current == "manage_books":
+            self.tree.render()
+        elif self.router.current == "search_books":
+            self.search_tree.render()
+
+    def book_row(self, book):
+        self.book_thumbnails[book["id"]] = book.get("thumbnail")
+        self.book_thumbnails.move_to_end(book["id"])
+        if len(self.book_thumbnails) > BOOK_THUMBNAIL_KEYS:
+            self.book_thumbnails.popitem(last=False)
+        status = "Có Sẵn" if book["status"] == "available" else "Đang Mượn"
+        status += f" ({available_of(book)}/{len(copies_of(book))})"
+        if book.get("reservations"):
+            status += f", {len(book['reservations'])} đặt trước"
+        return (book["id"], book["title"], book["author"], book["category"], status)
 
     def search_books_screen(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        self.router.show("search_books")
+
+    def show_search_books_screen(self):
+        self.update_search_categories()
+        self.search_books()
+
+    def hide_search_books_screen(self):
+        self.live_search.cancel()
 
-        self.set_background()
+    def update_search_categories(self):
+        # Danh sách thể loại lấy từ chỉ mục tìm kiếm, cập nhật mỗi lần mở danh sách thả xuống
+        self.search_category_box.config(values=self.service.categories() + ["Tất Cả"])
+
+    def build_search_books_screen(self):
         search_frame = ttk.Frame(self.root, padding=20)
-        search_frame.place(relx=0.5, rely=0.5, anchor="center", width=600, height=500)
 
         search_frame.grid_columnconfigure(0, weight=1)
         search_frame.grid_columnconfigure(1, weight=1)
-        search_frame.grid_rowconfigure(tuple(range(6)), weight=1)
+        search_frame.grid_rowconfigure(tuple(range(7)), weight=1)
 
         ttk.Label(search_frame, text="Tìm Kiếm Sách").grid(row=0, column=0, columnspan=2, pady=10)
         ttk.Label(search_frame, text="Từ Khóa").grid(row=1, column=0, pady=10, sticky="e")
         self.search_term = tk.StringVar()
-        ttk.Entry(search_frame, textvariable=self.search_term).grid(row=1, column=1, pady=10, sticky="w")
+        self.search_term.trace_add("write", lambda *args: self.search_books_live())
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_term)
+        search_entry.grid(row=1, column=1, pady=10, sticky="w")
+        search_entry.bind("<Return>", lambda event: self.search_books())
 
         ttk.Label(search_frame, text="Thể Loại").grid(row=2, column=0, pady=10, sticky="e")
         self.search_category = tk.StringVar()
-        categories = list(set(book["category"] for book in self.books)) + ["Tất Cả"]
-        ttk.Combobox(search_frame, textvariable=self.search_category, values=categories).grid(row=2, column=1, pady=10, sticky="w")
+        self.search_category.trace_add("write", lambda *args: self.search_books_live())
+        self.search_category_box = ttk.Combobox(search_frame, textvariable=self.search_category,
+                                                postcommand=self.update_search_categories)
+        self.search_category_box.grid(row=2, column=1, pady=10, sticky="w")
 
         columns = ("ID", "Tiêu Đề", "Tác Giả", "Thể Loại", "Trạng Thái")
-        self.search_tree = ttk.Treeview(search_frame, columns=columns, show="headings")
-        for col in columns:
-            self.search_tree.heading(col, text=col)
-            self.search_tree.column(col, width=120)
+        self.search_tree = VirtualTable(search_frame, columns, image=self.book_thumbnail,
+                                        row_height=ROW_THUMBNAIL_SIZE[1] + 4)
         self.search_tree.grid(row=3, column=0, columnspan=2, pady=10)
 
         ttk.Button(search_frame, text="Tìm Kiếm", command=self.search_books).grid(row=4, column=0, pady=10)
         ttk.Button(search_frame, text="Mượn Sách", command=self.borrow_book).grid(row=4, column=1, pady=10)
-        ttk.Button(search_frame, text="Quay Lại", command=self.main_screen).grid(row=5, column=0, columnspan=2, pady=10)
-
-        self.search_books()
+        ttk.Button(search_frame, text="Đặt Trước", command=self.reserve_book).grid(row=5, column=0, pady=10)
+        ttk.Button(search_frame, text="Quay Lại", command=self.main_screen).grid(row=5, column=1, pady=10)
+        self.search_facets = ttk.Label(search_frame, wraplength=540)
+        self.search_facets.grid(row=6, column=0, columnspan=2, pady=5)
+        return search_frame
 
-    def search_books(self):
-        term = self.search_term.get().lower()
+    def search_query(self):
         category = self.search_category.get()
+        return self.search_term.get(), None if category == "Tất Cả" else category
 
-        for item in self.search_tree.get_children():
-            self.search_tree.delete(item)
-
-        for book in self.books:
-            if (not term or term in book["title"].lower() or term in book["author"].lower()) and \
-               (category == "Tất Cả" or not category or book["category"] == category):
-                status = "Có Sẵn" if book["status"] == "available" else "Đang Mượn"
-                self.search_tree.insert("", "end", values=(book["id"], book["title"], book["author"], book["category"], status))
+    def search_books(self):
+        # Nút "Tìm Kiếm", Enter và lúc mở màn hình: đọc thay đổi từ quầy khác rồi tìm ngay, không chờ gõ xong
+        self.live_search.now(*self.search_query(), self.search_tree.page_size, True)
+
+    def search_books_live(self):
+        self.live_search.schedule(*self.search_query(), self.search_tree.page_size, False)
+
+    def run_search(self, term, category, limit, refresh):
+        # Chạy ở luồng nền của live_search
+        service = self.service_future.result()
+        if refresh:
+            service.refresh()
+        return term, category, service.search_books(term, category, 0, limit)
+
+    def show_search_results(self, result):
+        term, category, first = result
+        facets = sorted(first["facets"].items(), key=lambda item: (-item[1], item[0]))[:SHOWN_FACETS]
+        self.search_facets.config(text="Theo thể loại: " + ", ".join(f"{name} ({count})" for name, count in facets)
+                                  if facets else "")
+        fetch = lambda offset, limit, sort, reverse: self.service.search_books(term, category, offset, limit)
+        self.search_tree.set_source(PagedSource(fetch, self.service.get_book, self.book_row, first=first))
+
+    def show_search_error(self, error):
+        messagebox.showwarning("Lỗi", getattr(error, "message", str(error)))
 
     def borrow_book(self):
         if self.user_role != "docgia":
             messagebox.showwarning("Không Có Quyền", "Chỉ độc giả mới có thể mượn sách.")
             return
 
-        selected = self.search_tree.selection()
-        if not selected:
+        book_id = self.search_tree.selected_key()
+        if book_id is None:
             messagebox.showwarning("Chưa Chọn", "Vui lòng chọn một cuốn sách để mượn.")
             return
 
-        book_id = self.search_tree.item(selected)["values"][0]
-        book = next((b for b in self.books if b["id"] == book_id), None)
-        if not book or book["status"] != "available":
-            messagebox.showwarning("Lỗi", "Sách không có sẵn để mượn.")
+        try:
+            self.service.borrow_book(book_id, self.username)
+        except ServiceError as e:
+            messagebox.showwarning("Lỗi", e.message)
             return
 
-        borrow = {
-            "id": str(uuid.uuid4()),
-            "book_id": book_id,
-            "username": self.username,
-            "borrow_date": datetime.now().strftime("%Y-%m-%d"),
-            "due_date": (datetime.now() + timedelta(days=14)).strftime("%Y-%m-%d"),
-            "returned": False
-        }
-        self.borrows.append(borrow)
-        book["status"] = "borrowed"
-        self.save_data()
-        self.search_books()
+        self.search_tree.refresh_rows([book_id])
         messagebox.showinfo("Thành Công", "Đã mượn sách thành công.")
 
+    def reserve_book(self):
+        if self.user_role != "docgia":
+            messagebox.showwarning("Không Có Quyền", "Chỉ độc giả mới có thể đặt trước sách.")
+            return
+
+        book_id = self.search_tree.selected_key()
+        if book_id is None:
+            messagebox.showwarning("Chưa Chọn", "Vui lòng chọn một cuốn sách để đặt trước.")
+            return
+
+        try:
+            reservation = self.service.reserve_book(book_id, self.username)
+        except ServiceError as e:
+            messagebox.showwarning("Lỗi", e.message)
+            return
+
+        self.search_tree.refresh_rows([book_id])
+        messagebox.showinfo("Thành Công", f"Đã đặt trước sách, bạn đứng thứ {reservation['position']} trong hàng đợi.")
+
     def manage_borrows(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        self.router.show("manage_borrows")
 
-        self.set_background()
+    def build_manage_borrows(self):
         borrow_frame = ttk.Frame(self.root, padding=20)
-        borrow_frame.place(relx=0.5, rely=0.5, anchor="center", width=600, height=400)
 
         borrow_frame.grid_columnconfigure(0, weight=1)
         borrow_frame.grid_columnconfigure(1, weight=1)
-        borrow_frame.grid_rowconfigure((0, 1), weight=1)
+        borrow_frame.grid_rowconfigure((0, 1, 2), weight=1)
 
         columns = ("ID", "Tiêu Đề Sách", "Tên Người Mượn", "Ngày Mượn", "Ngày Trả", "Trạng Thái")
-        self.borrow_tree = ttk.Treeview(borrow_frame, columns=columns, show="headings")
-        for col in columns:
-            self.borrow_tree.heading(col, text=col)
-            self.borrow_tree.column(col, width=100)
+        self.borrow_tree = VirtualTable(borrow_frame, columns, width=100)
         self.borrow_tree.grid(row=0, column=0, columnspan=2, pady=10)
 
-        ttk.Button(borrow_frame, text="Trả Sách", command=self.return_book).grid(row=1, column=0, pady=10)
-        ttk.Button(borrow_frame, text="Quay Lại", command=self.main_screen).grid(row=1, column=1, pady=10)
+        self.borrow_overdue_only = tk.BooleanVar(value=False)
+        ttk.Checkbutton(borrow_frame, text="Chỉ Hiện Quá Hạn", variable=self.borrow_overdue_only,
+                        command=self.update_borrow_list).grid(row=1, column=0, columnspan=2)
 
-        self.update_borrow_list()
+        ttk.Button(borrow_frame, text="Trả Sách", command=self.return_book).grid(row=2, column=0, pady=10)
+        ttk.Button(borrow_frame, text="Quay Lại", command=self.main_screen).grid(row=2, column=1, pady=10)
+        return borrow_frame
 
     def update_borrow_list(self):
-        for item in self.borrow_tree.get_children():
-            self.borrow_tree.delete(item)
-        for borrow in self.borrows:
-            book = next((b for b in self.books if b["id"] == borrow["book_id"]), None)
-            title = book["title"] if book else "Không Xác Định"
-            status = "Đã Trả" if borrow["returned"] else "Đang Mượn"
-            self.borrow_tree.insert("", "end", values=(borrow["id"], title, borrow["username"], borrow["borrow_date"], borrow["due_date"], status))
+        self.service.refresh()
+        if self.borrow_overdue_only.get():
+            # Luôn xếp theo hạn trả, quá hạn lâu nhất trước
+            fetch = lambda offset, limit, sort, reverse: self.service.list_overdue(offset, limit)
+            self.borrow_tree.set_source(PagedSource(fetch, self.service.get_borrow, self.borrow_row))
+            return
+        fetch = lambda offset, limit, sort, reverse: self.service.list_borrows(offset, limit, None, sort, reverse)
+        self.borrow_tree.set_source(PagedSource(fetch, self.service.get_borrow, self.borrow_row, BORROW_SORT_FIELDS))
+
+    def borrow_status(self, borrow):
+        if borrow["returned"]:
+            return "Đã Trả"
+        if "days_overdue" in borrow:
+            return f"Quá Hạn {borrow['days_overdue']} Ngày, Phạt {borrow['fine']:,}đ"
+        return "Đang Mượn"
+
+    def borrow_row(self, borrow):
+        return (borrow["id"], borrow["title"], borrow["username"], borrow["borrow_date"], borrow["due_date"],
+                self.borrow_status(borrow))
 
     def return_book(self):
-        selected = self.borrow_tree.selection()
-        if not selected:
+        borrow_id = self.borrow_tree.selected_key()
+        if borrow_id is None:
             messagebox.showwarning("Chưa Chọn", "Vui lòng chọn một bản ghi mượn để trả.")
             return
 
-        borrow_id = self.borrow_tree.item(selected)["values"][0]
-        borrow = next((b for b in self.borrows if b["id"] == borrow_id), None)
-        if not borrow or borrow["returned"]:
-            messagebox.showwarning("Lỗi", "Bản ghi mượn không hợp lệ hoặc đã được trả.")
+        try:
+            borrow = self.service.return_book(borrow_id)
+        except ServiceError as e:
+            messagebox.showwarning("Lỗi", e.message)
             return
 
-        borrow["returned"] = True
-        book = next((b for b in self.books if b["id"] == borrow["book_id"]), None)
-        if book:
-            book["status"] = "available"
-        self.save_data()
-        self.update_borrow_list()
-        messagebox.showinfo("Thành Công", "Đã trả sách thành công.")
+        if self.borrow_overdue_only.get():
+            self.borrow_tree.refresh()
+        else:
+            self.borrow_tree.refresh_rows([borrow_id])
+        if borrow.get("held_for"):
+            messagebox.showinfo("Thành Công", f"Đã trả sách thành công. Giữ bản sao này cho độc giả {borrow['held_for']}.")
+        else:
+            messagebox.showinfo("Thành Công", "Đã trả sách thành công.")
 
     def my_borrows(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        self.router.show("my_borrows")
 
-        self.set_background()
+    def build_my_borrows(self):
         borrow_frame = ttk.Frame(self.root, padding=20)
-        borrow_frame.place(relx=0.5, rely=0.5, anchor="center", width=600, height=400)
 
         borrow_frame.grid_columnconfigure(0, weight=1)
         borrow_frame.grid_columnconfigure(1, weight=1)
-        borrow_frame.grid_rowconfigure((0, 1), weight=1)
+        borrow_frame.grid_rowconfigure((0, 1, 2), weight=1)
 
         columns = ("ID", "Tiêu Đề Sách", "Ngày Mượn", "Ngày Trả", "Trạng Thái")
-        self.borrow_tree = ttk.Treeview(borrow_frame, columns=columns, show="headings")
-        for col in columns:
-            self.borrow_tree.heading(col, text=col)
-            self.tree.column(col, width=120)
-        self.borrow_tree.grid(row=0, column=0, columnspan=2, pady=10)
-
-        ttk.Button(borrow_frame, text="Quay Lại", command=self.main_screen).grid(row=1, column=0, columnspan=2, pady=10)
+        self.my_borrow_tree = VirtualTable(borrow_frame, columns)
+        self.my_borrow_tree.grid(row=0, column=0, columnspan=2, pady=10)
 
-        for borrow in self.borrows:
-            if borrow["username"] == self.username:
-                book = next((b for b in self.books if b["id"] == borrow["book_id"]), None)
-                title = book["title"] if book else "Không Xác Định"
-                status = "Đã Trả" if borrow["returned"] else "Đang Mượn"
-                self.borrow_tree.insert("", "end", values=(borrow["id"], title, borrow["borrow_date"], borrow["due_date"], status))
+        self.my_overdue_only = tk.BooleanVar(value=False)
+        ttk.Checkbutton(borrow_frame, text="Chỉ Hiện Quá Hạn", variable=self.my_overdue_only,
+                        command=self.update_my_borrows).grid(row=1, column=0, columnspan=2)
 
-    def generate_stats_chart(self):
-        if not MATPLOTLIB_AVAILABLE:
-            return False
+        ttk.Button(borrow_frame, text="Quay Lại", command=self.main_screen).grid(row=2, column=0, columnspan=2, pady=10)
+        return borrow_frame
 
-        categories = {}
-        statuses = {"available": 0, "borrowed": 0}
-        for book in self.books:
-            categories[book["category"]] = categories.get(book["category"], 0) + 1
-            statuses[book["status"]] = statuses.get(book["status"], 0) + 1
+    def update_my_borrows(self):
+        self.service.refresh()
+        if self.my_overdue_only.get():
+            fetch = lambda offset, limit, sort, reverse: self.service.list_overdue(offset, limit, self.username)
+        else:
+            fetch = lambda offset, limit, sort, reverse: self.service.list_borrows(offset, limit, self.username)
+        self.my_borrow_tree.set_source(PagedSource(fetch, self.service.get_borrow, self.my_borrow_row))
 
-        plt.figure(figsize=(10, 6))
-        
-        plt.subplot(1, 2, 1)
-        cat_names = list(categories.keys())
-        cat_counts = list(categories.values())
-        plt.bar(cat_names, cat_counts, color='skyblue')
-        plt.title("Sách Theo Thể Loại")
-        plt.xlabel("Thể Loại")
-        plt.ylabel("Số Lượng Sách")
-        plt.xticks(rotation=45, ha="right")
-
-        plt.subplot(1, 2, 2)
-        status_names = ["Có Sẵn", "Đang Mượn"]
-        status_counts = [statuses["available"], statuses["borrowed"]]
-        plt.bar(status_names, status_counts, color='lightgreen')
-        plt.title("Sách Theo Trạng Thái")
-        plt.xlabel("Trạng Thái")
-        plt.ylabel("Số Lượng Sách")
-
-        plt.tight_layout()
-        plt.savefig(STATS_IMAGE)
-        plt.close()
-        return True
+    def my_borrow_row(self, borrow):
+        return (borrow["id"], borrow["title"], borrow["borrow_date"], borrow["due_date"], self.borrow_status(borrow))
 
     def stats_screen(self):
-        for widget in self.root.winfo_children():
+        self.router.show("stats")
+
+    def build_stats_screen(self):
+        screen = ttk.Frame(self.root, padding=10)
+        screen.grid_columnconfigure(0, weight=1)
+        notebook = ttk.Notebook(screen)
+        notebook.grid(row=0, column=0, sticky="nsew")
+        self.stats_frame = ttk.Frame(notebook, padding=10)
+        notebook.add(self.stats_frame, text="Sách")
+        notebook.add(self.build_analytics_tab(notebook), text="Lịch Sử Mượn")
+        ttk.Button(screen, text="Quay Lại", command=self.main_screen).grid(row=1, column=0, pady=10)
+        self.stats_version = None
+        return screen
+
+    def build_analytics_tab(self, notebook):
+        frame = ttk.Frame(notebook, padding=10)
+        frame.grid_columnconfigure(tuple(range(5)), weight=1)
+
+        ttk.Label(frame, text="Từ Ngày").grid(row=0, column=0, sticky="e")
+        self.analytics_start = tk.StringVar()
+        ttk.Entry(frame, textvariable=self.analytics_start, width=12).grid(row=0, column=1, sticky="w")
+        ttk.Label(frame, text="Đến Ngày").grid(row=0, column=2, sticky="e")
+        self.analytics_end = tk.StringVar()
+        ttk.Entry(frame, textvariable=self.analytics_end, width=12).grid(row=0, column=3, sticky="w")
+        ttk.Button(frame, text="Xem", command=self.update_analytics).grid(row=0, column=4, padx=5)
+
+        self.analytics_chart = ttk.Label(frame)
+        self.analytics_chart.grid(row=1, column=0, columnspan=5, pady=10)
+        self.analytics_summary = ttk.Label(frame, justify="left")
+        self.analytics_summary.grid(row=2, column=0, columnspan=5, sticky="w")
+        return frame
+
+    def update_analytics(self):
+        # Để trống ngày là không giới hạn; dạng YYYY-MM-DD
+        self.analytics_summary.config(text="Đang phân tích lịch sử mượn...")
+        self.analytics_query.now(self.analytics_start.get().strip(), self.analytics_end.get().strip())
+
+    def run_analytics(self, start, end):
+        # Chạy ở luồng nền: tính báo cáo, vẽ và giải mã ảnh; chỉ tạo PhotoImage trên luồng Tk
+        service = self.service_future.result()
+        report = service.analytics(start, end)
+        png = service.analytics_chart(start, end, 600, 280)
+        image = None
+        if png:
+            from PIL import Image
+            image = Image.open(io.BytesIO(png))
+            image.load()
+        return report, image
+
+    def show_analytics(self, result):
+        report, image = result
+        if image is not None:
+            from PIL import ImageTk
+            self.analytics_image = ImageTk.PhotoImage(image)
+            self.analytics_chart.config(image=self.analytics_image, text="")
+        else:
+            self.analytics_image = None
+            self.analytics_chart.config(image="", text="Không có biểu đồ (chưa có lượt mượn hoặc chưa cài Matplotlib)")
+
+        lines = [f"Tổng lượt mượn: {report['total']}"]
+        if report["avg_loan_days"] is not None:
+            lines.append(f"Thời gian mượn trung bình: {report['avg_loan_days']:.1f} ngày")
+        if report["overdue_rate"] is not None:
+            lines.append(f"Tỉ lệ quá hạn: {report['overdue_rate']:.1%}")
+        if report["top_titles"]:
+            lines.append("Sách mượn nhiều: " + ", ".join(f"{item['title']} ({item['count']})" for item in report["top_titles"][:5]))
+        if report["top_readers"]:
+            lines.append("Độc giả mượn nhiều: " + ", ".join(f"{item['username']} ({item['count']})" for item in report["top_readers"][:5]))
+        self.analytics_summary.config(text="\n".join(lines))
+
+    def show_analytics_error(self, error):
+        self.analytics_summary.config(text="")
+        messagebox.showwarning("Lỗi", getattr(error, "message", str(error)))
+
+    def update_stats(self):
+        self.update_analytics()
+        stats = self.service.stats()
+        if self.stats_version == stats["version"]:
+            return
+        self.stats_version = stats["version"]
+        stats_frame = self.stats_frame
+        for widget in stats_frame.winfo_children():
             widget.destroy()
 
-        self.set_background()
-        stats_frame = ttk.Frame(self.root, padding=20)
-        stats_frame.place(relx=0.5, rely=0.5, anchor="center", width=600, height=500)
-
         stats_frame.grid_columnconfigure(0, weight=1)
         stats_frame.grid_rowconfigure(tuple(range(10)), weight=1)
 
-        chart_success = self.generate_stats_chart()
-        
-        if chart_success:
+        chart_png = self.service.stats_chart(600, 300)
+
+        if chart_png:
             try:
-                stats_img = Image.open(STATS_IMAGE)
-                stats_img = stats_img.resize((600, 300), Image.LANCZOS)
-                self.stats_image = ImageTk.PhotoImage(stats_img)
+                from PIL import Image, ImageTk
+                self.stats_image = ImageTk.PhotoImage(Image.open(io.BytesIO(chart_png)))
                 ttk.Label(stats_frame, image=self.stats_image).grid(row=0, column=0, columnspan=2, pady=10)
             except:
                 ttk.Label(stats_frame, text="Lỗi tải biểu đồ thống kê").grid(row=0, column=0, columnspan=2, pady=10)
         else:
             ttk.Label(stats_frame, text="Chưa cài đặt Matplotlib, không hiển thị biểu đồ").grid(row=0, column=0, columnspan=2, pady=10)
 
-        categories = {}
-        statuses = {"available": 0, "borrowed": 0}
-        for book in self.books:
-            categories[book["category"]] = categories.get(book["category"], 0) + 1
-            statuses[book["status"]] = statuses.get(book["status"], 0) + 1
+        categories = stats["categories"]
+        statuses = stats["statuses"]
 
         ttk.Label(stats_frame, text="Thống Kê Sách", font=("Arial", 16, "bold")).grid(row=1, column=0, columnspan=2, pady=10)
         
@@ -623,9 +803,8 @@ class LibraryApp:
         ttk.Label(stats_frame, text=f"Có Sẵn: {statuses['available']} cuốn").grid(row=len(categories)+4, column=0, sticky="w", pady=2)
         ttk.Label(stats_frame, text=f"Đang Mượn: {statuses['borrowed']} cuốn").grid(row=len(categories)+5, column=0, sticky="w", pady=2)
 
-        ttk.Button(stats_frame, text="Quay Lại", command=self.main_screen).grid(row=len(categories)+6, column=0, columnspan=2, pady=10)
-
 if __name__ == "__main__":
     root = tk.Tk()
     app = LibraryApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.close()
\ No newline at end of file
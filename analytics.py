@@ -0,0 +1,307 @@
+# Phân tích lịch sử mượn: nạp lượt mượn thành các cột NumPy (ngày dạng datetime64, mã số cho sách/độc giả)
+# rồi gom nhóm bằng bincount thay cho vòng lặp Python. Cột cập nhật tăng dần theo thay đổi của Catalog,
+# báo cáo và biểu đồ lưu đệm theo (phiên bản, bộ lọc)
+import io
+import threading
+from collections import OrderedDict
+from datetime import date
+from importlib.util import find_spec
+
+from metrics import timed
+
+# Như matplotlib: chỉ nhập numpy khi tính báo cáo lần đầu
+NUMPY_AVAILABLE = find_spec("numpy") is not None
+MATPLOTLIB_AVAILABLE = find_spec("matplotlib") is not None
+
+REPORT_CACHE_SIZE = 16
+TOP_COUNT = 10
+# 1970-01-01 là thứ Năm: cộng 3 để tuần bắt đầu từ thứ Hai
+WEEK_OFFSET = 3
+# Cột của BorrowColumns: (tên, kiểu NumPy)
+COLUMNS = (("borrow_day", "datetime64[D]"), ("due_day", "datetime64[D]"), ("return_day", "datetime64[D]"),
+           ("returned", "bool"), ("live", "bool"), ("book", "int32"), ("user", "int32"))
+
+
+class BorrowColumns:
+    # Mỗi lượt mượn là một dòng i trong các mảng; ngày trả không có (chưa trả hoặc dữ liệu cũ) là NaT.
+    # Lượt mượn bị sửa được ghi đè tại chỗ, lượt mới nối thêm, lượt bị xóa chỉ tắt cờ live.
+    # Mỗi cột là khung nhìn [:size] của một mảng dự trữ gấp đôi khi đầy, nên nối thêm không chép lại cả cột
+    def __init__(self):
+        import numpy as np
+
+        self.rows = {}
+        self.book_codes, self.user_codes = {}, {}
+        self.book_ids, self.titles, self.usernames = [], [], []
+        self.size = 0
+        self.buffers = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+        self.resize()
+
+    def __len__(self):
+        return self.size
+
+    def resize(self):
+        for name, buffer in self.buffers.items():
+            setattr(self, name, buffer[:self.size])
+
+    def reserve(self, size):
+        import numpy as np
+
+        capacity = len(self.buffers["live"])
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        for name, dtype in COLUMNS:
+            buffer = np.empty(capacity, dtype=dtype)
+            buffer[:self.size] = self.buffers[name][:self.size]
+            self.buffers[name] = buffer
+
+    def book_code(self, book_id, get_book):
+        code = self.book_codes.get(book_id)
+        if code is None:
+            code = self.book_codes[book_id] = len(self.book_ids)
+            self.book_ids.append(book_id)
+            self.titles.append((get_book(book_id) or {}).get("title", book_id))
+        return code
+
+    def user_code(self, username):
+        code = self.user_codes.get(username)
+        if code is None:
+            code = self.user_codes[username] = len(self.usernames)
+            self.usernames.append(username)
+        return code
+
+    def extend(self, borrows, get_book):
+        import numpy as np
+
+        borrowed, due, returned_on, returned, books, users = [], [], [], [], [], []
+        rows, row = self.rows, len(self)
+        for borrow in borrows:
+            rows[borrow["id"]] = row
+            row += 1
+            borrowed.append(borrow["borrow_date"])
+            due.append(borrow["due_date"])
+            returned_on.append(borrow.get("return_date") or "NaT")
+            returned.append(bool(borrow["returned"]))
+            books.append(self.book_code(borrow["book_id"], get_book))
+            users.append(self.user_code(borrow["username"]))
+        if not borrowed:
+            return
+        start, end = self.size, row
+        self.reserve(end)
+        buffers = self.buffers
+        buffers["borrow_day"][start:end] = np.array(borrowed, dtype="datetime64[D]")
+        buffers["due_day"][start:end] = np.array(due, dtype="datetime64[D]")
+        buffers["return_day"][start:end] = np.array(returned_on, dtype="datetime64[D]")
+        buffers["returned"][start:end] = returned
+        buffers["live"][start:end] = True
+        buffers["book"][start:end] = books
+        buffers["user"][start:end] = users
+        self.size = end
+        self.resize()
+
+    def update(self, row, borrow, get_book):
+        import numpy as np
+
+        self.borrow_day[row] = np.datetime64(borrow["borrow_date"], "D")
+        self.due_day[row] = np.datetime64(borrow["due_date"], "D")
+        self.return_day[row] = np.datetime64(borrow.get("return_date") or "NaT", "D")
+        self.returned[row] = bool(borrow["returned"])
+        self.live[row] = True
+        self.book[row] = self.book_code(borrow["book_id"], get_book)
+        self.user[row] = self.user_code(borrow["username"])
+
+    def rename(self, book_id, title):
+        code = self.book_codes.get(book_id)
+        if code is not None:
+            self.titles[code] = title
+
+
+def top(codes, size, count):
+    # [(mã, số lượt)] của count mã xuất hiện nhiều nhất
+    import numpy as np
+
+    counts = np.bincount(codes, minlength=size)
+    count = min(count, int(np.count_nonzero(counts)))
+    if not count:
+        return []
+    # argpartition O(n) rồi chỉ sắp xếp phần đầu; hòa nhau thì mã nhỏ hơn (xuất hiện trước) đứng trước
+    best = np.argpartition(-counts, count - 1)[:count]
+    best = best[np.lexsort((best, -counts[best]))]
+    return [(int(i), int(counts[i])) for i in best]
+
+
+class BorrowAnalytics:
+    # Theo dõi Catalog như StatsAggregator nhưng không tính gì lúc nạp: cột dựng ở báo cáo đầu tiên,
+    # sau đó chỉ áp các lượt mượn đã đổi kể từ lần trước
+    def __init__(self):
+        self.columns = None
+        self.pending = {}
+        self.renamed = {}
+        self.version = None
+        self.reports = OrderedDict()
+        # Biểu đồ vẽ ngoài khóa của dịch vụ (xem chart_png): bộ đệm ảnh có khóa riêng
+        self.charts = OrderedDict()
+        self.charts_lock = threading.Lock()
+
+    def on_load(self, catalog):
+        self.columns = None
+        self.pending = {}
+        self.renamed = {}
+
+    def on_change(self, kind, record_id, record):
+        if self.columns is None:
+            return
+        if kind == "borrow":
+            self.pending[record_id] = record
+        elif kind == "book" and record is not None:
+            self.renamed[record_id] = record["title"]
+
+    @timed("analytics.ensure")
+    def ensure(self, catalog):
+        if self.columns is None:
+            self.columns = BorrowColumns()
+            self.columns.extend(catalog.iter_borrows(), catalog.get_book)
+        elif self.pending or self.renamed:
+            columns, added = self.columns, []
+            for borrow_id, borrow in self.pending.items():
+                row = columns.rows.get(borrow_id)
+                if borrow is None:
+                    if row is not None:
+                        columns.live[row] = False
+                elif row is None:
+                    added.append(borrow)
+                else:
+                    columns.update(row, borrow, catalog.get_book)
+            columns.extend(added, catalog.get_book)
+            for book_id, title in self.renamed.items():
+                columns.rename(book_id, title)
+            self.pending = {}
+            self.renamed = {}
+        if self.version != catalog.version:
+            self.version = catalog.version
+            self.reports.clear()
+            with self.charts_lock:
+                self.charts.clear()
+        return self.columns
+
+    def cached(self, cache, key, build):
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = build()
+            if len(cache) > REPORT_CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return value
+
+    def report(self, catalog, start=None, end=None, today=None):
+        # start/end: "YYYY-MM-DD" lọc theo ngày mượn (gồm cả hai đầu), None là không giới hạn
+        self.ensure(catalog)
+        today = today or date.today().isoformat()
+        return self.cached(self.reports, (start, end, today), lambda: self.compute(start, end, today))
+
+    def reader_counts(self, catalog, start=None, end=None):
+        # {tên đăng nhập: số lượt mượn} của mọi độc giả trong khoảng ngày: shards.py cộng qua các kho
+        # để độc giả mượn ở nhiều chi nhánh được xếp hạng đúng
+        import numpy as np
+
+        c = self.ensure(catalog)
+        counts = np.bincount(c.user[self.mask(start, end)], minlength=len(c.usernames))
+        return {c.usernames[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+    def mask(self, start, end):
+        import numpy as np
+
+        c = self.columns
+        mask = c.live.copy()
+        if start:
+            mask &= c.borrow_day >= np.datetime64(start, "D")
+        if end:
+            mask &= c.borrow_day <= np.datetime64(end, "D")
+        return mask
+
+    @timed("analytics.compute")
+    def compute(self, start, end, today):
+        import numpy as np
+
+        c = self.columns
+        mask = self.mask(start, end)
+        borrow_day, due_day, return_day = c.borrow_day[mask], c.due_day[mask], c.return_day[mask]
+        returned = c.returned[mask]
+        total = int(mask.sum())
+        # timed_loans/loan_days/late_loans/judged_loans: tử và mẫu của hai tỉ lệ, để gộp báo cáo nhiều kho (shards.py)
+        result = {"version": self.version, "start": start, "end": end, "total": total, "per_day": [], "per_week": [],
+                  "top_titles": [], "top_readers": [], "avg_loan_days": None, "overdue_rate": None,
+                  "timed_loans": 0, "loan_days": 0, "late_loans": 0, "judged_loans": 0}
+        if not total:
+            return result
+
+        days = borrow_day.astype(np.int64)
+        first, last = int(days.min()), int(days.max())
+        per_day = np.bincount(days - first, minlength=last - first + 1)
+        result["per_day"] = [(str(np.datetime64(first + i, "D")), int(n)) for i, n in enumerate(per_day) if n]
+        weeks = (days + WEEK_OFFSET) // 7
+        per_week = np.bincount(weeks - weeks.min())
+        week_start = int(weeks.min()) * 7 - WEEK_OFFSET
+        result["per_week"] = [(str(np.datetime64(week_start + 7 * i, "D")), int(n)) for i, n in enumerate(per_week) if n]
+
+        result["top_titles"] = [{"book_id": c.book_ids[code], "title": c.titles[code], "count": n}
+                                for code, n in top(c.book[mask], len(c.book_ids), TOP_COUNT)]
+        result["top_readers"] = [{"username": c.usernames[code], "count": n}
+                                 for code, n in top(c.user[mask], len(c.usernames), TOP_COUNT)]
+
+        # Thời gian mượn chỉ tính lượt đã trả có ghi ngày trả (dữ liệu cũ không có)
+        known = ~np.isnat(return_day)
+        if known.any():
+            loan_days = (return_day[known] - borrow_day[known]).astype(np.int64)
+            result["timed_loans"], result["loan_days"] = int(known.sum()), int(loan_days.sum())
+            result["avg_loan_days"] = round(float(loan_days.mean()), 2)
+        # Quá hạn: trả sau hạn, hoặc chưa trả mà đã qua hạn; lượt đã trả không rõ ngày trả không tính
+        late = (known & (return_day > due_day)) | (~returned & (due_day < np.datetime64(today, "D")))
+        judged = int((known | ~returned).sum())
+        result["late_loans"], result["judged_loans"] = int(late.sum()), judged
+        if judged:
+            result["overdue_rate"] = round(result["late_loans"] / judged, 4)
+        return result
+
+    def chart_png(self, report, size=(600, 300)):
+        # Chỉ dùng report (đã tính xong trong khóa của dịch vụ): gọi được khi không giữ khóa
+        if not MATPLOTLIB_AVAILABLE or not report["total"]:
+            return None
+        key = (report["version"], report["start"], report["end"], size)
+        with self.charts_lock:
+            png = self.charts.get(key)
+            if png is not None:
+                self.charts.move_to_end(key)
+                return png
+        png = self.render_chart(report, size)
+        with self.charts_lock:
+            self.charts[key] = png
+            if len(self.charts) > REPORT_CACHE_SIZE:
+                self.charts.popitem(last=False)
+        return png
+
+    @timed("analytics.render_chart")
+    def render_chart(self, report, size, dpi=100):
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+
+        ax = fig.add_subplot(1, 2, 1)
+        weeks = [date.fromisoformat(week) for week, _ in report["per_week"]]
+        ax.bar(weeks, [n for _, n in report["per_week"]], width=6, color="skyblue")
+        ax.set_title("Lượt Mượn Theo Tuần", fontsize=9)
+        ax.set_ylabel("Lượt Mượn", fontsize=8)
+        ax.tick_params(labelsize=7)
+        ax.tick_params(axis="x", labelrotation=45)
+
+        ax = fig.add_subplot(1, 2, 2)
+        titles = report["top_titles"][::-1]
+        ax.barh([item["title"][:24] for item in titles], [item["count"] for item in titles], color="lightgreen")
+        ax.set_title("Sách Được Mượn Nhiều Nhất", fontsize=9)
+        ax.tick_params(labelsize=7)
+
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi)
+        return buf.getvalue()
@@ -0,0 +1,80 @@
+# Bộ đệm ảnh nền: giải mã ảnh một lần, mỗi kích thước cửa sổ chỉ thu phóng một lần
+import tkinter as tk
+from collections import OrderedDict
+
+PHOTO_CACHE_SIZE = 4
+
+
+class BackgroundCache:
+    def __init__(self, image_path):
+        self.image_path = image_path
+        self.source = None
+        self.photos = OrderedDict()
+
+    def load_source(self):
+        from PIL import Image
+
+        if self.source is None:
+            try:
+                with Image.open(self.image_path) as img:
+                    self.source = img.convert("RGB")
+            except OSError:
+                self.source = gradient_image(600)
+        return self.source
+
+    def photo(self, size):
+        from PIL import Image, ImageTk
+
+        photo = self.photos.get(size)
+        if photo is not None:
+            self.photos.move_to_end(size)
+            return photo
+        photo = ImageTk.PhotoImage(self.load_source().resize(size, Image.LANCZOS))
+        self.photos[size] = photo
+        if len(self.photos) > PHOTO_CACHE_SIZE:
+            self.photos.popitem(last=False)
+        return photo
+
+
+def gradient_image(height):
+    # Nền dự phòng: dải màu đen -> xanh, dựng thành một ảnh thay vì vẽ từng đường kẻ
+    from PIL import Image
+
+    column = Image.new("RGB", (1, height))
+    column.putdata([(0, 0, int(255 * (i / height))) for i in range(height)])
+    return column
+
+
+class ResponsiveBackground:
+    def __init__(self, root, cache, delay=150):
+        self.root = root
+        self.cache = cache
+        self.delay = delay
+        self.canvas = None
+        self.image_item = None
+        self.size = None
+        self.pending = None
+
+    def show(self):
+        if self.canvas is None or not self.canvas.winfo_exists():
+            self.canvas = tk.Canvas(self.root, width=800, height=600, highlightthickness=0)
+            self.canvas.pack(fill="both", expand=True)
+            self.image_item = self.canvas.create_image(0, 0, anchor="nw")
+            self.canvas.bind("<Configure>", self.on_configure)
+            self.size = None
+            self.render((max(self.root.winfo_width(), 800), max(self.root.winfo_height(), 600)))
+        self.canvas.lower()
+        return self.canvas
+
+    def on_configure(self, event):
+        # Gom các sự kiện đổi kích thước liên tiếp, chỉ thu phóng khi người dùng dừng kéo
+        if self.pending is not None:
+            self.root.after_cancel(self.pending)
+        self.pending = self.root.after(self.delay, self.render, (event.width, event.height))
+
+    def render(self, size):
+        self.pending = None
+        if size == self.size or size[0] < 2 or size[1] < 2:
+            return
+        self.size = size
+        self.canvas.itemconfig(self.image_item, image=self.cache.photo(size))
@@ -0,0 +1,126 @@
+# Kiểm tra tải: nhiều tiến trình cùng mượn/trả trên một kho dữ liệu, đo thông lượng và kiểm tra
+# không có bản sao nào bị hai người mượn cùng lúc
+# Chạy: python benchmarks/bench_concurrent_borrow.py --processes 8 --books 20 --copies 3 --backend sqlite
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import available_of, copies_of, copy_of, new_copy_ids
+from journal import JournalStorage
+from service import LibraryService, ServiceError
+from storage import ConflictError, JsonStorage, SqliteStorage
+
+
+def open_backend(backend, directory, compact_bytes):
+    if backend == "sqlite":
+        return SqliteStorage(os.path.join(directory, "library.db"))
+    files = [os.path.join(directory, name) for name in ("books.json", "borrows.json", "users.json")]
+    if backend == "journal":
+        return JournalStorage(*files, journal_file=os.path.join(directory, "journal.jsonl"), compact_bytes=compact_bytes)
+    return JsonStorage(*files)
+
+
+class CountingService(LibraryService):
+    def __init__(self, storage):
+        self.conflicts = 0
+        super().__init__(storage)
+
+    def save(self):
+        try:
+            super().save()
+        except ConflictError:
+            self.conflicts += 1
+            raise
+
+
+def worker(args, worker_id, barrier, results):
+    service = CountingService(open_backend(args.backend, args.directory, args.compact_bytes))
+    book_ids = [book["id"] for book in service.catalog.iter_books()]
+    rng = random.Random(worker_id)
+    counts = Counter()
+    mine = []
+    barrier.wait()
+    start = time.perf_counter()
+    for _ in range(args.operations):
+        try:
+            if mine and rng.random() < 0.5:
+                service.return_book(mine.pop(rng.randrange(len(mine))))
+                counts["return"] += 1
+            else:
+                mine.append(service.borrow_book(rng.choice(book_ids), f"user{worker_id}")["id"])
+                counts["borrow"] += 1
+        except ServiceError as e:
+            counts["gave_up" if "quầy khác" in e.message else "unavailable"] += 1
+    counts["conflicts"] = service.conflicts
+    counts["seconds"] = time.perf_counter() - start
+    service.close()
+    results.put(counts)
+
+
+def check(args):
+    # Mỗi bản sao có tối đa một lượt mượn chưa trả; số bản có sẵn và trạng thái khớp với các lượt mượn
+    storage = open_backend(args.backend, args.directory, args.compact_bytes)
+    books, borrows = storage.load()
+    storage.close()
+    active = Counter(copy_of(b) for b in borrows if not b["returned"])
+    assert all(n <= 1 for n in active.values()), "một bản sao bị mượn hai lần"
+    for book in books:
+        on_loan = sum(active[c] for c in copies_of(book))
+        assert available_of(book) == len(copies_of(book)) - on_loan, f"số bản có sẵn sai: {book['id']}"
+        expected = "available" if available_of(book) else "borrowed"
+        assert book["status"] == expected, f"trạng thái sai: {book['id']}"
+    return len(borrows), sum(active.values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--books", type=int, default=20, help="ít sách để các quầy tranh chấp nhiều")
+    parser.add_argument("--copies", type=int, default=1, help="số bản sao mỗi đầu sách")
+    parser.add_argument("--operations", type=int, default=200, help="số thao tác mỗi tiến trình")
+    parser.add_argument("--backend", choices=["json", "journal", "sqlite"], default="sqlite")
+    parser.add_argument("--compact-bytes", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        args.directory = directory
+        service = LibraryService(open_backend(args.backend, directory, args.compact_bytes))
+        service.import_books([{"id": f"b{i}", "title": f"Sách {i}", "author": "Tác Giả", "category": "Chung",
+                               "status": "available", "copies": new_copy_ids(f"b{i}", 1, args.copies),
+                               "available": args.copies} for i in range(args.books)])
+        service.close()
+
+        barrier = multiprocessing.Barrier(args.processes)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(args, i, barrier, results))
+                     for i in range(args.processes)]
+        start = time.perf_counter()
+        for p in processes:
+            p.start()
+        totals = Counter()
+        for _ in processes:
+            totals.update(results.get())
+        for p in processes:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        borrows, active = check(args)
+        done = totals["borrow"] + totals["return"]
+        print(f"{args.processes} tiến trình, {args.books} sách, kiểu lưu trữ {args.backend}")
+        print(f"Thành công: {totals['borrow']} lượt mượn, {totals['return']} lượt trả "
+              f"({done / elapsed:.0f} thao tác/s)")
+        print(f"Sách không có sẵn: {totals['unavailable']}, xung đột phải thử lại: {totals['conflicts']}, "
+              f"bỏ cuộc sau khi thử lại: {totals['gave_up']}")
+        print(f"Kiểm tra nhất quán: {borrows} bản ghi mượn, {active} đang mượn - OK")
+        assert borrows == totals["borrow"], "số lượt mượn đã lưu không khớp"
+
+
+if __name__ == "__main__":
+    main()
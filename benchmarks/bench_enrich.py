@@ -0,0 +1,62 @@
+# Đo job bổ sung thông tin sách (enrich.py) hoàn toàn ngoại tuyến: dựng dữ liệu giả lập, chạy máy chủ giả lập
+# Google Books trên luồng nền rồi bổ sung cả catalog; in thông lượng và số ảnh bìa thực sự lưu trong kho
+# Chạy: python benchmarks/bench_enrich.py --books 2000 --workers 8 --processes 4 --latency 20
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from enrich import BookEnricher, enrich_catalog
+from service import LibraryService
+from storage import JsonStorage
+from thumbnails import ThumbnailCache
+
+from datagen import generate, json_files, write_dataset
+from fixture_server import start
+
+
+def cache_stats(directory):
+    files = [os.path.join(root, name) for root, _, names in os.walk(directory) for name in names]
+    return len(files), sum(os.path.getsize(path) for path in files)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=8, help="số yêu cầu HTTP song song")
+    parser.add_argument("--processes", type=int, default=None, help="số tiến trình thu nhỏ ảnh")
+    parser.add_argument("--latency", type=float, default=20, help="độ trễ giả lập mỗi yêu cầu (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="tỉ lệ lỗi 503 giả lập")
+    parser.add_argument("--covers", type=int, default=200, help="số ảnh bìa khác nhau trên máy chủ giả lập")
+    parser.add_argument("--seed", type=int, default=23)
+    args = parser.parse_args()
+
+    server, api_url = start(latency=args.latency / 1000, error_rate=args.error_rate, covers=args.covers, seed=args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        books, borrows, users = generate(args.books, borrows=0, seed=args.seed)
+        write_dataset(directory, books, borrows, users)
+        thumbnails = ThumbnailCache(os.path.join(directory, "thumbnails"))
+        service = LibraryService(JsonStorage(*json_files(directory)))
+        service.thumbnails = thumbnails
+        try:
+            enricher = BookEnricher(api_url, max_workers=args.workers, processes=args.processes,
+                                    thumbnails=thumbnails, backoff=0.05)
+            counts = enrich_catalog(service, enricher, report=lambda message: None)
+            remaining = len(service.books_to_enrich())
+        finally:
+            service.close()
+        files, size = cache_stats(thumbnails.directory)
+    server.shutdown()
+
+    print(f"{counts['books']} sách, {args.workers} luồng HTTP, độ trễ {args.latency:g}ms, lỗi {args.error_rate:.0%}")
+    print(f"  thời gian       : {counts['seconds']:.2f}s ({counts['books'] / counts['seconds']:.1f} sách/s)")
+    print(f"  đã cập nhật     : {counts['updated']} (lỗi {counts['errors']}, còn thiếu {remaining})")
+    print(f"  yêu cầu HTTP    : {server.requests}")
+    print(f"  kho ảnh bìa     : {files} file, {size / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
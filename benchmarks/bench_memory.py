@@ -0,0 +1,70 @@
+# So bộ nhớ giữa bản ghi dict (như json.load trả về) và bản ghi gọn của records.py, cùng dữ liệu nạp từ JSON
+# Chạy: python benchmarks/bench_memory.py --borrows 1000000 --books 100000
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import Catalog
+from records import Book, Borrow
+
+from datagen import generate
+
+
+def compact(books, borrows):
+    books = {b["id"]: Book(b) for b in books}
+    records = []
+    for data in borrows:
+        borrow = Borrow(data)
+        borrow.book_id = books[borrow.book_id].id
+        records.append(borrow)
+    return list(books.values()), records
+
+
+def measure(build):
+    # Bộ nhớ còn giữ sau khi dựng xong (đã bỏ dữ liệu trung gian) và bộ nhớ đỉnh trong lúc dựng
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--borrows", type=int, default=200000)
+    parser.add_argument("--readers", type=int, default=5000)
+    args = parser.parse_args()
+
+    books, borrows, _ = generate(args.books, args.borrows, args.readers)
+    # Nạp lại từ chuỗi JSON cho mỗi trường hợp để mọi chuỗi là đối tượng mới như khi đọc file
+    book_text, borrow_text = json.dumps(books), json.dumps(borrows)
+    del books, borrows
+    rows = args.books + args.borrows
+    cases = [
+        ("dict (json.loads)", lambda: (json.loads(book_text), json.loads(borrow_text))),
+        ("bản ghi gọn", lambda: compact(json.loads(book_text), json.loads(borrow_text))),
+        ("Catalog đầy đủ (kèm chỉ mục)", lambda: Catalog(json.loads(book_text), json.loads(borrow_text))),
+    ]
+    print(f"{args.books} sách, {args.borrows} lượt mượn, {args.readers} độc giả")
+    baseline = None
+    for name, build in cases:
+        current, peak, elapsed = measure(build)
+        baseline = baseline or current
+        print(f"{name:30} {current / 2**20:8.1f} MiB ({current / rows:6.0f} B/bản ghi, "
+              f"{current / baseline:4.0%} so với dict), đỉnh {peak / 2**20:8.1f} MiB, nạp {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# So thời gian lưu/nạp và kích thước file của các định dạng trong serializers.py
+# Lưu đi từ bản ghi gọn trong catalog, nạp về danh sách dict như JsonStorage.load
+# Chạy: python benchmarks/bench_serializers.py --sizes 10000,100000,1000000
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serializers
+from records import Borrow
+from serializers import JsonSerializer, PickleSerializer, read_snapshot, write_snapshot
+
+from datagen import generate
+
+
+def formats():
+    found = [("json thụt lề (bản cũ)", JsonSerializer(compact=False, fast=False)),
+             ("json gọn", JsonSerializer(fast=False))]
+    if serializers.orjson is not None:
+        found.append(("json gọn + orjson", JsonSerializer()))
+    if serializers.msgpack is not None:
+        found.append(("msgpack", serializers.MsgpackSerializer()))
+    found.append(("pickle 5", PickleSerializer()))
+    return found
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+        del result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="số lượt mượn, cách nhau bởi dấu phẩy")
+    parser.add_argument("--repeat", type=int, default=3, help="lấy lần nhanh nhất trong số lần chạy")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "borrows.dat")
+        for size in (int(s) for s in args.sizes.split(",")):
+            records = [Borrow(b) for b in generate(max(1, size // 10), size)[1]]
+            repeat = args.repeat if size < 1000000 else 1
+            print(f"\n{size} bản ghi")
+            baseline = None
+            for name, serializer in formats():
+                save = timed(lambda: write_snapshot(path, records, serializer), repeat)
+                size_bytes = os.path.getsize(path)
+                load = timed(lambda: read_snapshot(path, []), repeat)
+                baseline = baseline or (save, load)
+                print(f"  {name:24} lưu {save * 1000:8.0f} ms (x{baseline[0] / save:4.1f})  "
+                      f"nạp {load * 1000:8.0f} ms (x{baseline[1] / load:4.1f})  {size_bytes / 2**20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
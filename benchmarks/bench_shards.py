@@ -0,0 +1,95 @@
+# So kho chung với kho chia chi nhánh (shards.py) trên cùng dữ liệu giả lập: thời gian nạp (một quầy chỉ nạp kho
+# của mình, toàn hệ thống nạp song song hoặc tuần tự) và độ trễ các truy vấn gộp so với một LibraryService
+# Chạy: python benchmarks/bench_shards.py --books 100000 --branches 4 --backend sqlite
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from service import LibraryService
+from shards import ShardedService, split_catalog
+from storage import open_storage
+
+from datagen import WORDS, generate, write_dataset
+
+
+def timed_load(make):
+    start = time.perf_counter()
+    service = make()
+    if isinstance(service, ShardedService):
+        service.active()
+    return service, time.perf_counter() - start
+
+
+def median_ms(call, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--branches", type=int, default=4)
+    parser.add_argument("--backend", default="json", choices=["json", "journal", "sqlite"])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=23)
+    args = parser.parse_args()
+
+    branches = [f"cn{i + 1}" for i in range(args.branches)]
+    with tempfile.TemporaryDirectory() as directory:
+        data_dir = os.path.join(directory, "data")
+        books, borrows, users = generate(args.books, seed=args.seed)
+        write_dataset(data_dir, books, borrows, users, backend=args.backend)
+        del books, borrows, users
+        open_main = lambda: open_storage(args.backend, data_dir)
+        open_branch = lambda branch: open_storage(args.backend, os.path.join(directory, "branches", branch))
+        source = open_main()
+        split_catalog(source, branches, open_branch)
+        source.close()
+        sharded = lambda home, workers=None: ShardedService(branches, home, open_branch, users_storage=open_main(),
+                                                            workers=workers)
+
+        print(f"{args.books} sách, {args.branches} chi nhánh, kiểu lưu trữ {args.backend}")
+        loads = {}
+        for name, make in (("kho chung", lambda: LibraryService(open_main())),
+                           ("một quầy (1 kho)", lambda: sharded(branches[0])),
+                           ("toàn hệ thống, tuần tự", lambda: sharded(None, workers=1)),
+                           ("toàn hệ thống, song song", lambda: sharded(None))):
+            service, loads[name] = timed_load(make)
+            print(f"  nạp {name:<26}: {loads[name]:.2f}s")
+            if name == "kho chung":
+                single = service
+            elif name.endswith("song song"):
+                merged = service
+            else:
+                service.close()
+
+        print(f"  {'truy vấn (trung vị, ms)':<31} {'kho chung':>10} {'gộp':>10}")
+        queries = {
+            "search_books(từ khóa)": lambda s: s.search_books(WORDS[3], None, 0, 50),
+            "search_books(rỗng)": lambda s: s.search_books("", None, 0, 50),
+            "list_books(title, trang 20)": lambda s: s.list_books(1000, 50, "title"),
+            "list_borrows(trang 20)": lambda s: s.list_borrows(1000, 50),
+            "list_borrows(due_date)": lambda s: s.list_borrows(0, 50, None, "due_date"),
+            "list_overdue": lambda s: s.list_overdue(0, 50),
+            "stats": lambda s: s.stats(),
+            "get_book": lambda s: s.get_book(first_id),
+        }
+        first_id = single.list_books(args.books - 1, 1)["items"][0]["id"]
+        for name, query in queries.items():
+            print(f"  {name:<31} {median_ms(lambda: query(single), args.repeat):>10.2f} "
+                  f"{median_ms(lambda: query(merged), args.repeat):>10.2f}")
+        single.close()
+        merged.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Đo thời gian khởi động giao diện: từ lúc chạy tiến trình đến khi cửa sổ đăng nhập hiện ra, và đến khi dữ liệu nạp xong
+# Mỗi lần đo chạy một tiến trình Python mới (khởi động lạnh) trên bộ dữ liệu sinh sẵn; cần màn hình (DISPLAY)
+# Chạy: python benchmarks/bench_startup.py --books 20000 --borrows 200000 --runs 5 [--preload]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import generate, write_dataset
+
+CHILD = r"""
+import importlib.util, json, sys, time
+sys.path.insert(0, {root!r})
+if {preload!r}:
+    # Mô phỏng bản cũ: nhập sẵn các thư viện nặng trước khi dựng giao diện
+    import matplotlib.pyplot, PIL.ImageTk, requests
+import tkinter as tk
+spec = importlib.util.spec_from_file_location("library_app", {app!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.time()
+root = tk.Tk()
+app = module.LibraryApp(root)
+root.update()
+window = time.time()
+app.service_future.result()
+loaded = time.time()
+root.update()
+root.destroy()
+app.service.close()
+print(json.dumps({{"imported": imported, "window": window, "loaded": loaded}}))
+"""
+
+
+def run_once(directory, preload):
+    code = CHILD.format(root=ROOT, preload=preload, app=os.path.join(ROOT, "QL DanhSachSachTrongThuVien.py"))
+    start = time.time()
+    result = subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(result.stderr.strip().splitlines()[-1])
+    marks = json.loads(result.stdout.strip().splitlines()[-1])
+    return {name: (stamp - start) * 1000 for name, stamp in marks.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--borrows", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--preload", action="store_true", help="nhập matplotlib/PIL/requests trước, như bản cũ")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_dataset(os.path.join(directory, "data"), *generate(args.books, args.borrows))
+
+        samples = [run_once(directory, args.preload) for _ in range(args.runs)]
+        print(f"{args.books} sách, {args.borrows} lượt mượn, {args.runs} lần chạy"
+              f"{' (nhập sẵn thư viện nặng)' if args.preload else ''}")
+        for name, label in (("imported", "Nhập mô-đun giao diện"), ("window", "Cửa sổ đầu tiên"),
+                            ("loaded", "Dữ liệu sẵn sàng")):
+            values = [sample[name] for sample in samples]
+            print(f"{label:24} trung vị {statistics.median(values):7.0f} ms, "
+                  f"nhỏ nhất {min(values):7.0f} ms, lớn nhất {max(values):7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
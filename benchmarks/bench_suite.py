@@ -0,0 +1,226 @@
+# Bộ đo hiệu năng các thao tác chính của LibraryService (không cần Tk) trên dữ liệu giả lập tất định.
+# In độ trễ p50/p95/p99, thông lượng, bộ nhớ đỉnh; ghi JSON để so giữa các commit
+# Chạy: python benchmarks/bench_suite.py --books 100000 --backend sqlite --output after.json --compare before.json
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from analytics import NUMPY_AVAILABLE
+from journal import JournalStorage
+from service import BOOK_SORT_FIELDS, BORROW_SORT_FIELDS, LibraryService, ServiceError
+from storage import JsonStorage, SqliteStorage
+
+from datagen import CATEGORIES, PASSWORD, TODAY, WORDS, generate, json_files, write_dataset
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def open_backend(backend, directory):
+    if backend == "sqlite":
+        return SqliteStorage(os.path.join(directory, "library.db"))
+    if backend == "journal":
+        return JournalStorage(*json_files(directory), journal_file=os.path.join(directory, "journal.jsonl"))
+    return JsonStorage(*json_files(directory))
+
+
+def peak_rss_mb():
+    # Đỉnh bộ nhớ thường trú của cả tiến trình (Linux tính KiB, macOS tính byte); None trên Windows
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def percentile(ordered, p):
+    # Hạng gần nhất trên danh sách đã sắp xếp
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+def summarize(samples, elapsed, traced_peak=None):
+    ordered = sorted(samples)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    result = {
+        "count": len(ordered),
+        "throughput_per_s": round(len(ordered) / elapsed, 1) if elapsed else None,
+        "mean_ms": ms(sum(ordered) / len(ordered)),
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if traced_peak is not None:
+        result["traced_peak_mb"] = round(traced_peak / 2**20, 1)
+    return result
+
+
+def measure(operation, count, trace_memory=False):
+    # operation(i) chạy một lần thao tác; GC bị tắt trong lúc đo để không dồn vào vài mẫu ngẫu nhiên
+    samples = []
+    if trace_memory:
+        tracemalloc.start()
+    gc.collect()
+    gc.disable()
+    start = time.perf_counter()
+    try:
+        for i in range(count):
+            t = time.perf_counter()
+            operation(i)
+            samples.append(time.perf_counter() - t)
+    finally:
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return summarize(samples, elapsed, traced_peak)
+
+
+def operations(service, rng, usernames):
+    # (tên, hàm(i)) theo thứ tự chạy; thao tác ghi chạy sau thao tác đọc
+    book_ids = list(service.catalog.book_ids())
+    terms = [rng.choice(WORDS) for _ in range(64)] + [word[:3].lower() for word in rng.sample(WORDS, 16)]
+
+    def search(i):
+        category = rng.choice(CATEGORIES) if i % 3 == 0 else None
+        service.search_books(rng.choice(terms), category, 0, 50)
+
+    def list_books(i):
+        # Mỗi lượt đổi cột sắp xếp; lần đầu mỗi cột phải sắp cả danh sách, sau đó dùng bộ đệm
+        service.list_books(rng.randrange(max(1, len(book_ids) - 50)), 50, rng.choice(BOOK_SORT_FIELDS), i % 2 == 1)
+
+    def list_borrows(i):
+        # Như update_borrow_list: thủ thư xem tất cả, độc giả xem lượt của mình
+        username = rng.choice(usernames) if i % 2 else None
+        service.list_borrows(0, 50, username, rng.choice(BORROW_SORT_FIELDS), False)
+
+    def borrow_return(i):
+        # Mượn rồi trả: hai lần ghi xuống kho (save_data)
+        for _ in range(10):
+            try:
+                borrow = service.borrow_book(rng.choice(book_ids), rng.choice(usernames))
+                break
+            except ServiceError:
+                continue
+        else:
+            return
+        service.return_book(borrow["id"])
+
+    def login(i):
+        service.login(rng.choice(usernames), PASSWORD)
+
+    def analytics(i):
+        # Lần đầu dựng các cột NumPy; mỗi khoảng ngày mới là một lần gom nhóm, khoảng đã xem lấy từ bộ đệm
+        service.analytics((TODAY - timedelta(days=rng.randrange(720))).isoformat(), None)
+
+    found = [
+        ("get_book", lambda i: service.get_book(rng.choice(book_ids))),
+        ("search_books", search),
+        ("list_books", list_books),
+        ("list_borrows", list_borrows),
+        ("list_overdue", lambda i: service.list_overdue(0, 50)),
+        ("stats", lambda i: service.stats()),
+        ("borrow_return", borrow_return),
+        ("login", login),
+    ]
+    if NUMPY_AVAILABLE:
+        found.append(("analytics", analytics))
+    return found
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, meta, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nSo với {baseline_path} (commit {baseline['meta'].get('commit')}): + là chậm hơn")
+    differs = [key for key in ("backend", "books", "borrows", "users", "seed") if baseline["meta"].get(key) != meta[key]]
+    if differs:
+        print(f"  Lưu ý: khác cấu hình ({', '.join(differs)}), số liệu không so trực tiếp được")
+    for name, current in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        deltas = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if before.get(key):
+                deltas.append(f"{key[:-3]} {(current[key] - before[key]) / before[key]:+7.1%}")
+        print(f"  {name:16} " + "  ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=1000, help="quy mô: 1000 đến 1000000 đầu sách")
+    parser.add_argument("--borrows", type=int, help="mặc định 3 lượt mỗi sách")
+    parser.add_argument("--readers", type=int)
+    parser.add_argument("--seed", type=int, default=23)
+    parser.add_argument("--backend", choices=["json", "journal", "sqlite"], default="json")
+    parser.add_argument("--ops", type=int, default=500, help="số lần mỗi thao tác đọc")
+    parser.add_argument("--write-ops", type=int, default=50, help="số lần mượn/trả")
+    parser.add_argument("--login-ops", type=int, default=10, help="đăng nhập chậm có chủ đích (băm mật khẩu)")
+    parser.add_argument("--trace-memory", action="store_true", help="đo cả bộ nhớ Python cấp phát (chậm hơn)")
+    parser.add_argument("--output", help="ghi kết quả JSON ra file")
+    parser.add_argument("--compare", help="file JSON kết quả cũ để so sánh")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    books, borrows, users = generate(args.books, args.borrows, args.readers, args.seed)
+    usernames = [user["username"] for user in users if user["role"] == "docgia"]
+    counts = {"books": len(books), "borrows": len(borrows), "users": len(users)}
+    print(f"Sinh {counts['books']} sách, {counts['borrows']} lượt mượn, {counts['users']} người dùng "
+          f"trong {time.perf_counter() - start:.1f}s; kiểu lưu trữ {args.backend}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        write_dataset(directory, books, borrows, users, args.backend)
+        del books, borrows, users
+        holder = []
+        results["load"] = measure(lambda i: holder.append(LibraryService(open_backend(args.backend, directory))),
+                                  1, args.trace_memory)
+        service = holder[0]
+        rng = random.Random(args.seed)
+        for name, operation in operations(service, rng, usernames):
+            count = {"borrow_return": args.write_ops, "login": args.login_ops, "analytics": args.login_ops}.get(name, args.ops)
+            results[name] = measure(operation, count, args.trace_memory)
+        service.close()
+
+    print(f"\n{'thao tác':16} {'lần':>6} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, r in results.items():
+        print(f"{name:16} {r['count']:6} {r['throughput_per_s'] or 0:10.1f} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} "
+              f"{r['p99_ms']:9.3f} {r['max_ms']:9.3f}")
+    print(f"Bộ nhớ đỉnh của tiến trình: {peak_rss_mb()} MiB")
+
+    meta = {"commit": git_commit(), "time": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "backend": args.backend, "seed": args.seed, **counts}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"Đã ghi {args.output}")
+    if args.compare:
+        compare(results, meta, args.compare)
+
+
+if __name__ == "__main__":
+    main()
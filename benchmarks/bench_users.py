@@ -0,0 +1,62 @@
+# Đo thông lượng đăng ký/đăng nhập của UserDirectory
+# Chạy: python benchmarks/bench_users.py --users 2000 --backend json --scheme scrypt
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import users as users_module
+from storage import JsonStorage, SqliteStorage
+from users import UserDirectory
+
+
+def open_backend(backend, directory):
+    if backend == "sqlite":
+        return SqliteStorage(os.path.join(directory, "library.db"))
+    return JsonStorage(os.path.join(directory, "books.json"), os.path.join(directory, "borrows.json"),
+                       os.path.join(directory, "users.json"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--scheme", choices=["scrypt", "pbkdf2_sha256"], default=users_module.PASSWORD_SCHEME)
+    parser.add_argument("--scrypt-n", type=int, default=users_module.SCRYPT_N)
+    parser.add_argument("--pbkdf2-iterations", type=int, default=users_module.PBKDF2_ITERATIONS)
+    args = parser.parse_args()
+
+    users_module.PASSWORD_SCHEME = args.scheme
+    users_module.SCRYPT_N = args.scrypt_n
+    users_module.PBKDF2_ITERATIONS = args.pbkdf2_iterations
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = open_backend(args.backend, directory)
+        directory_ = UserDirectory(storage)
+
+        start = time.perf_counter()
+        for i in range(args.users):
+            directory_.register(f"user{i}", f"pw{i}", role="docgia", name=f"Người Dùng {i}",
+                                phone="0900000000", email=f"user{i}@example.com", address="Hà Nội")
+        elapsed = time.perf_counter() - start
+        print(f"Đăng ký: {args.users} tài khoản trong {elapsed:.2f}s ({args.users / elapsed:.0f}/s)")
+
+        start = time.perf_counter()
+        directory_ = UserDirectory(storage)
+        print(f"Nạp danh bạ: {len(directory_)} tài khoản trong {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        logins = min(args.logins, args.users)
+        start = time.perf_counter()
+        for i in range(logins):
+            assert directory_.authenticate(f"user{i}", f"pw{i}")
+        elapsed = time.perf_counter() - start
+        print(f"Đăng nhập: {logins} lần trong {elapsed:.2f}s ({logins / elapsed:.0f}/s, {elapsed / logins * 1000:.1f} ms/lần)")
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Sinh dữ liệu thư viện giả lập, tất định theo seed: sách nhiều bản sao, độc giả, lượt mượn nhất quán với số bản có sẵn
+# Chạy riêng để tạo thư mục dữ liệu: python benchmarks/datagen.py /tmp/lib --books 100000 --backend sqlite
+import argparse
+import os
+import random
+import sys
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import new_copy_ids
+from serializers import write_snapshot
+from storage import JsonStorage, SqliteStorage, migrate_json_to_sqlite
+from users import hash_password
+
+WORDS = ["Dế", "Mèn", "Phiêu", "Lưu", "Ký", "Số", "Đỏ", "Truyện", "Kiều", "Lịch", "Sử", "Việt", "Nam", "Khoa",
+         "Học", "Máy", "Tính", "Kinh", "Tế", "Tâm", "Lý", "Nghệ", "Thuật", "Ánh", "Sáng", "Biển", "Núi", "Rừng",
+         "Thành", "Phố", "Mùa", "Xuân", "Hạ", "Thu", "Đông", "Người", "Thầy", "Trò", "Giấc", "Mơ", "Đường",
+         "Về", "Quê", "Hương", "Bóng", "Đêm", "Ngày", "Mới", "Chiến", "Tranh", "Hòa", "Bình", "Tuổi", "Thơ",
+         "Dữ", "Liệu", "Lập", "Trình", "Toán", "Vật", "Hóa", "Sinh", "Địa", "Văn", "Triết"]
+CATEGORIES = ["Văn Học", "Khoa Học", "Lịch Sử", "Kinh Tế", "Thiếu Nhi", "Công Nghệ", "Tâm Lý", "Nghệ Thuật",
+              "Triết Học", "Giáo Trình", "Ngoại Ngữ", "Y Học"]
+SURNAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ", "Hồ", "Ngô"]
+GIVEN = ["An", "Bình", "Châu", "Dũng", "Giang", "Hà", "Hải", "Hùng", "Khánh", "Lan", "Linh", "Minh", "Nam",
+         "Ngọc", "Phúc", "Quang", "Sơn", "Tâm", "Thảo", "Trang", "Tuấn", "Vy"]
+PASSWORD = "benchmark"
+TODAY = date(2025, 6, 1)
+
+
+def new_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate(books=1000, borrows=None, readers=None, seed=23, max_copies=3, active_ratio=0.05):
+    # Trả về (sách, lượt mượn, độc giả) dạng dict như trong file JSON; mặc định 3 lượt mượn mỗi sách
+    rng = random.Random(seed)
+    # Ngày trả sinh từ dãy ngẫu nhiên riêng để phần dữ liệu còn lại giống hệt các phiên bản trước (so --compare)
+    returns = random.Random(seed + 1)
+    borrows = books * 3 if borrows is None else borrows
+    readers = max(10, books // 20) if readers is None else readers
+    authors = [f"{rng.choice(SURNAMES)} {rng.choice(GIVEN)} {i}" for i in range(max(1, books // 10))]
+    usernames = [f"docgia{i}" for i in range(readers)]
+
+    book_list = []
+    for i in range(books):
+        book_id = new_id(rng)
+        copies = new_copy_ids(book_id, 1, rng.randint(1, max_copies))
+        book_list.append({"id": book_id, "title": " ".join(rng.sample(WORDS, rng.randint(2, 5))) + f" {i}",
+                          "author": rng.choice(authors), "category": rng.choice(CATEGORIES), "status": "available",
+                          "copies": copies, "available": len(copies)})
+
+    # Lượt mượn cũ đã trả, phần cuối còn đang mượn (một số đã quá hạn); mỗi bản sao chỉ một lượt chưa trả
+    borrow_list = []
+    on_loan = set()
+    first_active = int(borrows * (1 - active_ratio))
+    for i in range(borrows):
+        book = rng.choice(book_list)
+        copy_id = rng.choice(book["copies"])
+        active = i >= first_active and copy_id not in on_loan
+        borrowed = TODAY - timedelta(days=rng.randrange(30 if active else 720))
+        if active:
+            on_loan.add(copy_id)
+            book["available"] -= 1
+            book["status"] = "available" if book["available"] else "borrowed"
+        borrow = {"id": new_id(rng), "book_id": book["id"], "copy_id": copy_id,
+                  "username": rng.choice(usernames), "borrow_date": borrowed.isoformat(),
+                  "due_date": (borrowed + timedelta(days=14)).isoformat(), "returned": not active}
+        if not active:
+            # Phần lớn trả đúng hạn, khoảng 1/6 trả muộn đến hai tuần
+            loan_days = returns.randint(15, 28) if returns.random() < 1 / 6 else returns.randint(1, 14)
+            borrow["return_date"] = min(TODAY, borrowed + timedelta(days=loan_days)).isoformat()
+        borrow_list.append(borrow)
+
+    # Mọi độc giả dùng chung một mật khẩu nên chỉ băm một lần (băm chậm có chủ đích)
+    password = hash_password(PASSWORD)
+    user_list = [{"username": "admin", "password": password, "role": "admin", "name": "Quản Trị",
+                  "phone": "0900000000", "email": "admin@example.com", "address": "Hà Nội"}]
+    for username in usernames:
+        user_list.append({"username": username, "password": password, "role": "docgia",
+                          "name": f"{rng.choice(SURNAMES)} {rng.choice(GIVEN)}", "phone": f"09{rng.randrange(10**8):08d}",
+                          "email": f"{username}@example.com", "address": "Hà Nội"})
+    return book_list, borrow_list, user_list
+
+
+def json_files(directory):
+    return [os.path.join(directory, name) for name in ("books.json", "borrows.json", "users.json")]
+
+
+def write_dataset(directory, books, borrows, users, backend="json"):
+    # Ghi thẳng file (không qua LibraryService) để dựng dữ liệu lớn nhanh; sqlite chuyển từ bộ file JSON
+    os.makedirs(directory, exist_ok=True)
+    for path, data in zip(json_files(directory), (books, borrows, users)):
+        write_snapshot(path, data)
+    if backend == "sqlite":
+        target = SqliteStorage(os.path.join(directory, "library.db"))
+        migrate_json_to_sqlite(JsonStorage(*json_files(directory)), target)
+        target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sinh dữ liệu thư viện giả lập")
+    parser.add_argument("directory")
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--borrows", type=int)
+    parser.add_argument("--readers", type=int)
+    parser.add_argument("--seed", type=int, default=23)
+    parser.add_argument("--backend", choices=["json", "journal", "sqlite"], default="json")
+    args = parser.parse_args()
+
+    books, borrows, users = generate(args.books, args.borrows, args.readers, args.seed)
+    write_dataset(args.directory, books, borrows, users, args.backend)
+    print(f"Đã sinh {len(books)} sách, {len(borrows)} lượt mượn, {len(users)} người dùng vào {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Máy chủ giả lập Google Books cho chạy thử ngoại tuyến: /volumes trả kết quả tất định theo truy vấn,
+# /covers/<n>.jpg trả ảnh bìa JPEG cỡ thật; có thể thêm độ trễ và lỗi 503 ngẫu nhiên để thử cơ chế thử lại
+# Chạy: python benchmarks/fixture_server.py --port 8800 --latency 50
+#       python enrich.py --api-url http://127.0.0.1:8800/volumes
+import argparse
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+COVER_SIZE = (400, 600)
+
+
+def cover_jpeg(number):
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(number)
+    top, bottom = [rng.randrange(256) for _ in range(3)], [rng.randrange(256) for _ in range(3)]
+    img = Image.new("RGB", COVER_SIZE)
+    draw = ImageDraw.Draw(img)
+    for y in range(COVER_SIZE[1]):
+        t = y / COVER_SIZE[1]
+        draw.line([(0, y), (COVER_SIZE[0], y)], fill=tuple(int(a + (b - a) * t) for a, b in zip(top, bottom)))
+    draw.rectangle([40, 80, COVER_SIZE[0] - 40, 200], outline=(255, 255, 255), width=6)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def volume(query, base_url, covers):
+    # Cùng truy vấn luôn ra cùng kết quả; số ảnh bìa khác nhau có hạn để thấy kho ảnh gộp ảnh trùng
+    digest = int(hashlib.sha256(query.encode("utf-8")).hexdigest(), 16)
+    title = query.split("intitle:", 1)[-1].split(" inauthor:", 1)[0] if "intitle:" in query else f"Sách {digest % 10**6}"
+    return {"volumeInfo": {
+        "title": title,
+        "authors": [f"Tác Giả {digest % 997}"],
+        "categories": ["Chung"],
+        "description": f"Mô tả giả lập cho truy vấn '{query}'.",
+        "industryIdentifiers": [{"type": "ISBN_13", "identifier": f"978{digest % 10**10:010d}"}],
+        "imageLinks": {"thumbnail": f"{base_url}/covers/{digest % covers}.jpg"},
+    }}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+            failed = server.rng.random() < server.error_rate
+        if failed:
+            return self.reply(503, b'{"error": "try again later"}', "application/json")
+        url = urlsplit(self.path)
+        if url.path == "/volumes":
+            query = parse_qs(url.query).get("q", [""])[0]
+            data = {"totalItems": 1, "items": [volume(query, server.base_url, server.covers)]}
+            return self.reply(200, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+        if url.path.startswith("/covers/") and url.path.endswith(".jpg"):
+            number = int(url.path[len("/covers/"):-4])
+            with server.lock:
+                image = server.images.get(number)
+                if image is None:
+                    image = server.images[number] = cover_jpeg(number)
+            return self.reply(200, image, "image/jpeg")
+        self.reply(404, b'{"error": "not found"}', "application/json")
+
+    def reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start(port=0, latency=0.0, error_rate=0.0, covers=50, seed=23):
+    # Chạy trên luồng nền; trả về (máy chủ, địa chỉ API /volumes). Dừng bằng server.shutdown()
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    server.daemon_threads = True
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.latency = latency
+    server.error_rate = error_rate
+    server.covers = covers
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.images = {}
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server, server.base_url + "/volumes"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0, help="độ trễ mỗi yêu cầu (ms)")
+    parser.add_argument("--error-rate", type=float, default=0, help="tỉ lệ trả lỗi 503, từ 0 đến 1")
+    parser.add_argument("--covers", type=int, default=50, help="số ảnh bìa khác nhau")
+    args = parser.parse_args()
+    server, api_url = start(args.port, args.latency / 1000, args.error_rate, args.covers)
+    print(f"Máy chủ giả lập: {api_url} (Ctrl+C để dừng)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# Nhập/xuất hàng loạt sách và lượt mượn dạng CSV hoặc JSON-lines, đọc/ghi từng dòng
+# Chạy: python bulk.py import books catalog.csv --batch 5000
+#       python bulk.py export borrows borrows.jsonl
+#       python bulk.py merge books   (gộp các bản ghi trùng tiêu đề/tác giả thành một đầu sách nhiều bản)
+#       python bulk.py import books q1.csv --branch q1   (nhập thẳng vào kho chi nhánh, xem shards.py)
+import argparse
+import csv
+import json
+import os
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import datetime
+
+from catalog import available_of, copies_of, new_copy_ids
+from config import BRANCHES, BULK_BATCH_SIZE, DATA_DIR
+from records import plain
+from service import LibraryService
+
+BOOK_FIELDS = ("id", "title", "author", "category", "status", "isbn", "description", "cover_url", "thumbnail",
+               "copies", "available")
+BORROW_FIELDS = ("id", "book_id", "copy_id", "username", "borrow_date", "due_date", "returned", "return_date")
+MAX_REPORTED_ERRORS = 10
+
+
+def is_csv(path):
+    return path.lower().endswith(".csv")
+
+
+def read_rows(path):
+    # Trả về (số dòng, bản ghi hoặc None nếu dòng JSON hỏng); không nạp cả file vào bộ nhớ
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if is_csv(path):
+            for number, row in enumerate(csv.DictReader(f), 2):
+                yield number, row
+            return
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def parse_date(value, name):
+    try:
+        return datetime.strptime(clean(value) or "", "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"{name} không đúng định dạng YYYY-MM-DD")
+
+
+def parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "x")
+    return bool(value)
+
+
+def parse_copies(value, book_id):
+    # JSON-lines có thể mang danh sách mã bản sao; CSV chỉ ghi số bản
+    if isinstance(value, list):
+        copies = [str(c) for c in value]
+    else:
+        try:
+            count = int(clean(value) or 1)
+        except ValueError:
+            raise ValueError("copies phải là số nguyên")
+        copies = new_copy_ids(book_id, 1, count)
+    if not copies:
+        raise ValueError("đầu sách phải có ít nhất một bản sao")
+    return copies
+
+
+def book_from_row(row):
+    if not isinstance(row, dict):
+        raise ValueError("dòng không hợp lệ")
+    title, author = clean(row.get("title")), clean(row.get("author"))
+    if not title or not author:
+        raise ValueError("thiếu tiêu đề hoặc tác giả")
+    # Trạng thái mượn và số bản có sẵn được suy ra từ các lượt mượn nhập sau, không lấy từ file
+    book_id = clean(row.get("id")) or str(uuid.uuid4())
+    copies = parse_copies(row.get("copies"), book_id)
+    book = {
+        "id": book_id,
+        "title": title,
+        "author": author,
+        "category": clean(row.get("category")) or "Chung",
+        "status": "available",
+        "copies": copies,
+        "available": len(copies)
+    }
+    for field in ("isbn", "description", "cover_url", "thumbnail"):
+        if clean(row.get(field)):
+            book[field] = clean(row[field])
+    return book
+
+
+def borrow_from_row(row):
+    if not isinstance(row, dict):
+        raise ValueError("dòng không hợp lệ")
+    book_id, username = clean(row.get("book_id")), clean(row.get("username"))
+    if not book_id or not username:
+        raise ValueError("thiếu mã sách hoặc tên đăng nhập")
+    borrow = {
+        "id": clean(row.get("id")) or str(uuid.uuid4()),
+        "book_id": book_id,
+        "username": username,
+        "borrow_date": parse_date(row.get("borrow_date"), "borrow_date"),
+        "due_date": parse_date(row.get("due_date"), "due_date"),
+        "returned": parse_bool(row.get("returned"))
+    }
+    # Không ghi mã bản sao: dùng mã sách như dữ liệu cũ (một bản mỗi đầu sách)
+    if clean(row.get("copy_id")):
+        borrow["copy_id"] = clean(row["copy_id"])
+    if borrow["returned"] and clean(row.get("return_date")):
+        borrow["return_date"] = parse_date(row["return_date"], "return_date")
+    return borrow
+
+
+def import_rows(service, kind, path, batch_size=BULK_BATCH_SIZE, report=print):
+    # Kiểm tra từng dòng, gom thành lô và lưu mỗi lô một lần; trùng id/tiêu đề/ISBN do dịch vụ loại
+    parse = book_from_row if kind == "books" else borrow_from_row
+    store = service.import_books if kind == "books" else service.import_borrows
+    counts = {"rows": 0, "added": 0, "skipped": 0, "invalid": 0}
+    batch = []
+    start = time.perf_counter()
+
+    def flush():
+        added = store(batch)
+        counts["added"] += added
+        counts["skipped"] += len(batch) - added
+        batch.clear()
+        elapsed = time.perf_counter() - start
+        report(f"Đã xử lý {counts['rows']} dòng ({counts['rows'] / elapsed:.0f} dòng/s)")
+
+    # Kho JSON ghi lại cả file mỗi lần lưu: lưu theo lô thành O(số dòng² / lô) byte ghi. Các lô vẫn được áp
+    # vào catalog rồi bỏ (bộ nhớ không đổi theo kích thước file), nhưng chỉ ghi file một lần ở cuối
+    with service.deferred_save() if service.storage.rewrites_snapshot else nullcontext():
+        for number, row in read_rows(path):
+            counts["rows"] += 1
+            try:
+                batch.append(parse(row))
+            except ValueError as e:
+                counts["invalid"] += 1
+                if counts["invalid"] <= MAX_REPORTED_ERRORS:
+                    report(f"Dòng {number}: {e}")
+                continue
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    counts["seconds"] = time.perf_counter() - start
+    return counts
+
+
+def export_rows(service, kind, path):
+    # Ghi lần lượt từng bản ghi từ catalog, không dựng danh sách trung gian
+    count = 0
+    with service.lock, open(path, "w", newline="", encoding="utf-8") as f:
+        records = service.catalog.iter_books() if kind == "books" else service.catalog.iter_borrows()
+        if is_csv(path):
+            writer = csv.DictWriter(f, fieldnames=BOOK_FIELDS if kind == "books" else BORROW_FIELDS,
+                                    extrasaction="ignore")
+            writer.writeheader()
+            if kind == "books":
+                # CSV chỉ ghi số bản sao; mã từng bản nằm trong bản xuất JSON-lines
+                write = lambda book: writer.writerow(dict(book, copies=len(copies_of(book)),
+                                                          available=available_of(book)))
+            else:
+                write = lambda borrow: writer.writerow(borrow.to_dict())
+        else:
+            write = lambda record: f.write(json.dumps(record, ensure_ascii=False, default=plain) + "\n")
+        for record in records:
+            write(record)
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nhập/xuất sách và lượt mượn (CSV hoặc JSON-lines)")
+    parser.add_argument("action", choices=["import", "export", "merge"])
+    parser.add_argument("kind", choices=["books", "borrows"])
+    parser.add_argument("path", nargs="?", help="file .csv, hoặc .jsonl cho JSON-lines")
+    parser.add_argument("--batch", type=int, default=BULK_BATCH_SIZE, help="số dòng mỗi lần lưu (kho JSON lưu một lần ở cuối)")
+    parser.add_argument("--branch", choices=BRANCHES or None, help="làm việc trên kho của một chi nhánh thay cho kho chung")
+    args = parser.parse_args()
+    if args.action != "merge" and not args.path:
+        parser.error("cần đường dẫn file để nhập/xuất")
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if args.branch:
+        from shards import open_branch_storage
+        service = LibraryService(open_branch_storage(args.branch))
+    else:
+        service = LibraryService()
+    try:
+        if args.action == "merge":
+            print(f"Đã gộp {service.merge_duplicate_titles()} bản ghi trùng vào đầu sách tương ứng")
+        elif args.action == "import":
+            counts = import_rows(service, args.kind, args.path, args.batch)
+            rate = counts["rows"] / counts["seconds"] if counts["seconds"] else 0
+            print(f"Nhập {counts['added']} / {counts['rows']} dòng trong {counts['seconds']:.2f}s ({rate:.0f} dòng/s); "
+                  f"bỏ qua {counts['skipped']} dòng trùng/không khớp, {counts['invalid']} dòng lỗi")
+        else:
+            start = time.perf_counter()
+            count = export_rows(service, args.kind, args.path)
+            elapsed = time.perf_counter() - start
+            print(f"Xuất {count} dòng ra {args.path} trong {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f} dòng/s)")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+# Kho dữ liệu sách/mượn trong bộ nhớ, có chỉ mục băm để tra cứu O(1)
+from datetime import date
+from sys import intern
+
+from records import Book, Borrow
+
+
+def copies_of(book):
+    # Mỗi đầu sách có nhiều bản sao; sách cũ (chưa tách bản sao) là một bản mang chính id của sách
+    return book.get("copies") or [book["id"]]
+
+
+def new_copy_ids(book_id, start, count):
+    # Bản thứ nhất mang chính id của sách để lượt mượn cũ (không có copy_id) vẫn trỏ đúng bản sao
+    return [book_id if n == 1 else f"{book_id}-{n}" for n in range(start, start + count)]
+
+
+def available_of(book):
+    if "available" in book:
+        return book["available"]
+    return 1 if book["status"] == "available" else 0
+
+
+def copy_of(borrow):
+    return borrow.get("copy_id", borrow["book_id"])
+
+
+class Catalog:
+    def __init__(self, books=None, borrows=None):
+        self.listeners = []
+        self.version = 0
+        self.load(books or [], borrows or [])
+
+    def load(self, books, borrows):
+        self.books_by_id = {}
+        self.borrows_by_id = {}
+        self.borrows_by_user = {}
+        self.active_by_book = {}
+        self.active_by_copy = {}
+        self.free_copies = {}
+        self.changes = {}
+        self.bases = {}
+        self.version += 1
+        for book in books:
+            book = Book(book)
+            self.books_by_id[book.id] = book
+        for borrow in borrows:
+            self._index_borrow(self._borrow(borrow))
+        for book in self.books_by_id.values():
+            self._index_copies(book)
+        for listener in self.listeners:
+            listener.on_load(self)
+
+    def subscribe(self, listener):
+        # listener cần có on_load(catalog) và on_change(kind, record_id, record)
+        self.listeners.append(listener)
+        listener.on_load(self)
+
+    def _borrow(self, data):
+        # Mã sách/bản sao trỏ về đúng đối tượng chuỗi của sách để một triệu lượt mượn không giữ một triệu bản sao chuỗi
+        borrow = Borrow(data)
+        book = self.books_by_id.get(borrow.book_id)
+        if book is not None:
+            borrow.book_id = book.id
+            copy_id = borrow.get("copy_id")
+            if copy_id is not None:
+                borrow.copy_id = next((c for c in copies_of(book) if c == copy_id), copy_id)
+        return borrow
+
+    def _index_borrow(self, borrow):
+        self.borrows_by_id[borrow["id"]] = borrow
+        self.borrows_by_user.setdefault(borrow["username"], {})[borrow["id"]] = borrow
+        if not borrow["returned"]:
+            self.active_by_book.setdefault(borrow["book_id"], {})[borrow["id"]] = borrow
+            self.active_by_copy[copy_of(borrow)] = borrow
+
+    def _unindex_borrow(self, borrow):
+        self.borrows_by_user.get(borrow["username"], {}).pop(borrow["id"], None)
+        active = self.active_by_book.get(borrow["book_id"])
+        if active is not None and active.pop(borrow["id"], None) is not None and not active:
+            del self.active_by_book[borrow["book_id"]]
+        if self.active_by_copy.get(copy_of(borrow)) is borrow:
+            del self.active_by_copy[copy_of(borrow)]
+
+    def _index_copies(self, book):
+        # Bản sao rảnh = không ai đang mượn và không được giữ cho người đặt trước; O(số bản của một đầu sách)
+        held = set(book.get("holds", {}).values())
+        self.free_copies[book["id"]] = {c for c in copies_of(book) if c not in self.active_by_copy and c not in held}
+
+    def _begin(self, kind, record_id, record):
+        # Giữ bản gốc trước lần sửa đầu tiên: lớp lưu trữ so phiên bản, xung đột thì hoàn tác về đây.
+        # Hàng đợi/bản giữ được chép riêng nên các hàm bên dưới sửa trực tiếp được
+        key = (kind, record_id)
+        if key not in self.bases:
+            self.bases[key] = None if record is None else {
+                k: v.copy() if isinstance(v, (list, dict)) else v for k, v in record.items()}
+
+    def _touch(self, kind, record_id, record):
+        # Ghi nhận bản ghi thay đổi (None = đã xóa) để lớp lưu trữ chỉ ghi phần này
+        key = (kind, record_id)
+        self.bases.setdefault(key, None)
+        if record is not None:
+            base = self.bases[key]
+            record["version"] = (base.get("version", 0) if base else 0) + 1
+        self.changes[key] = record
+        self._notify(kind, record_id, record)
+
+    def _notify(self, kind, record_id, record):
+        self.version += 1
+        for listener in self.listeners:
+            listener.on_change(kind, record_id, record)
+
+    def drain_changes(self):
+        # {(kind, id): (bản ghi mới hoặc None, bản gốc hoặc None)}
+        changes = {key: (record, self.bases.get(key)) for key, record in self.changes.items()}
+        self.changes = {}
+        self.bases = {}
+        return changes
+
+    def rollback(self, changes):
+        # Trả các bản ghi về trạng thái trước khi sửa (khi lưu bị xung đột)
+        for (kind, record_id), (_, base) in changes.items():
+            self.replace(kind, record_id, base)
+
+    def replace(self, kind, record_id, record):
+        # Áp bản ghi từ bên ngoài (tiến trình khác/hoàn tác) mà không đánh dấu là thay đổi cần lưu
+        if kind == "book":
+            record = Book(record) if record is not None else None
+            if record is None:
+                self.books_by_id.pop(record_id, None)
+                self.free_copies.pop(record_id, None)
+            else:
+                self.books_by_id[record_id] = record
+                self._index_copies(record)
+        else:
+            record = self._borrow(record) if record is not None else None
+            old = self.borrows_by_id.get(record_id)
+            if old is not None:
+                self._unindex_borrow(old)
+            if record is None:
+                self.borrows_by_id.pop(record_id, None)
+            else:
+                self._index_borrow(record)
+            for borrow in (old, record):
+                book = self.books_by_id.get(borrow["book_id"]) if borrow else None
+                if book is not None:
+                    self._index_copies(book)
+        self._notify(kind, record_id, record)
+
+    # --- Sách ---
+
+    def iter_books(self):
+        return iter(self.books_by_id.values())
+
+    def book_ids(self):
+        return self.books_by_id.keys()
+
+    def book_count(self):
+        return len(self.books_by_id)
+
+    def get_book(self, book_id):
+        return self.books_by_id.get(book_id)
+
+    def add_book(self, book):
+        book = Book(book)
+        self._begin("book", book["id"], self.books_by_id.get(book["id"]))
+        self.books_by_id[book["id"]] = book
+        self._index_copies(book)
+        self._touch("book", book["id"], book)
+        return book
+
+    def update_book(self, book_id, **fields):
+        book = self.books_by_id.get(book_id)
+        if book is None:
+            return None
+        self._begin("book", book_id, book)
+        book.update(fields)
+        self._index_copies(book)
+        self._touch("book", book_id, book)
+        return book
+
+    def delete_book(self, book_id):
+        book = self.books_by_id.pop(book_id, None)
+        if book is not None:
+            self._begin("book", book_id, book)
+            self.free_copies.pop(book_id, None)
+            self._touch("book", book_id, None)
+        return book
+
+    # --- Bản sao và đặt trước ---
+
+    def free_copy(self, book_id):
+        free = self.free_copies.get(book_id)
+        return next(iter(free)) if free else None
+
+    def copy_on_loan(self, copy_id):
+        return self.active_by_copy.get(copy_id)
+
+    def _release_copy(self, book, copy_id):
+        # Bản sao rảnh ra: giao ngay cho người đặt trước đầu hàng đợi, không thì cộng vào số bản có sẵn.
+        # Hàng đợi là dict theo thứ tự chèn nên lấy và xóa người đầu tiên là O(1)
+        reservations = book.get("reservations")
+        if reservations:
+            username = next(iter(reservations))
+            del reservations[username]
+            book.setdefault("holds", {})[username] = copy_id
+            return username
+        book["available"] = available_of(book) + 1
+        self.free_copies.setdefault(book["id"], set()).add(copy_id)
+        return None
+
+    def _update_status(self, book):
+        book["status"] = "available" if available_of(book) > 0 else "borrowed"
+
+    def add_copies(self, book_id, copy_ids):
+        book = self.books_by_id.get(book_id)
+        if book is None:
+            return None
+        self._begin("book", book_id, book)
+        existing = copies_of(book)
+        if "copies" not in book:
+            book["available"] = available_of(book)
+        book["copies"] = existing + list(copy_ids)
+        for copy_id in copy_ids:
+            self._release_copy(book, copy_id)
+        self._update_status(book)
+        self._touch("book", book_id, book)
+        return book
+
+    def reserve(self, book_id, username):
+        # Trả về vị trí trong hàng đợi, None nếu không có sách
+        book = self.books_by_id.get(book_id)
+        if book is None:
+            return None
+        self._begin("book", book_id, book)
+        book.setdefault("reservations", {})[username] = date.today().isoformat()
+        self._touch("book", book_id, book)
+        return len(book["reservations"])
+
+    def cancel_reservation(self, book_id, username):
+        # Bỏ khỏi hàng đợi, hoặc trả lại bản sao đang giữ cho người đó
+        book = self.books_by_id.get(book_id)
+        if book is None:
+            return False
+        reservations, holds = book.get("reservations", {}), book.get("holds", {})
+        if username not in reservations and username not in holds:
+            return False
+        self._begin("book", book_id, book)
+        if username in reservations:
+            del book["reservations"][username]
+        else:
+            copy_id = book["holds"].pop(username)
+            self._release_copy(book, copy_id)
+            self._update_status(book)
+        self._touch("book", book_id, book)
+        return True
+
+    # --- Mượn/trả ---
+
+    def iter_borrows(self):
+        return iter(self.borrows_by_id.values())
+
+    def borrow_ids(self):
+        return self.borrows_by_id.keys()
+
+    def borrow_count(self):
+        return len(self.borrows_by_id)
+
+    def get_borrow(self, borrow_id):
+        return self.borrows_by_id.get(borrow_id)
+
+    def borrows_of(self, username):
+        return self.borrows_by_user.get(username, {}).values()
+
+    def borrow_ids_of(self, username):
+        return self.borrows_by_user.get(username, {}).keys()
+
+    def active_borrow(self, book_id):
+        active = self.active_by_book.get(book_id)
+        return next(iter(active.values())) if active else None
+
+    def update_borrow(self, borrow_id, **fields):
+        borrow = self.borrows_by_id.get(borrow_id)
+        if borrow is None:
+            return None
+        self._begin("borrow", borrow_id, borrow)
+        self._unindex_borrow(borrow)
+        borrow.update(fields)
+        self._index_borrow(borrow)
+        self._touch("borrow", borrow_id, borrow)
+        return borrow
+
+    def add_borrow(self, borrow):
+        borrow = self._borrow(borrow)
+        self._begin("borrow", borrow["id"], self.borrows_by_id.get(borrow["id"]))
+        self._index_borrow(borrow)
+        self._touch("borrow", borrow["id"], borrow)
+        book = self.books_by_id.get(borrow["book_id"])
+        if book and not borrow["returned"]:
+            self._begin("book", book["id"], book)
+            copy_id = copy_of(borrow)
+            holds = book.get("holds", {})
+            if holds.get(borrow["username"]) == copy_id:
+                # Bản sao đã được giữ riêng cho người này nên không trừ vào số bản có sẵn
+                del holds[borrow["username"]]
+            else:
+                book["available"] = available_of(book) - 1
+                self.free_copies.get(book["id"], set()).discard(copy_id)
+            self._update_status(book)
+            self._touch("book", book["id"], book)
+        return borrow
+
+    def return_borrow(self, borrow_id, today=None):
+        # Trả về (lượt mượn, người đặt trước được giữ bản sao vừa trả hoặc None)
+        borrow = self.borrows_by_id.get(borrow_id)
+        if borrow is None or borrow["returned"]:
+            return None, None
+        self._begin("borrow", borrow_id, borrow)
+        self._unindex_borrow(borrow)
+        borrow["returned"] = True
+        borrow["return_date"] = intern(today or date.today().isoformat())
+        self._index_borrow(borrow)
+        self._touch("borrow", borrow_id, borrow)
+        held_for = None
+        book = self.books_by_id.get(borrow["book_id"])
+        if book:
+            self._begin("book", book["id"], book)
+            if copy_of(borrow) in copies_of(book):
+                held_for = self._release_copy(book, copy_of(borrow))
+            self._update_status(book)
+            self._touch("book", book["id"], book)
+        return borrow, held_for
@@ -0,0 +1,176 @@
+# Máy khách mỏng: cùng giao diện với LibraryService nhưng gọi máy chủ qua HTTP/JSON
+import threading
+
+import requests
+
+from config import REMINDER_DAYS
+from metrics import instrumented
+from service import OPERATIONS, ServiceError
+
+
+# Đo cả thời gian khứ hồi HTTP dưới tên "client.<tên>"
+@instrumented("client", names=OPERATIONS)
+class RemoteService:
+    def __init__(self, base_url, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        # Mã phiên máy chủ cấp khi đăng nhập, gửi kèm mọi yêu cầu sau đó
+        self.token = None
+        # requests.Session không an toàn khi dùng chung giữa các luồng: luồng Tk, tìm khi gõ, phân tích và nạp ảnh bìa
+        # mỗi luồng một phiên riêng (vẫn giữ kết nối keep-alive trong từng luồng)
+        self.local = threading.local()
+        self.sessions = []
+        self.sessions_lock = threading.Lock()
+
+    @property
+    def session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            with self.sessions_lock:
+                self.sessions.append(session)
+        return session
+
+    def request(self, method, path, params=None, body=None):
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else None
+        try:
+            response = self.session.request(method, self.base_url + path, params=params, json=body, headers=headers,
+                                            timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ServiceError(f"Không kết nối được máy chủ: {e}", 503)
+        if response.status_code >= 400:
+            try:
+                message = response.json()["error"]
+            except (ValueError, KeyError):
+                message = response.text
+            raise ServiceError(message, response.status_code)
+        if response.status_code == 204:
+            return None
+        if response.headers.get("Content-Type", "").startswith("image/"):
+            return response.content
+        return response.json()
+
+    def close(self):
+        with self.sessions_lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            session.close()
+
+    def refresh(self):
+        # Máy chủ là tiến trình duy nhất giữ dữ liệu: không có gì để đồng bộ
+        pass
+
+    # --- Sách ---
+
+    def list_books(self, offset=0, limit=50, sort=None, reverse=False):
+        params = {"offset": offset, "limit": limit, "reverse": int(reverse)}
+        if sort:
+            params["sort"] = sort
+        return self.request("GET", "/books", params)
+
+    def get_book(self, book_id):
+        return self.request("GET", f"/books/{book_id}")
+
+    def search_books(self, term="", category=None, offset=0, limit=50):
+        params = {"q": term, "offset": offset, "limit": limit}
+        if category:
+            params["category"] = category
+        return self.request("GET", "/search", params)
+
+    def categories(self):
+        return self.request("GET", "/categories")
+
+    def add_book(self, title, author, category, copies=1):
+        return self.request("POST", "/books", body={"title": title, "author": author, "category": category,
+                                                    "copies": copies})
+
+    def add_copies(self, book_id, count=1):
+        return self.request("POST", f"/books/{book_id}/copies", body={"count": count})
+
+    def merge_duplicate_titles(self):
+        return self.request("POST", "/books/merge")["merged"]
+
+    def import_books(self, books):
+        return self.request("POST", "/books/import", body={"books": books})["added"]
+
+    def edit_book(self, book_id, title, author, category):
+        return self.request("PUT", f"/books/{book_id}", body={"title": title, "author": author, "category": category})
+
+    def delete_book(self, book_id):
+        self.request("DELETE", f"/books/{book_id}")
+
+    def thumbnail(self, key):
+        return self.request("GET", f"/thumbnails/{key}")
+
+    # --- Mượn/trả ---
+
+    def list_borrows(self, offset=0, limit=50, username=None, sort=None, reverse=False):
+        params = {"offset": offset, "limit": limit, "reverse": int(reverse)}
+        if username is not None:
+            params["username"] = username
+        if sort:
+            params["sort"] = sort
+        return self.request("GET", "/borrows", params)
+
+    def get_borrow(self, borrow_id):
+        return self.request("GET", f"/borrows/{borrow_id}")
+
+    def borrow_book(self, book_id, username, loan_days=None):
+        return self.request("POST", "/borrows", body={"book_id": book_id, "username": username, "loan_days": loan_days})
+
+    def import_borrows(self, borrows):
+        return self.request("POST", "/borrows/import", body={"borrows": borrows})["added"]
+
+    def return_book(self, borrow_id):
+        return self.request("POST", f"/borrows/{borrow_id}/return")
+
+    # --- Đặt trước ---
+
+    def reserve_book(self, book_id, username):
+        return self.request("POST", f"/books/{book_id}/reservations", body={"username": username})
+
+    def cancel_reservation(self, book_id, username):
+        self.request("DELETE", f"/books/{book_id}/reservations", params={"username": username})
+
+    # --- Quá hạn ---
+
+    def list_overdue(self, offset=0, limit=50, username=None):
+        params = {"offset": offset, "limit": limit}
+        if username is not None:
+            params["username"] = username
+        return self.request("GET", "/borrows/overdue", params)
+
+    def overdue_notices(self, after=0):
+        return self.request("GET", "/borrows/overdue/notices", {"after": after})
+
+    def reminders(self, within_days=REMINDER_DAYS):
+        return self.request("GET", "/reminders", {"days": within_days})
+
+    # --- Người dùng ---
+
+    def has_users(self):
+        return self.request("GET", "/users/any")
+
+    def login(self, username, password):
+        user = self.request("POST", "/login", body={"username": username, "password": password})
+        self.token = user.pop("token")
+        return user
+
+    def register(self, username, password, role, name, phone, email, address):
+        return self.request("POST", "/register", body={
+            "username": username, "password": password, "role": role, "name": name,
+            "phone": phone, "email": email, "address": address})
+
+    # --- Thống kê ---
+
+    def stats(self):
+        return self.request("GET", "/stats")
+
+    def stats_chart(self, width=600, height=300):
+        return self.request("GET", "/stats/chart", {"width": width, "height": height})
+
+    def analytics(self, start=None, end=None):
+        return self.request("GET", "/analytics", {"start": start, "end": end})
+
+    def analytics_chart(self, start=None, end=None, width=600, height=300):
+        return self.request("GET", "/analytics/chart", {"start": start, "end": end, "width": width, "height": height})
@@ -0,0 +1,82 @@
+import os
+
+DATA_DIR = "data"
+DATA_FILE = "data/books.json"
+USER_FILE = "data/users.json"
+BORROW_FILE = "data/borrows.json"
+DB_FILE = "data/library.db"
+
+# "json" cho cài đặt nhỏ, "journal" để ghi O(1) trên file, "sqlite" cho thư viện lớn
+STORAGE_BACKEND = os.environ.get("LIBRARY_STORAGE", "json")
+
+# Định dạng ghi books/borrows/users: "json" (gọn, dùng orjson nếu đã cài), "json-indent" (thụt lề như bản cũ),
+# "msgpack" hoặc "pickle" (ảnh chụp nhị phân, nạp nhanh nhất). Khi đọc tự nhận ra định dạng của file
+SNAPSHOT_FORMAT = os.environ.get("LIBRARY_SNAPSHOT_FORMAT", "json")
+
+# Chi nhánh: LIBRARY_BRANCHES=q1,q3,thuduc chia dữ liệu thành các kho riêng data/branches/<tên>/ (tách từ kho chung
+# bằng python shards.py split). LIBRARY_BRANCH là chi nhánh của quầy này: quầy chỉ nạp kho của mình, quản trị viên
+# đăng nhập thì xem toàn hệ thống; không đặt thì nạp mọi chi nhánh (máy chủ). Người dùng vẫn chung trong data/
+BRANCHES = [name.strip() for name in os.environ.get("LIBRARY_BRANCHES", "").split(",") if name.strip()]
+BRANCH = os.environ.get("LIBRARY_BRANCH") or None
+BRANCH_DIR = "data/branches"
+
+# Nhật ký ghi trước cho kiểu lưu trữ "journal"
+JOURNAL_FILE = "data/journal.jsonl"
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+# Số lần thử lại khi mượn/trả bị quầy khác ghi chen (khóa lạc quan theo phiên bản bản ghi)
+CONFLICT_RETRIES = 3
+
+# Mượn sách: số ngày được mượn, tiền phạt mỗi ngày quá hạn (VNĐ), nhắc trước hạn bao nhiêu ngày
+LOAN_DAYS = int(os.environ.get("LIBRARY_LOAN_DAYS", "14"))
+FINE_PER_DAY = 5000
+REMINDER_DAYS = 2
+# Chu kỳ bộ lập lịch kiểm tra lượt mượn mới quá hạn (giây)
+OVERDUE_CHECK_SECONDS = 60
+
+# Số dòng mỗi lần lưu khi nhập hàng loạt (bulk.py)
+BULK_BATCH_SIZE = 5000
+
+# Thu thập sách
+CRAWL_API_URL = "https://www.googleapis.com/books/v1/volumes"
+CRAWL_QUERIES = ["python programming", "lập trình", "khoa học máy tính"]
+
+# Bộ đệm HTTP cho trình thu thập
+HTTP_CACHE_DIR = "data/http_cache"
+HTTP_CACHE_TTL = 24 * 60 * 60
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+# Bổ sung ISBN, mô tả, ảnh bìa (enrich.py): số yêu cầu HTTP song song, số tiến trình thu nhỏ ảnh (None = số CPU)
+ENRICH_WORKERS = 8
+ENRICH_PROCESSES = None
+# Ảnh bìa thu nhỏ lưu theo mã băm nội dung; bảng sách hiện bản nhỏ hơn nữa ở đầu mỗi dòng
+THUMBNAIL_DIR = "data/thumbnails"
+THUMBNAIL_SIZE = (80, 120)
+ROW_THUMBNAIL_SIZE = (16, 24)
+
+# In thời gian chuyển màn hình ra console
+SCREEN_LATENCY_LOG = bool(os.environ.get("LIBRARY_DEBUG"))
+
+# Số liệu thời gian thao tác (metrics.py): đặt LIBRARY_METRICS_FILE để ghi ảnh chụp JSON định kỳ;
+# máy chủ luôn phục vụ dạng văn bản Prometheus tại GET /metrics
+METRICS_FILE = os.environ.get("LIBRARY_METRICS_FILE")
+METRICS_DUMP_SECONDS = 30
+# LIBRARY_PROFILE=cpu, memory hoặc cpu,memory để bật cProfile/tracemalloc từ lúc khởi động; file ghi vào PROFILE_DIR
+PROFILE = os.environ.get("LIBRARY_PROFILE", "")
+PROFILE_DIR = "data/profiles"
+
+# Băm mật khẩu: "scrypt" hoặc "pbkdf2_sha256"; tăng tham số để tăng chi phí
+PASSWORD_SCHEME = "scrypt"
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 240000
+
+# Máy chủ dịch vụ thư viện dùng chung cho nhiều quầy
+SERVER_HOST = os.environ.get("LIBRARY_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("LIBRARY_PORT", "8765"))
+SERVER_WORKERS = 8
+# Phiên đăng nhập trên máy chủ hết hạn sau ngần ấy giây không dùng
+SESSION_TTL = 8 * 60 * 60
+# Đặt LIBRARY_SERVER_URL (vd. http://10.0.0.5:8765) để giao diện chạy như máy khách mỏng
+SERVER_URL = os.environ.get("LIBRARY_SERVER_URL")
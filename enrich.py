@@ -0,0 +1,164 @@
+# Bổ sung ISBN, mô tả và ảnh bìa cho cả catalog từ Google Books (hoặc máy chủ giả lập khi chạy thử ngoại tuyến)
+# Tra cứu và tải ảnh chạy song song có giới hạn trên nhóm luồng; giải mã/thu nhỏ ảnh chạy trên nhóm tiến trình
+# Chạy: python enrich.py [--api-url http://127.0.0.1:8800/volumes] [--workers 8] [--processes 4] [--force]
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from config import BULK_BATCH_SIZE, CRAWL_API_URL, DATA_DIR, ENRICH_PROCESSES, ENRICH_WORKERS
+from ingest import BookIngestor, volume_metadata
+from service import local_service
+from thumbnails import ThumbnailCache, make_thumbnail
+
+
+def lookup_query(book):
+    if book.get("isbn"):
+        return f"isbn:{book['isbn']}"
+    return f"intitle:{book['title']} inauthor:{book['author']}"
+
+
+class BookEnricher(BookIngestor):
+    # Dùng lại phiên HTTP, thử lại khi lỗi tạm thời và bộ đệm HTTP của BookIngestor; mỗi sách một truy vấn 1 kết quả
+    def __init__(self, base_url=CRAWL_API_URL, max_workers=ENRICH_WORKERS, processes=ENRICH_PROCESSES,
+                 thumbnails=None, **kwargs):
+        super().__init__(base_url, max_workers=max_workers, page_size=1, **kwargs)
+        self.processes = processes
+        self.thumbnails = thumbnails or ThumbnailCache()
+
+    def fetch_image(self, url):
+        import requests
+        for attempt in range(self.retries + 1):
+            if self.cancelled.is_set():
+                return None
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                if response.status_code == 200:
+                    return response.content
+                if response.status_code not in (429, 500, 502, 503, 504):
+                    return None
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        return None
+
+    def lookup(self, book):
+        # Luồng nền: (các trường tìm được, byte ảnh bìa gốc hoặc None)
+        items = self.fetch(lookup_query(book), 0).get("items", [])
+        metadata = volume_metadata(items[0].get("volumeInfo", {})) if items else {}
+        if book.get("isbn"):
+            metadata.pop("isbn", None)
+        cover_url = metadata.get("cover_url") or book.get("cover_url")
+        image = None
+        if cover_url and (not book.get("thumbnail") or cover_url != book.get("cover_url")):
+            image = self.fetch_image(cover_url)
+        return metadata, image
+
+    def run(self, books, emit):
+        # books: danh sách dict có id/title/author (isbn, cover_url, thumbnail nếu có)
+        # emit("updates", [{"id", ...các trường mới}]), ("progress", (xong, tổng)), ("error", thông báo), ("done", None)
+        total = len(books)
+        books = iter(books)
+        done = 0
+        lookups, thumbnails = {}, {}
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="enrich-lookup")
+        processes = ProcessPoolExecutor(max_workers=self.processes)
+        try:
+            def refill():
+                # Chỉ giữ tối đa 2 * max_workers tra cứu đang chạy: không dựng cả triệu future cùng lúc
+                while len(lookups) < 2 * self.max_workers and not self.cancelled.is_set():
+                    book = next(books, None)
+                    if book is None:
+                        return
+                    lookups[pool.submit(self.lookup, book)] = book
+
+            refill()
+            while lookups or thumbnails:
+                finished, _ = wait(list(lookups) + list(thumbnails), return_when=FIRST_COMPLETED)
+                updates = []
+                for future in finished:
+                    if future in lookups:
+                        book = lookups.pop(future)
+                        try:
+                            metadata, image = future.result()
+                        except Exception as e:
+                            emit("error", f"{book['title']}: {e}")
+                            done += 1
+                            continue
+                        if image is not None:
+                            thumbnails[processes.submit(make_thumbnail, image)] = (book, metadata)
+                            continue
+                    else:
+                        book, metadata = thumbnails.pop(future)
+                        try:
+                            metadata["thumbnail"] = self.thumbnails.put(future.result())
+                        except Exception as e:
+                            emit("error", f"{book['title']}: ảnh bìa lỗi ({e})")
+                    done += 1
+                    changed = {k: v for k, v in metadata.items() if v and book.get(k) != v}
+                    if changed:
+                        updates.append(dict(changed, id=book["id"]))
+                if updates:
+                    emit("updates", updates)
+                emit("progress", (done, total))
+                refill()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            processes.shutdown(wait=True, cancel_futures=True)
+        emit("done", None)
+
+
+def enrich_catalog(service, enricher, force=False, limit=None, batch_size=BULK_BATCH_SIZE, report=print):
+    # Ghi kết quả theo lô: mỗi lô một lần lưu, như bulk.py
+    books = service.books_to_enrich(force)[:limit]
+    counts = {"books": len(books), "updated": 0, "errors": 0}
+    batch = []
+    last_report = 0
+
+    def emit(kind, payload):
+        nonlocal last_report
+        if kind == "updates":
+            batch.extend(payload)
+            if len(batch) >= batch_size:
+                counts["updated"] += service.update_metadata(batch)
+                batch.clear()
+        elif kind == "error":
+            counts["errors"] += 1
+            report(f"Lỗi: {payload}")
+        elif kind == "progress" and time.perf_counter() - last_report > 1:
+            last_report = time.perf_counter()
+            report(f"Đã xử lý {payload[0]}/{payload[1]} sách")
+
+    start = time.perf_counter()
+    enricher.run(books, emit)
+    if batch:
+        counts["updated"] += service.update_metadata(batch)
+    counts["seconds"] = time.perf_counter() - start
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bổ sung ISBN, mô tả và ảnh bìa cho sách trong catalog")
+    parser.add_argument("--api-url", default=CRAWL_API_URL, help="địa chỉ API dạng Google Books (máy chủ giả lập để chạy thử)")
+    parser.add_argument("--workers", type=int, default=ENRICH_WORKERS, help="số yêu cầu HTTP song song")
+    parser.add_argument("--processes", type=int, default=ENRICH_PROCESSES, help="số tiến trình thu nhỏ ảnh")
+    parser.add_argument("--force", action="store_true", help="tra cứu lại cả sách đã đủ thông tin")
+    parser.add_argument("--limit", type=int, help="chỉ xử lý tối đa bấy nhiêu sách")
+    args = parser.parse_args()
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    # Có chia chi nhánh thì bổ sung cho cả hệ thống
+    service = local_service(None)
+    try:
+        enricher = BookEnricher(args.api_url, max_workers=args.workers, processes=args.processes)
+        counts = enrich_catalog(service, enricher, args.force, args.limit)
+        print(f"Cập nhật {counts['updated']} / {counts['books']} sách trong {counts['seconds']:.1f}s, "
+              f"{counts['errors']} lỗi")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# Bộ đệm phản hồi HTTP trên đĩa: hết hạn theo TTL, kiểm tra lại bằng ETag, loại bỏ LRU theo dung lượng
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_TTL
+
+
+class CachedResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+    def raise_for_status(self):
+        pass
+
+
+class HttpCache:
+    def __init__(self, directory=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        # Thứ tự LRU dựng lại từ thời điểm truy cập (mtime) của các file
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                st = os.stat(os.path.join(directory, name))
+                entries.append((st.st_mtime, name[:-5], st.st_size))
+        entries.sort()
+        self.entries = OrderedDict((key, size) for _, key, size in entries)
+        self.total_bytes = sum(self.entries.values())
+        self.evict()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def load(self, key):
+        try:
+            with open(self.path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key, entry):
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        tmp_path = f"{self.path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path(key))
+        with self.lock:
+            self.total_bytes += len(data) - self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            self.evict()
+
+    def touch(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def get(self, session, url, params=None, timeout=None):
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        key = hashlib.sha256(full_url.encode("utf-8")).hexdigest()
+        entry = self.load(key)
+        if entry and time.time() - entry["stored_at"] < self.ttl:
+            self.touch(key)
+            with self.lock:
+                self.hits += 1
+            return CachedResponse(200, entry["body"])
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        response = session.get(full_url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry:
+            entry["stored_at"] = time.time()
+            self.store(key, entry)
+            with self.lock:
+                self.revalidated += 1
+            return CachedResponse(200, entry["body"])
+
+        with self.lock:
+            self.misses += 1
+        if response.status_code == 200:
+            self.store(key, {
+                "url": full_url,
+                "etag": response.headers.get("ETag"),
+                "stored_at": time.time(),
+                "body": response.text,
+            })
+        return response
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+            }
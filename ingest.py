@@ -0,0 +1,188 @@
+# Thu thập sách từ Google Books chạy nền: nhiều truy vấn, phân trang song song, chống trùng bằng chỉ mục băm
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import CRAWL_API_URL
+from search import fold
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def normalize_title(title):
+    return " ".join(fold(title).split())
+
+
+def volume_isbn(volume_info):
+    ids = {i.get("type"): i.get("identifier") for i in volume_info.get("industryIdentifiers", [])}
+    return ids.get("ISBN_13") or ids.get("ISBN_10")
+
+
+def volume_metadata(volume_info):
+    # Các trường bổ sung có trong kết quả Google Books: ISBN, mô tả, địa chỉ ảnh bìa
+    metadata = {}
+    isbn = volume_isbn(volume_info)
+    if isbn:
+        metadata["isbn"] = isbn
+    if volume_info.get("description"):
+        metadata["description"] = volume_info["description"]
+    links = volume_info.get("imageLinks", {})
+    cover_url = links.get("thumbnail") or links.get("smallThumbnail")
+    if cover_url:
+        metadata["cover_url"] = cover_url
+    return metadata
+
+
+class DedupIndex:
+    # Theo dõi Catalog để kiểm tra trùng theo ISBN hoặc tiêu đề chuẩn hóa trong O(1)
+    def __init__(self):
+        self.keys = {}
+        self.book_keys = {}
+
+    def on_load(self, catalog):
+        self.keys = {}
+        self.book_keys = {}
+        for book in catalog.iter_books():
+            self.add(book)
+
+    def on_change(self, kind, record_id, record):
+        if kind != "book":
+            return
+        self.remove(record_id)
+        if record is not None:
+            self.add(record)
+
+    def book_dedup_keys(self, book):
+        keys = ["title:" + normalize_title(book["title"])]
+        if book.get("isbn"):
+            keys.append("isbn:" + book["isbn"])
+        return keys
+
+    def add(self, book):
+        keys = self.book_dedup_keys(book)
+        self.book_keys[book["id"]] = keys
+        for key in keys:
+            self.keys[key] = book["id"]
+
+    def remove(self, book_id):
+        for key in self.book_keys.pop(book_id, []):
+            if self.keys.get(key) == book_id:
+                del self.keys[key]
+
+    def contains(self, book):
+        return any(key in self.keys for key in self.book_dedup_keys(book))
+
+
+class BookIngestor:
+    def __init__(self, base_url=CRAWL_API_URL, max_workers=4, page_size=40, max_results=200,
+                 retries=3, backoff=0.5, timeout=10, cache=None):
+        self.base_url = base_url
+        self.cache = cache
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.max_results = max_results
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # requests chỉ cần khi thu thập: nhập ở đây để service (dùng DedupIndex) khởi động nhanh
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.cancelled = threading.Event()
+
+    def fetch(self, query, start_index):
+        import requests
+        params = {"q": query, "startIndex": start_index, "maxResults": self.page_size}
+        for attempt in range(self.retries + 1):
+            if self.cancelled.is_set():
+                return {}
+            try:
+                if self.cache is not None:
+                    response = self.cache.get(self.session, self.base_url, params=params, timeout=self.timeout)
+                else:
+                    response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    return response.json()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        response.raise_for_status()
+
+    def parse(self, data):
+        books = []
+        for item in data.get("items", []):
+            volume_info = item.get("volumeInfo", {})
+            book = {
+                "id": str(uuid.uuid4()),
+                "title": volume_info.get("title", "Tiêu Đề Không Xác Định"),
+                "author": ", ".join(volume_info.get("authors", ["Tác Giả Không Xác Định"])),
+                "category": volume_info.get("categories", ["Chung"])[0],
+                "status": "available"
+            }
+            book.update(volume_metadata(volume_info))
+            books.append(book)
+        return books
+
+    def run(self, queries, emit):
+        # emit(kind, payload): "books" -> danh sách sách mới, "progress" -> (xong, tổng), "error" -> thông báo
+        seen = DedupIndex()
+        pending = {}
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            def submit(query, start):
+                pending[pool.submit(self.fetch, query, start)] = (query, start)
+
+            for query in queries:
+                submit(query, 0)
+            total = len(pending)
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    query, start = pending.pop(future)
+                    done += 1
+                    try:
+                        data = future.result()
+                    except Exception as e:
+                        emit("error", f"{query}: {e}")
+                        continue
+
+                    if start == 0:
+                        # Trang đầu cho biết tổng số kết quả: tải các trang còn lại song song
+                        last = min(data.get("totalItems", 0), self.max_results)
+                        for next_start in range(self.page_size, last, self.page_size):
+                            submit(query, next_start)
+                            total += 1
+
+                    books = []
+                    for book in self.parse(data):
+                        if not seen.contains(book):
+                            seen.add(book)
+                            books.append(book)
+                    if books:
+                        emit("books", books)
+                    emit("progress", (done, total))
+        emit("done", None)
+
+    def start(self, queries):
+        events = queue.Queue()
+        thread = threading.Thread(target=self._run_safe, args=(queries, events), name="book-ingestor", daemon=True)
+        thread.start()
+        return events
+
+    def _run_safe(self, queries, events):
+        try:
+            self.run(queries, lambda kind, payload: events.put((kind, payload)))
+        except Exception as e:
+            events.put(("error", str(e)))
+            events.put(("done", None))
+
+    def cancel(self):
+        self.cancelled.set()
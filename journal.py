@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+
+from config import BORROW_FILE, DATA_FILE, JOURNAL_COMPACT_BYTES, JOURNAL_FILE, USER_FILE
+from metrics import instrumented
+from records import plain
+from serializers import read_snapshot, write_snapshot
+from storage import ConflictError, JsonStorage, find_conflicts
+
+# Tệp .compacting cũ hơn mức này được coi là sót lại sau sập máy, không phải tiến trình khác đang gộp
+STALE_COMPACTION_SECONDS = 600
+
+
+def read_entries(path, offset=0):
+    # Trả về (các dòng hợp lệ từ offset, vị trí byte cuối cùng hợp lệ)
+    entries = []
+    if not os.path.exists(path):
+        return entries, offset
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError(line)
+                entries.append(json.loads(line))
+            except ValueError:
+                # Dòng cuối bị cắt ngang do sập máy: bỏ qua
+                break
+            offset += len(line)
+    return entries, offset
+
+
+def replay(path, books, borrows):
+    # Trả về vị trí byte cuối cùng hợp lệ của nhật ký
+    tables = {"book": books, "borrow": borrows}
+    entries, offset = read_entries(path)
+    for entry in entries:
+        table = tables[entry["kind"]]
+        if entry["op"] == "put":
+            table[entry["id"]] = entry["record"]
+        else:
+            table.pop(entry["id"], None)
+    return offset
+
+
+@instrumented("storage.journal", names=("load", "commit", "sync", "compact"))
+class JournalStorage(JsonStorage):
+    # Commit chỉ nối thay đổi vào nhật ký, ảnh chụp được gộp lại ở nền
+    rewrites_snapshot = False
+
+    def __init__(self, book_file=DATA_FILE, borrow_file=BORROW_FILE, user_file=USER_FILE,
+                 journal_file=JOURNAL_FILE, compact_bytes=JOURNAL_COMPACT_BYTES):
+        super().__init__(book_file, borrow_file, user_file)
+        self.journal_file = journal_file
+        self.compacting_file = journal_file + ".compacting"
+        self.compact_bytes = compact_bytes
+        self.journal = None
+        self.compactor = None
+        # Phần nhật ký đã đọc: các tiến trình khác nối thêm sau vị trí này
+        self.offset = 0
+        self.inode = None
+
+    def load(self):
+        with self.lock:
+            books, borrows = self._read_all()
+            return list(books.values()), list(borrows.values())
+
+    def _read_all(self):
+        books = {b["id"]: b for b in read_snapshot(self.book_file, [])}
+        borrows = {b["id"]: b for b in read_snapshot(self.borrow_file, [])}
+        # Phát lại theo đúng thứ tự: đoạn đang gộp dở trước, nhật ký hiện tại sau
+        replay(self.compacting_file, books, borrows)
+        valid = replay(self.journal_file, books, borrows)
+        with open(self.journal_file, "a+b") as f:
+            if os.fstat(f.fileno()).st_size > valid:
+                f.truncate(valid)
+            self.inode = os.fstat(f.fileno()).st_ino
+        self.offset = valid
+        return books, borrows
+
+    def _rotated(self):
+        try:
+            st = os.stat(self.journal_file)
+        except FileNotFoundError:
+            return True
+        return st.st_ino != self.inode or st.st_size < self.offset
+
+    def sync(self, catalog, changes=None):
+        # Đọc phần nhật ký tiến trình khác vừa ghi, kiểm tra xung đột với changes rồi áp vào catalog
+        changes = changes or {}
+        with self.lock:
+            if self._rotated():
+                # Tiến trình khác đã gộp nhật ký: đọc lại toàn bộ
+                books, borrows = self._read_all()
+                tables = {"book": books, "borrow": borrows}
+                conflicts = find_conflicts(changes, lambda kind, record_id: tables[kind].get(record_id))
+                if conflicts:
+                    raise ConflictError(conflicts, reload=(list(books.values()), list(borrows.values())))
+                catalog.load(list(books.values()), list(borrows.values()))
+                for (kind, record_id), (record, _) in changes.items():
+                    catalog.replace(kind, record_id, record)
+                return
+
+            entries, self.offset = read_entries(self.journal_file, self.offset)
+            latest = {}
+            for entry in entries:
+                latest[(entry["kind"], entry["id"])] = entry.get("record")
+            # Bản ghi không có trong phần mới đọc vẫn giữ nguyên phiên bản gốc
+            conflicts = find_conflicts(changes, lambda *key: latest.get(key, changes[key][1]))
+            if conflicts:
+                raise ConflictError(conflicts, [(kind, i, record) for (kind, i), record in latest.items()])
+            for (kind, record_id), record in latest.items():
+                if (kind, record_id) not in changes:
+                    catalog.replace(kind, record_id, record)
+
+    def commit(self, catalog, changes):
+        if not changes:
+            return
+        with self.lock:
+            self.sync(catalog, changes)
+            if self.journal is None or os.fstat(self.journal.fileno()).st_ino != self.inode:
+                if self.journal is not None:
+                    self.journal.close()
+                self.journal = open(self.journal_file, "a", encoding="utf-8")
+            lines = []
+            for (kind, record_id), (record, _) in changes.items():
+                if record is None:
+                    entry = {"op": "del", "kind": kind, "id": record_id}
+                else:
+                    entry = {"op": "put", "kind": kind, "id": record_id, "record": record}
+                lines.append(json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=plain))
+            self.journal.write("\n".join(lines) + "\n")
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self.offset = self.journal.tell()
+
+            if self.offset >= self.compact_bytes:
+                self.compact(catalog)
+
+    def compact(self, catalog):
+        if self.compactor is not None and self.compactor.is_alive():
+            return
+        with self.lock:
+            if os.path.exists(self.compacting_file):
+                if time.time() - os.path.getmtime(self.compacting_file) < STALE_COMPACTION_SECONDS:
+                    # Tiến trình khác đang gộp
+                    return
+                # Lần gộp trước chưa xong (sập máy): catalog đã gồm phần đó, gộp lại từ trạng thái hiện tại
+                os.remove(self.compacting_file)
+            # Chụp trạng thái và xoay nhật ký trên luồng chính; phần ghi file chạy nền
+            # Chép cả hàng đợi đặt trước/danh sách bản sao vì luồng chính vẫn sửa chúng trong lúc ghi
+            books = [{k: v.copy() if isinstance(v, (list, dict)) else v for k, v in b.items()}
+                     for b in catalog.iter_books()]
+            borrows = [dict(b) for b in catalog.iter_borrows()]
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            os.replace(self.journal_file, self.compacting_file)
+            open(self.journal_file, "a").close()
+            self.inode = os.stat(self.journal_file).st_ino
+            self.offset = 0
+        self.compactor = threading.Thread(target=self._write_snapshot, args=(books, borrows), name="journal-compactor")
+        self.compactor.start()
+
+    def _write_snapshot(self, books, borrows):
+        # Ghi ảnh chụp ra file tạm ngoài khóa; chỉ bước đổi tên và xóa đoạn đã gộp cần khóa
+        book_tmp, borrow_tmp = self.book_file + ".snapshot", self.borrow_file + ".snapshot"
+        write_snapshot(book_tmp, books)
+        write_snapshot(borrow_tmp, borrows)
+        with self.lock:
+            os.replace(book_tmp, self.book_file)
+            os.replace(borrow_tmp, self.borrow_file)
+            os.remove(self.compacting_file)
+
+    def close(self):
+        if self.compactor is not None:
+            self.compactor.join()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
@@ -0,0 +1,69 @@
+# Truy vấn chạy nền cho giao diện: gom các lần gõ phím (debounce), chạy trên luồng riêng, bỏ truy vấn đã cũ
+# Tk không an toàn luồng nên kết quả được lấy về bằng cách hỏi future định kỳ từ luồng giao diện
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LiveQuery:
+    # run(*args) chạy trên luồng nền; on_result(result) và on_error(exc) chạy trên luồng Tk
+    def __init__(self, root, run, on_result, on_error=None, delay=250, poll=20, name="live-query"):
+        self.root = root
+        self.run = run
+        self.on_result = on_result
+        self.on_error = on_error
+        self.delay = delay
+        self.poll_ms = poll
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.generation = 0
+        self.timer = None
+        self.future = None
+
+    def schedule(self, *args):
+        # Mỗi lần gọi hủy lần hẹn trước; chỉ lần gọi cuối cùng trong khoảng delay ms được chạy
+        self.generation += 1
+        if self.timer is not None:
+            self.root.after_cancel(self.timer)
+        self.timer = self.root.after(self.delay, self.submit, self.generation, args)
+
+    def now(self, *args):
+        self.generation += 1
+        if self.timer is not None:
+            self.root.after_cancel(self.timer)
+        self.submit(self.generation, args)
+
+    def submit(self, generation, args):
+        if generation != self.generation:
+            return
+        self.timer = None
+        # Truy vấn cũ chưa bắt đầu thì hủy hẳn; đang chạy thì để chạy xong nhưng bỏ kết quả
+        if self.future is not None:
+            self.future.cancel()
+        self.future = self.pool.submit(self.run, *args)
+        self.root.after(self.poll_ms, self.poll, generation, self.future)
+
+    def poll(self, generation, future):
+        if generation != self.generation:
+            return
+        if not future.done():
+            self.root.after(self.poll_ms, self.poll, generation, future)
+            return
+        self.future = None
+        error = future.exception()
+        if error is None:
+            self.on_result(future.result())
+        elif self.on_error is not None:
+            self.on_error(error)
+        else:
+            raise error
+
+    def cancel(self):
+        self.generation += 1
+        if self.timer is not None:
+            self.root.after_cancel(self.timer)
+            self.timer = None
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+
+    def close(self):
+        self.cancel()
+        self.pool.shutdown(wait=False)
@@ -0,0 +1,258 @@
+# Đo thời gian các thao tác trong tiến trình: biểu đồ tần suất theo thang log (ghi O(1), không giữ từng mẫu),
+# xuất p50/p95/p99 dạng JSON hoặc văn bản Prometheus, ghi định kỳ ra file, bật/tắt cProfile/tracemalloc khi cần
+import cProfile
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+from config import METRICS_DUMP_SECONDS, METRICS_FILE, PROFILE, PROFILE_DIR
+
+# Ô thứ i chứa các mẫu trong (MIN_SECONDS * RATIO^(i-1), MIN_SECONDS * RATIO^i]; sai số mỗi ô khoảng 19%
+MIN_SECONDS = 1e-6
+RATIO = 2 ** 0.25
+BUCKETS = 128
+LOG_RATIO = math.log(RATIO)
+PENDING_LIMIT = 1024
+
+
+def bucket_bound(index):
+    return MIN_SECONDS * RATIO ** index
+
+
+class Histogram:
+    # observe() chỉ nối mẫu vào hàng đợi (deque.append an toàn giữa các luồng, không cần khóa);
+    # mẫu được dồn vào các ô khi đọc số liệu hoặc khi hàng đợi đầy
+    __slots__ = ("counts", "count", "total", "max", "pending", "lock")
+
+    def __init__(self):
+        self.counts = [0] * (BUCKETS + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.pending = deque()
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        self.pending.append(seconds)
+        if len(self.pending) > PENDING_LIMIT:
+            self.fold()
+
+    def fold(self):
+        with self.lock:
+            pending, counts, log = self.pending, self.counts, math.log
+            while pending:
+                seconds = pending.popleft()
+                if seconds <= MIN_SECONDS:
+                    counts[0] += 1
+                else:
+                    counts[min(BUCKETS, int(log(seconds / MIN_SECONDS) / LOG_RATIO) + 1)] += 1
+                self.count += 1
+                self.total += seconds
+                if seconds > self.max:
+                    self.max = seconds
+
+    def percentile(self, p):
+        # Cận trên của ô chứa mẫu thứ hạng p (không vượt quá mẫu lớn nhất đã gặp)
+        self.fold()
+        with self.lock:
+            counts, count, largest = list(self.counts), self.count, self.max
+        if not count:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * count))
+        seen = 0
+        for index, n in enumerate(counts):
+            seen += n
+            if seen >= rank:
+                return min(bucket_bound(index), largest)
+        return largest
+
+    def summary(self):
+        self.fold()
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def snapshot(self):
+        summaries = {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+        return {name: summary for name, summary in summaries.items() if summary["count"]}
+
+    def prometheus(self, metric="library_operation_seconds"):
+        lines = [f"# HELP {metric} Thời gian thực hiện thao tác (giây)", f"# TYPE {metric} summary"]
+        for name, summary in self.snapshot().items():
+            label = 'op="%s"' % name.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            for quantile in ("0.5", "0.95", "0.99"):
+                key = "p" + quantile[2:].ljust(2, "0")
+                lines.append(f'{metric}{{{label},quantile="{quantile}"}} {summary[key]:.6g}')
+            lines.append(f"{metric}_sum{{{label}}} {summary['sum']:.6g}")
+            lines.append(f"{metric}_count{{{label}}} {summary['count']}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+@contextmanager
+def timer(name, registry=REGISTRY):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - start)
+
+
+def timed(name, registry=REGISTRY):
+    def decorate(func):
+        histogram = registry.histogram(name)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def instrumented(prefix, names=None):
+    # Bọc các phương thức công khai (hoặc các phương thức trong names) của lớp bằng timed("prefix.tên")
+    def decorate(cls):
+        for name, value in list(vars(cls).items()):
+            if inspect.isfunction(value) and not name.startswith("_") and (names is None or name in names):
+                setattr(cls, name, timed(f"{prefix}.{name}")(value))
+        return cls
+    return decorate
+
+
+class MetricsDumper:
+    # Luồng nền ghi ảnh chụp số liệu ra file JSON (ghi file tạm rồi đổi tên) mỗi interval giây
+    def __init__(self, path=METRICS_FILE, interval=METRICS_DUMP_SECONDS, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.path and self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="metrics-dumper", daemon=True)
+            self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        data = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "pid": os.getpid(), "operations": self.registry.snapshot()}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+            self.dump()
+
+
+class Profiler:
+    # attach=True: cProfile theo dõi luồng đã gọi start() (luồng giao diện). Máy chủ dùng attach=False và chạy
+    # từng yêu cầu qua call(), lần lượt từng yêu cầu một trong lúc đo vì một Profile không dùng chung được giữa các luồng
+    def __init__(self, directory=PROFILE_DIR):
+        self.directory = directory
+        self.profile = None
+        self.attached = False
+        self.memory = False
+        self.lock = threading.RLock()
+
+    @property
+    def active(self):
+        return self.profile is not None or self.memory
+
+    def start(self, cpu=True, memory=False, attach=True):
+        with self.lock:
+            if cpu and self.profile is None:
+                self.profile = cProfile.Profile()
+                self.attached = attach
+                if attach:
+                    self.profile.enable()
+            if memory and not self.memory:
+                tracemalloc.start(25)
+                self.memory = True
+
+    def call(self, func, *args):
+        profile = self.profile
+        if profile is None or self.attached:
+            return func(*args)
+        with self.lock:
+            return profile.runcall(func, *args)
+
+    def stop(self):
+        # Trả về danh sách file đã ghi: .prof (xem bằng pstats/snakeviz) và .txt (50 dòng cấp phát nhiều nhất)
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            paths = []
+            if self.profile is not None:
+                if self.attached:
+                    self.profile.disable()
+                path = os.path.join(self.directory, f"cpu-{stamp}.prof")
+                self.profile.dump_stats(path)
+                paths.append(path)
+                self.profile = None
+            if self.memory:
+                stats = tracemalloc.take_snapshot().statistics("lineno")
+                tracemalloc.stop()
+                self.memory = False
+                path = os.path.join(self.directory, f"memory-{stamp}.txt")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(str(stat) for stat in stats[:50]) + "\n")
+                paths.append(path)
+            return paths
+
+    def toggle(self, cpu=True, memory=False, attach=True):
+        if self.active:
+            return self.stop()
+        self.start(cpu, memory, attach)
+        return []
+
+    def start_from_config(self, setting=PROFILE, attach=True):
+        # setting dạng "cpu", "memory" hoặc "cpu,memory" (biến môi trường LIBRARY_PROFILE)
+        parts = {part.strip() for part in setting.split(",")}
+        if parts & {"cpu", "memory"}:
+            self.start("cpu" in parts, "memory" in parts, attach)
+
+
+PROFILER = Profiler()
@@ -0,0 +1,97 @@
+# Theo dõi lượt mượn quá hạn: heap các lượt đang mượn theo hạn trả, lấy k lượt đến hạn mà không quét cả danh sách
+import heapq
+from datetime import date
+
+
+def days_between(start, end):
+    return (date.fromisoformat(end) - date.fromisoformat(start)).days
+
+
+class OverdueIndex:
+    # Hạn trả dạng "YYYY-MM-DD" so sánh theo chuỗi đúng bằng thứ tự ngày
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.due = {}       # borrow_id -> hạn trả của mọi lượt đang mượn
+        self.overdue = {}   # borrow_id -> hạn trả, các lượt đã được báo quá hạn
+        self.heap = []      # (hạn trả, borrow_id) chưa quá hạn; mục cũ bị bỏ qua khi lấy ra
+        self.stale = 0
+        self.ordered = None  # overdue_ids() đã sắp xếp, None khi cần sắp lại
+
+    def on_load(self, catalog):
+        # Giữ các lượt đã báo quá hạn (còn đang mượn) để không báo lại sau khi nạp lại dữ liệu
+        reported = self.overdue
+        self.clear()
+        for borrow in catalog.iter_borrows():
+            if not borrow["returned"]:
+                self.due[borrow["id"]] = borrow["due_date"]
+        self.overdue = {i: due for i, due in reported.items() if self.due.get(i) == due}
+        self.rebuild()
+
+    def on_change(self, kind, record_id, record):
+        if kind != "borrow":
+            return
+        due = record["due_date"] if record is not None and not record["returned"] else None
+        old = self.due.get(record_id)
+        if due == old:
+            return
+        if old is not None:
+            del self.due[record_id]
+            if self.overdue.pop(record_id, None) is None:
+                self.stale += 1
+            elif self.ordered is not None:
+                self.ordered.remove(record_id)
+        if due is not None:
+            self.due[record_id] = due
+            heapq.heappush(self.heap, (due, record_id))
+        if self.stale > len(self.heap) // 2 + 64:
+            self.rebuild()
+
+    def rebuild(self):
+        self.heap = [(due, borrow_id) for borrow_id, due in self.due.items() if borrow_id not in self.overdue]
+        heapq.heapify(self.heap)
+        self.stale = 0
+
+    def live(self, due, borrow_id):
+        return self.due.get(borrow_id) == due and borrow_id not in self.overdue
+
+    def advance(self, today):
+        # Chuyển các lượt có hạn trước hôm nay sang nhóm quá hạn; trả về các lượt mới quá hạn, O(k log n)
+        newly = []
+        while self.heap and self.heap[0][0] < today:
+            due, borrow_id = heapq.heappop(self.heap)
+            if not self.live(due, borrow_id):
+                self.stale = max(0, self.stale - 1)
+                continue
+            self.overdue[borrow_id] = due
+            newly.append(borrow_id)
+        if newly and self.ordered is not None:
+            # Heap trả ra theo (hạn, id) tăng dần: nối vào cuối nếu không chen giữa danh sách đã sắp
+            last = self.ordered[-1] if self.ordered else None
+            if last is None or (self.overdue[last], last) < (self.overdue[newly[0]], newly[0]):
+                self.ordered.extend(newly)
+            else:
+                self.ordered = None
+        return newly
+
+    def overdue_ids(self):
+        # Quá hạn lâu nhất trước; chỉ sắp lại khi thứ tự bị phá, người gọi không được sửa danh sách
+        if self.ordered is None:
+            self.ordered = sorted(self.overdue, key=lambda borrow_id: (self.overdue[borrow_id], borrow_id))
+        return self.ordered
+
+    def due_before(self, limit):
+        # Duyệt cây heap từ gốc, chỉ xuống nhánh có hạn < limit: O(k) cho k kết quả rồi sắp xếp O(k log k)
+        heap = self.heap
+        found = []
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            if i < len(heap) and heap[i][0] < limit:
+                if self.live(*heap[i]):
+                    found.append(heap[i])
+                stack.append(2 * i + 1)
+                stack.append(2 * i + 2)
+        found.sort()
+        return [borrow_id for _, borrow_id in found]
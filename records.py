@@ -0,0 +1,121 @@
+# Bản ghi gọn cho catalog: lớp __slots__ thay cho dict mỗi bản ghi, các chuỗi lặp lại (tác giả, thể loại,
+# trạng thái, ngày, tên đăng nhập) dùng chung một đối tượng. Vẫn đọc/ghi như dict nên mã cũ và JSON không đổi
+from sys import intern
+
+
+class Record:
+    # FIELDS theo đúng thứ tự khi ghi JSON; trường không có trong bản ghi thì slot bỏ trống (không tốn thêm bộ nhớ),
+    # trường lạ (do phiên bản khác ghi) giữ trong extra để ghi lại nguyên vẹn
+    __slots__ = ("extra",)
+    FIELDS = ()
+    INTERNED = frozenset()
+
+    def __init__(self, data):
+        self.extra = None
+        found = 0
+        for name in self.FIELDS:
+            value = data.get(name, self)
+            if value is not self:
+                found += 1
+                setattr(self, name, intern(value) if name in self.INTERNED and type(value) is str else value)
+        if found < len(data):
+            self.extra = {k: v for k, v in data.items() if k not in self.FIELD_SET}
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name) if name in self.FIELD_SET else self.extra[name]
+        except (AttributeError, KeyError, TypeError):
+            raise KeyError(name) from None
+
+    def get(self, name, default=None):
+        if name in self.FIELD_SET:
+            return getattr(self, name, default)
+        return self.extra.get(name, default) if self.extra else default
+
+    def __contains__(self, name):
+        if name in self.FIELD_SET:
+            return hasattr(self, name)
+        return bool(self.extra) and name in self.extra
+
+    def __setitem__(self, name, value):
+        if name in self.FIELD_SET:
+            setattr(self, name, intern(value) if name in self.INTERNED and type(value) is str else value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[name] = value
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, fields=(), **more):
+        for name, value in dict(fields, **more).items():
+            self[name] = value
+
+    def keys(self):
+        names = [name for name in self.FIELDS if hasattr(self, name)]
+        return names + list(self.extra) if self.extra else names
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return self.to_dict().items()
+
+    def to_dict(self):
+        # Gọi cho mỗi bản ghi khi lưu nên tránh đi qua __getitem__
+        data = {}
+        for name in self.FIELDS:
+            value = getattr(self, name, self)
+            if value is not self:
+                data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Book(Record):
+    __slots__ = ("id", "title", "author", "category", "status", "isbn", "description", "cover_url", "thumbnail",
+                 "copies", "available", "reservations", "holds", "version")
+    FIELDS = __slots__
+    FIELD_SET = frozenset(FIELDS)
+    INTERNED = frozenset(("author", "category", "status"))
+
+    def __init__(self, data):
+        super().__init__(data)
+        # Bản sao đầu tiên trùng id sách: dùng chung đối tượng chuỗi
+        copies = getattr(self, "copies", None)
+        if copies and copies[0] == self.id:
+            copies[0] = self.id
+
+
+class Borrow(Record):
+    __slots__ = ("id", "book_id", "copy_id", "username", "borrow_date", "due_date", "returned", "return_date", "version")
+    FIELDS = __slots__
+    FIELD_SET = frozenset(FIELDS)
+    INTERNED = frozenset(("username", "borrow_date", "due_date", "return_date"))
+
+
+Record.FIELD_SET = frozenset()
+
+
+def plain(value):
+    # Dùng làm default= cho json.dumps: bản ghi gọn ghi ra đúng như dict ban đầu
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
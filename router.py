@@ -0,0 +1,50 @@
+# Điều hướng màn hình: mỗi màn hình chỉ dựng một lần, sau đó chỉ ẩn/hiện và làm mới dữ liệu
+import time
+
+from metrics import REGISTRY
+
+
+class ScreenRouter:
+    def __init__(self, root, log=False):
+        self.root = root
+        self.log = log
+        self.screens = {}
+        self.frames = {}
+        self.current = None
+
+    def register(self, name, build, on_show=None, on_hide=None, **place):
+        # build() trả về frame chưa được đặt vị trí; place là tham số cho frame.place
+        place.setdefault("relx", 0.5)
+        place.setdefault("rely", 0.5)
+        place.setdefault("anchor", "center")
+        self.screens[name] = (build, on_show, on_hide, place)
+
+    def show(self, name):
+        start = time.perf_counter()
+        previous = self.current
+        if previous is not None and previous != name:
+            _, _, on_hide, _ = self.screens[previous]
+            self.frames[previous].place_forget()
+            if on_hide:
+                on_hide()
+
+        build, on_show, _, place = self.screens[name]
+        frame = self.frames.get(name)
+        if frame is None:
+            built = time.perf_counter()
+            frame = self.frames[name] = build()
+            REGISTRY.observe(f"screen.build.{name}", time.perf_counter() - built)
+        frame.place(**place)
+        frame.lift()
+        self.current = name
+        if on_show:
+            on_show()
+        # Đo đến khi Tk vẽ xong màn hình mới
+        self.root.after_idle(self.record, previous, name, start)
+
+    def record(self, previous, name, start):
+        # Độ trễ từng màn hình nằm trong số liệu "screen.show.<tên>" (metrics.json do MetricsDumper ghi)
+        elapsed = time.perf_counter() - start
+        REGISTRY.observe(f"screen.show.{name}", elapsed)
+        if self.log:
+            print(f"[screen] {previous}->{name}: {elapsed * 1000:.1f} ms")
@@ -0,0 +1,160 @@
+# Chỉ mục đảo cho tìm kiếm sách: bỏ dấu tiếng Việt, khớp tiền tố, xếp hạng BM25
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+TOKEN_RE = re.compile(r"\w+")
+# Cận trên của mọi từ bắt đầu bằng một tiền tố trong vocab đã sắp xếp
+PREFIX_END = "\U0010ffff"
+# Các khối dấu kết hợp (tiếng Việt chỉ dùng U+0300–U+036F); xóa bằng một regex nhanh hơn duyệt từng ký tự
+COMBINING_RE = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+
+
+def fold(text):
+    if text.isascii():
+        return text.lower()
+    return COMBINING_RE.sub("", unicodedata.normalize("NFD", text.casefold())).replace("đ", "d")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(fold(text))
+
+
+class SearchIndex:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.clear()
+
+    def clear(self):
+        self.postings = {}
+        self.vocab = []
+        self.docs = {}
+        self.total_len = 0
+        self.categories = {}
+
+    # --- Theo dõi Catalog ---
+
+    def on_load(self, catalog):
+        self.clear()
+        for book in catalog.iter_books():
+            self.index(book)
+        # Sắp vocab một lần sau khi nạp: insort từng từ mới là O(V²) với catalog lớn
+        self.vocab = sorted(self.postings)
+
+    def on_change(self, kind, record_id, record):
+        if kind != "book":
+            return
+        if record is None:
+            self.remove(record_id)
+        else:
+            self.update(record)
+
+    # --- Cập nhật chỉ mục ---
+
+    def add(self, book):
+        for token in self.index(book):
+            insort(self.vocab, token)
+
+    def index(self, book):
+        # Thêm sách vào postings/docs, trả về các từ lần đầu xuất hiện (chưa có trong vocab)
+        new_terms = []
+        text = book["title"] + " " + book["author"]
+        tokens = tokenize(text)
+        tf = {}
+        for token in tokens:
+            tf[token] = tf.get(token, 0) + 1
+        for token, count in tf.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                new_terms.append(token)
+            posting[book["id"]] = count
+        self.docs[book["id"]] = (text, book["category"], len(tokens), tf)
+        self.total_len += len(tokens)
+        self.categories.setdefault(book["category"], set()).add(book["id"])
+        return new_terms
+
+    def remove(self, book_id):
+        doc = self.docs.pop(book_id, None)
+        if doc is None:
+            return
+        _, category, length, tf = doc
+        for token in tf:
+            posting = self.postings[token]
+            del posting[book_id]
+            if not posting:
+                del self.postings[token]
+                del self.vocab[bisect_left(self.vocab, token)]
+        self.total_len -= length
+        ids = self.categories[category]
+        ids.discard(book_id)
+        if not ids:
+            del self.categories[category]
+
+    def update(self, book):
+        doc = self.docs.get(book["id"])
+        if doc is not None and doc[0] == book["title"] + " " + book["author"] and doc[1] == book["category"]:
+            # Chỉ đổi trạng thái mượn/trả: không cần lập chỉ mục lại
+            return
+        self.remove(book["id"])
+        self.add(book)
+
+    # --- Truy vấn ---
+
+    def expand(self, token):
+        # Mọi từ có tiền tố token: một đoạn liên tiếp trong vocab, tìm hai đầu bằng bisect
+        return self.vocab[bisect_left(self.vocab, token):bisect_left(self.vocab, token + PREFIX_END)]
+
+    def search(self, query, category=None, limit=None):
+        tokens = tokenize(query)
+        allowed = self.categories.get(category, set()) if category else None
+        if not tokens:
+            ids = allowed if allowed is not None else self.docs.keys()
+            ids = list(ids)
+            return ids[:limit] if limit else ids
+
+        n = len(self.docs)
+        avg_len = self.total_len / n if n else 0
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for term in self.expand(token):
+                posting = self.postings[term]
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for book_id, tf in posting.items():
+                    if allowed is not None and book_id not in allowed:
+                        continue
+                    if scores is not None and book_id not in scores:
+                        continue
+                    length = self.docs[book_id][2]
+                    norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_len))
+                    token_scores[book_id] = token_scores.get(book_id, 0.0) + idf * norm
+            if scores is not None:
+                for book_id in token_scores:
+                    token_scores[book_id] += scores[book_id]
+            # Mọi từ khóa đều phải khớp
+            scores = token_scores
+            if not scores:
+                return []
+
+        if limit:
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        else:
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [book_id for book_id, _ in ranked]
+
+    def facets(self, book_ids=None):
+        # Số sách theo thể loại trong book_ids (None: cả chỉ mục, đếm thẳng từ tập theo thể loại)
+        if book_ids is None:
+            return {category: len(ids) for category, ids in self.categories.items()}
+        counts = {}
+        for book_id in book_ids:
+            category = self.docs[book_id][1]
+            counts[category] = counts.get(category, 0) + 1
+        return counts
+
+    def category_names(self):
+        return sorted(self.categories)
@@ -0,0 +1,113 @@
+# Đọc/ghi file dữ liệu (sách, lượt mượn, người dùng) theo nhiều định dạng, luôn ghi file tạm rồi đổi tên.
+# Khi đọc, định dạng được nhận ra từ nội dung nên đổi SNAPSHOT_FORMAT không cần chuyển đổi dữ liệu cũ
+import json
+import os
+import pickle
+
+from config import SNAPSHOT_FORMAT
+from metrics import timed
+from records import Record, plain
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def plain_rows(data):
+    return [row.to_dict() if isinstance(row, Record) else row for row in data]
+
+
+class JsonSerializer:
+    # compact=False ghi thụt lề như bản cũ để dễ đọc bằng mắt; orjson chỉ thụt được 2 dấu cách
+    name = "json"
+
+    def __init__(self, compact=True, fast=True):
+        self.compact = compact
+        self.orjson = orjson if fast else None
+
+    def dumps(self, data):
+        if self.orjson is not None:
+            return self.orjson.dumps(data, default=plain, option=0 if self.compact else self.orjson.OPT_INDENT_2)
+        if self.compact:
+            return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=plain).encode("utf-8")
+        return json.dumps(data, indent=4, default=plain).encode("utf-8")
+
+    def loads(self, raw):
+        if self.orjson is not None:
+            return self.orjson.loads(raw)
+        return json.loads(raw)
+
+
+class MsgpackSerializer:
+    name = "msgpack"
+
+    def dumps(self, data):
+        return msgpack.packb(data, default=plain)
+
+    def loads(self, raw):
+        return msgpack.unpackb(raw)
+
+
+class PickleSerializer:
+    # Chỉ dùng cho file dữ liệu của chính thư viện: pickle không an toàn với dữ liệu từ nguồn lạ
+    name = "pickle"
+
+    def dumps(self, data):
+        return pickle.dumps(plain_rows(data), protocol=5)
+
+    def loads(self, raw):
+        return pickle.loads(raw)
+
+
+def get_serializer(fmt=SNAPSHOT_FORMAT):
+    if fmt == "json":
+        return JsonSerializer()
+    if fmt == "json-indent":
+        return JsonSerializer(compact=False)
+    if fmt == "msgpack":
+        if msgpack is None:
+            raise ValueError("Chưa cài msgpack (pip install msgpack)")
+        return MsgpackSerializer()
+    if fmt == "pickle":
+        return PickleSerializer()
+    raise ValueError(f"Không hỗ trợ định dạng: {fmt}")
+
+
+def detect(raw):
+    # pickle giao thức 2+ bắt đầu bằng 0x80; JSON bằng [ { hoặc khoảng trắng; còn lại là mảng msgpack
+    if raw[:1] == b"\x80":
+        return PickleSerializer()
+    if raw.lstrip()[:1] in (b"[", b"{"):
+        return JsonSerializer()
+    if msgpack is None:
+        raise ValueError("File dữ liệu dạng msgpack nhưng chưa cài msgpack")
+    return MsgpackSerializer()
+
+
+@timed("snapshot.read")
+def read_snapshot(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "rb") as f:
+        raw = f.read()
+    if not raw.strip():
+        return default
+    return detect(raw).loads(raw)
+
+
+@timed("snapshot.write")
+def write_snapshot(path, data, serializer=None):
+    # Ghi ra file tạm rồi đổi tên để không làm hỏng file cũ nếu bị ngắt giữa chừng
+    payload = (serializer or get_serializer()).dumps(data)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
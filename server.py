@@ -0,0 +1,286 @@
+# Máy chủ HTTP/JSON bất đồng bộ cho LibraryService; nhiều quầy dùng chung một tiến trình
+# Chạy: python server.py
+import asyncio
+import json
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from config import REMINDER_DAYS, SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SESSION_TTL
+from metrics import PROFILER, REGISTRY, MetricsDumper
+from records import plain
+from service import ServiceError, local_service
+
+MAX_BODY = 10 * 1024 * 1024
+REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 401: "Unauthorized",
+           403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+# Nhóm bắt trong mẫu đường dẫn, thay bằng {id} trong tên số liệu
+GROUP_RE = re.compile(r"\([^)]*\)")
+ROLE_LEVELS = {"docgia": 1, "thuthu": 2, "admin": 3}
+ACCESS_LEVELS = {"user": 1, "staff": 2, "admin": 3}
+
+
+def int_arg(query, name, default):
+    try:
+        return int(query.get(name, [default])[0])
+    except ValueError:
+        raise ServiceError(f"Tham số {name} không hợp lệ.")
+
+
+def str_arg(query, name, default=None):
+    return query.get(name, [default])[0]
+
+
+def bool_arg(query, name):
+    return str_arg(query, name, "0") in ("1", "true")
+
+
+def is_staff(user):
+    return ROLE_LEVELS.get(user["role"], 0) >= ACCESS_LEVELS["staff"]
+
+
+def acting_user(user, username):
+    # Thủ thư/quản trị viên làm thay độc giả tại quầy; độc giả chỉ làm cho chính mình
+    if username and username != user["username"] and not is_staff(user):
+        raise ServiceError("Không có quyền thực hiện thao tác này.", 403)
+    return username or user["username"]
+
+
+def listed_user(user, username):
+    # Thủ thư xem của mọi người (None) hoặc một độc giả; độc giả chỉ xem của mình
+    return username if is_staff(user) else acting_user(user, username)
+
+
+class Sessions:
+    # Phiên đăng nhập trong bộ nhớ: mã ngẫu nhiên -> người dùng, hết hạn sau ttl giây không dùng
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.tokens = {}
+
+    def issue(self, user):
+        token = secrets.token_urlsafe(32)
+        now = time.monotonic()
+        with self.lock:
+            self.tokens = {key: entry for key, entry in self.tokens.items() if entry[1] > now}
+            self.tokens[token] = (user, now + self.ttl)
+        return token
+
+    def user(self, token):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.tokens.get(token)
+            if entry is None or entry[1] <= now:
+                self.tokens.pop(token, None)
+                return None
+            self.tokens[token] = (entry[0], now + self.ttl)
+            return entry[0]
+
+
+class LibraryServer:
+    def __init__(self, service, workers=SERVER_WORKERS):
+        self.service = service
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="library-worker")
+        self.sessions = Sessions()
+        s = service
+        # (phương thức, mẫu đường dẫn, quyền, hàm xử lý(match, query, body, người dùng của phiên))
+        # Quyền: None là công khai, "user" mọi người đã đăng nhập, "staff" thủ thư/quản trị viên, "admin"
+        self.routes = [
+            ("GET", r"/books", "user", lambda m, q, b, u: s.list_books(
+                int_arg(q, "offset", 0), int_arg(q, "limit", 50), str_arg(q, "sort"), bool_arg(q, "reverse"))),
+            ("POST", r"/books", "staff", lambda m, q, b, u: (201, s.add_book(
+                b.get("title"), b.get("author"), b.get("category"), b.get("copies", 1)))),
+            ("POST", r"/books/import", "admin", lambda m, q, b, u: {"added": s.import_books(b.get("books", []))}),
+            ("POST", r"/books/merge", "staff", lambda m, q, b, u: {"merged": s.merge_duplicate_titles()}),
+            ("POST", r"/books/([^/]+)/copies", "staff", lambda m, q, b, u: s.add_copies(m[1], b.get("count", 1))),
+            ("POST", r"/books/([^/]+)/reservations", "user", lambda m, q, b, u: (201, s.reserve_book(
+                m[1], acting_user(u, b.get("username"))))),
+            ("DELETE", r"/books/([^/]+)/reservations", "user", lambda m, q, b, u: (204, s.cancel_reservation(
+                m[1], acting_user(u, str_arg(q, "username"))))),
+            ("GET", r"/books/([^/]+)", "user", lambda m, q, b, u: s.get_book(m[1])),
+            ("PUT", r"/books/([^/]+)", "staff", lambda m, q, b, u: s.edit_book(
+                m[1], b.get("title"), b.get("author"), b.get("category"))),
+            ("DELETE", r"/books/([^/]+)", "staff", lambda m, q, b, u: (204, s.delete_book(m[1]))),
+            ("GET", r"/thumbnails/([0-9a-f]{64})", "user", lambda m, q, b, u: s.thumbnail(m[1])),
+            ("GET", r"/search", "user", lambda m, q, b, u: s.search_books(
+                str_arg(q, "q", ""), str_arg(q, "category"), int_arg(q, "offset", 0), int_arg(q, "limit", 50))),
+            ("GET", r"/categories", "user", lambda m, q, b, u: s.categories()),
+            ("GET", r"/borrows", "user", lambda m, q, b, u: s.list_borrows(
+                int_arg(q, "offset", 0), int_arg(q, "limit", 50), listed_user(u, str_arg(q, "username")),
+                str_arg(q, "sort"), bool_arg(q, "reverse"))),
+            ("POST", r"/borrows", "user", lambda m, q, b, u: (201, s.borrow_book(
+                b.get("book_id"), acting_user(u, b.get("username")), b.get("loan_days")))),
+            ("GET", r"/borrows/overdue", "user", lambda m, q, b, u: s.list_overdue(
+                int_arg(q, "offset", 0), int_arg(q, "limit", 50), listed_user(u, str_arg(q, "username")))),
+            ("GET", r"/borrows/overdue/notices", "staff", lambda m, q, b, u: s.overdue_notices(int_arg(q, "after", 0))),
+            ("GET", r"/reminders", "staff", lambda m, q, b, u: s.reminders(int_arg(q, "days", REMINDER_DAYS))),
+            ("POST", r"/borrows/import", "admin", lambda m, q, b, u: {"added": s.import_borrows(b.get("borrows", []))}),
+            ("GET", r"/borrows/([^/]+)", "user", lambda m, q, b, u: self.own_borrow(u, m[1])),
+            ("POST", r"/borrows/([^/]+)/return", "user", lambda m, q, b, u: s.return_book(self.own_borrow(u, m[1])["id"])),
+            ("GET", r"/users/any", None, lambda m, q, b, u: s.has_users()),
+            ("POST", r"/login", None, lambda m, q, b, u: self.login(b.get("username"), b.get("password"))),
+            ("POST", r"/register", None, lambda m, q, b, u: (201, s.register(
+                b.get("username"), b.get("password"), self.registered_role(u, b.get("role")), b.get("name"),
+                b.get("phone"), b.get("email"), b.get("address")))),
+            ("GET", r"/stats", "user", lambda m, q, b, u: s.stats()),
+            ("GET", r"/stats/chart", "user", lambda m, q, b, u: s.stats_chart(
+                int_arg(q, "width", 600), int_arg(q, "height", 300))),
+            ("GET", r"/analytics", "staff", lambda m, q, b, u: s.analytics(str_arg(q, "start"), str_arg(q, "end"))),
+            ("GET", r"/analytics/chart", "staff", lambda m, q, b, u: s.analytics_chart(
+                str_arg(q, "start"), str_arg(q, "end"), int_arg(q, "width", 600), int_arg(q, "height", 300))),
+            # Chỉ có số liệu thời gian, không có dữ liệu thư viện: để công khai cho Prometheus thu thập
+            ("GET", r"/metrics", None, lambda m, q, b, u: REGISTRY.prometheus()),
+            ("POST", r"/debug/profile", "admin", lambda m, q, b, u: (201, self.start_profile(
+                b.get("cpu", True), b.get("memory", False)))),
+            ("DELETE", r"/debug/profile", "admin", lambda m, q, b, u: {"files": PROFILER.stop()}),
+        ]
+        # Mỗi tuyến có một biểu đồ thời gian riêng, nhãn như "GET /books/{id}"
+        self.routes = [(method, re.compile(pattern + "$"), access, handler,
+                        REGISTRY.histogram(f"http.{method} {GROUP_RE.sub('{id}', pattern)}"))
+                       for method, pattern, access, handler in self.routes]
+
+    def login(self, username, password):
+        user = self.service.login(username, password)
+        return dict(user, token=self.sessions.issue(user))
+
+    def registered_role(self, user, role):
+        # Ai cũng tự đăng ký được tài khoản độc giả; tài khoản thủ thư/quản trị viên do quản trị viên tạo,
+        # trừ tài khoản đầu tiên khi hệ thống chưa có người dùng nào
+        if role != "docgia" and self.service.has_users() and (user is None or user["role"] != "admin"):
+            raise ServiceError("Chỉ quản trị viên mới tạo được tài khoản thủ thư/quản trị viên.", 403)
+        return role
+
+    def own_borrow(self, user, borrow_id):
+        borrow = self.service.get_borrow(borrow_id)
+        acting_user(user, borrow["username"])
+        return borrow
+
+    def start_profile(self, cpu, memory):
+        PROFILER.start(bool(cpu), bool(memory), attach=False)
+        return {"cpu": PROFILER.profile is not None, "memory": PROFILER.memory}
+
+    def authorize(self, access, headers):
+        # Người dùng lấy từ mã phiên trong "Authorization: Bearer <mã>", không tin tên/quyền gửi kèm trong yêu cầu
+        scheme, _, token = (headers or {}).get("authorization", "").partition(" ")
+        user = self.sessions.user(token) if scheme.lower() == "bearer" and token else None
+        if access is None:
+            return user
+        if user is None:
+            raise ServiceError("Vui lòng đăng nhập.", 401)
+        if ROLE_LEVELS.get(user["role"], 0) < ACCESS_LEVELS[access]:
+            raise ServiceError("Không có quyền thực hiện thao tác này.", 403)
+        return user
+
+    def dispatch(self, method, target, body, headers=None):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        path_matched = False
+        for route_method, pattern, access, handler, histogram in self.routes:
+            match = pattern.match(url.path)
+            if not match:
+                continue
+            path_matched = True
+            if route_method != method:
+                continue
+            start = time.perf_counter()
+            try:
+                user = self.authorize(access, headers)
+                data = json.loads(body) if body else {}
+                result = handler(match, query, data, user)
+            except ServiceError as e:
+                return e.status, {"error": e.message}
+            except (ValueError, AttributeError, TypeError) as e:
+                return 400, {"error": f"Yêu cầu không hợp lệ: {e}"}
+            finally:
+                histogram.observe(time.perf_counter() - start)
+            if isinstance(result, tuple):
+                return result
+            return 200, result
+        if path_matched:
+            return 405, {"error": "Phương thức không được hỗ trợ."}
+        return 404, {"error": "Không tìm thấy."}
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {"error": "Dữ liệu gửi lên quá lớn."}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                # Công việc nghiệp vụ chạy trên nhóm luồng để vòng lặp sự kiện không bị chặn
+                status, result = await loop.run_in_executor(self.pool, self.safe_dispatch, method, target, body, headers)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.respond(writer, status, result, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def safe_dispatch(self, method, target, body, headers=None):
+        try:
+            return PROFILER.call(self.dispatch, method, target, body, headers)
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    async def respond(self, writer, status, result, keep_alive):
+        if isinstance(result, bytes):
+            payload, content_type = result, "image/jpeg" if result.startswith(b"\xff\xd8") else "image/png"
+        elif isinstance(result, str):
+            payload, content_type = result.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        elif status == 204:
+            payload, content_type = b"", "application/json"
+        else:
+            payload, content_type = json.dumps(result, ensure_ascii=False, default=plain).encode("utf-8"), "application/json; charset=utf-8"
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    async def serve(self, host=SERVER_HOST, port=SERVER_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    service = local_service()
+    service.start_scheduler()
+    dumper = MetricsDumper().start()
+    PROFILER.start_from_config(attach=False)
+    print(f"Máy chủ thư viện đang chạy tại http://{SERVER_HOST}:{SERVER_PORT}")
+    try:
+        asyncio.run(LibraryServer(service).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        dumper.stop()
+        if PROFILER.active:
+            print("Đã ghi hồ sơ hiệu năng:", ", ".join(PROFILER.stop()))
+
+
+if __name__ == "__main__":
+    main()
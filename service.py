@@ -0,0 +1,594 @@
+# Lõi nghiệp vụ thư viện không phụ thuộc giao diện: sách, mượn/trả, người dùng, thống kê
+import threading
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from analytics import NUMPY_AVAILABLE, BorrowAnalytics
+from catalog import Catalog, available_of, copies_of, copy_of, new_copy_ids
+from config import (BRANCH, BRANCHES, CONFLICT_RETRIES, FINE_PER_DAY, LOAN_DAYS, OVERDUE_CHECK_SECONDS, REMINDER_DAYS,
+                    SERVER_URL)
+from ingest import DedupIndex, normalize_title
+from metrics import instrumented
+from overdue import OverdueIndex, days_between
+from search import SearchIndex, tokenize
+from stats import StatsAggregator
+from thumbnails import ThumbnailCache
+from storage import ConflictError, open_storage
+from users import UserDirectory
+
+BOOK_SORT_FIELDS = ("id", "title", "author", "category", "status")
+BORROW_SORT_FIELDS = ("id", "title", "username", "borrow_date", "due_date", "returned")
+MAX_OVERDUE_NOTICES = 1000
+# Số kết quả tìm kiếm (term, category) giữ lại; tìm khi đang gõ lặp lại các tiền tố vừa gõ
+SEARCH_CACHE_SIZE = 128
+# Thay cho thể loại trong khóa search_cache: mục (term, FACETS) giữ số kết quả theo thể loại của term
+FACETS = object()
+# Trường do enrich.py bổ sung; thumbnail là mã băm của ảnh trong ThumbnailCache
+METADATA_FIELDS = ("isbn", "description", "cover_url", "thumbnail")
+# Các thao tác nghiệp vụ được đo thời gian; không đo hàm phụ gọi theo từng dòng (page, borrow_view, sorted_ids...)
+# hay save/mutate vốn đã nằm trong thời gian của thao tác gọi chúng
+OPERATIONS = ("list_books", "get_book", "search_books", "categories", "add_book", "add_copies", "merge_duplicate_titles",
+              "import_books", "edit_book", "delete_book", "books_to_enrich", "update_metadata", "thumbnail",
+              "list_borrows", "get_borrow", "borrow_book", "import_borrows", "return_book", "reserve_book",
+              "cancel_reservation", "list_overdue", "check_overdue", "overdue_notices", "reminders", "has_users",
+              "login", "register", "stats", "stats_chart", "analytics", "analytics_chart")
+
+
+class ServiceError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def public_user(user):
+    return {key: value for key, value in user.items() if key != "password"}
+
+
+# Các thao tác trong OPERATIONS được đo thời gian dưới tên "service.<tên>" (xem metrics.py)
+@instrumented("service", names=OPERATIONS)
+class LibraryService:
+    def __init__(self, storage=None):
+        self.storage = storage or open_storage()
+        self.catalog = Catalog()
+        self.search_index = SearchIndex()
+        self.catalog.subscribe(self.search_index)
+        self.dedup_index = DedupIndex()
+        self.catalog.subscribe(self.dedup_index)
+        self.stats_aggregator = StatsAggregator()
+        self.catalog.subscribe(self.stats_aggregator)
+        self.overdue_index = OverdueIndex()
+        self.catalog.subscribe(self.overdue_index)
+        self.borrow_analytics = BorrowAnalytics()
+        self.catalog.subscribe(self.borrow_analytics)
+        self.thumbnails = ThumbnailCache()
+        # Một khóa cho mọi thao tác: các luồng của máy chủ dùng chung một catalog
+        self.lock = threading.RLock()
+        self.sorted_cache = {}
+        # LRU (term, category) -> danh sách id đã xếp hạng, bỏ toàn bộ khi catalog đổi phiên bản
+        self.search_cache = OrderedDict()
+        self.search_cache_version = None
+        # Thông báo quá hạn đánh số tăng dần: mỗi quầy tự nhớ số cuối cùng đã đọc
+        self.overdue_notices_log = deque(maxlen=MAX_OVERDUE_NOTICES)
+        self.overdue_seq = 0
+        self.scheduler = None
+        self.scheduler_stop = threading.Event()
+        # Trong deferred_save(): mutate chỉ sửa catalog, lưu một lần khi ra khỏi khối
+        self.deferring = False
+        self.load()
+
+    def load(self):
+        with self.lock:
+            books, borrows = self.storage.load()
+            self.catalog.load(books, borrows)
+            self.users = UserDirectory(self.storage, self.lock)
+
+    def save(self):
+        changes = self.catalog.drain_changes()
+        try:
+            self.storage.commit(self.catalog, changes)
+        except ConflictError as e:
+            # Hoàn tác thay đổi của mình rồi nhận trạng thái mới nhất từ kho lưu trữ
+            self.catalog.rollback(changes)
+            e.apply(self.catalog)
+            raise
+        except Exception:
+            # Lưu hỏng (đầy đĩa, sqlite bị khóa...): hoàn tác để catalog trong bộ nhớ vẫn khớp với kho lưu trữ
+            self.catalog.rollback(changes)
+            raise
+
+    def mutate(self, operation):
+        # Khóa lạc quan: operation() kiểm tra và sửa catalog; bị quầy khác ghi chen thì chạy lại
+        # trên dữ liệu mới, nên lượt mượn thua cuộc nhận ngay lỗi "không có sẵn" thay vì chờ khóa
+        with self.lock:
+            if self.deferring:
+                return operation()
+            self.storage.sync(self.catalog)
+            for attempt in range(CONFLICT_RETRIES + 1):
+                try:
+                    result = operation()
+                except Exception:
+                    # Thao tác dừng giữa chừng: bỏ các sửa đổi dở dang để lần lưu sau không ghi chúng vào kho
+                    self.catalog.rollback(self.catalog.drain_changes())
+                    raise
+                try:
+                    self.save()
+                    return result
+                except ConflictError:
+                    # Lỗi xung đột chỉ mang các bản ghi bị ghi chen; nhận nốt các thay đổi khác của quầy kia
+                    # (vd. lượt mượn mới của cùng bản sao) để lần chạy lại thấy đủ dữ liệu mới nhất
+                    self.storage.sync(self.catalog)
+            raise ServiceError("Dữ liệu đang được quầy khác cập nhật, vui lòng thử lại.", 409)
+
+    @contextmanager
+    def deferred_save(self):
+        # Gom mọi thao tác trong khối thành một lần lưu (bulk.py nhập vào kho JSON, vốn ghi lại cả file mỗi lần lưu).
+        # Giữ khóa suốt khối; lỗi giữa chừng hoặc bị ghi chen lúc lưu thì hoàn tác toàn bộ
+        with self.lock:
+            self.storage.sync(self.catalog)
+            self.deferring = True
+            try:
+                yield
+            except Exception:
+                self.catalog.rollback(self.catalog.drain_changes())
+                raise
+            finally:
+                self.deferring = False
+            try:
+                self.save()
+            except ConflictError:
+                raise ServiceError("Dữ liệu đang được quầy khác cập nhật, vui lòng thử lại.", 409)
+
+    def refresh(self):
+        # Nhận thay đổi do tiến trình khác ghi vào cùng kho dữ liệu
+        with self.lock:
+            self.storage.sync(self.catalog)
+
+    def close(self):
+        self.scheduler_stop.set()
+        if self.scheduler is not None:
+            self.scheduler.join()
+        self.storage.close()
+
+    def start_scheduler(self, interval=OVERDUE_CHECK_SECONDS):
+        # Luồng nền định kỳ đưa các lượt mượn vừa quá hạn vào danh sách thông báo
+        def run():
+            while not self.scheduler_stop.is_set():
+                self.check_overdue()
+                self.scheduler_stop.wait(interval)
+
+        if self.scheduler is None:
+            self.scheduler = threading.Thread(target=run, name="overdue-scheduler", daemon=True)
+            self.scheduler.start()
+
+    # --- Phân trang ---
+
+    def sorted_ids(self, kind, ids, sort, reverse, key):
+        # Danh sách id đã sắp xếp được giữ lại đến khi catalog thay đổi
+        cache_key = (kind, sort, reverse)
+        cached = self.sorted_cache.get(cache_key)
+        if cached is None or cached[0] != self.catalog.version:
+            cached = (self.catalog.version, sorted(ids, key=key, reverse=reverse))
+            self.sorted_cache[cache_key] = cached
+        return cached[1]
+
+    def page(self, ids, offset, limit, total, load):
+        items = [load(record_id) for record_id in islice(ids, offset, offset + limit)]
+        return {"total": total, "items": items}
+
+    # --- Sách ---
+
+    def list_books(self, offset=0, limit=50, sort=None, reverse=False):
+        with self.lock:
+            ids = self.catalog.book_ids()
+            if sort in BOOK_SORT_FIELDS:
+                get = self.catalog.get_book
+                ids = self.sorted_ids("book", ids, sort, reverse, lambda i: str(get(i)[sort]).casefold())
+            return self.page(ids, offset, limit, self.catalog.book_count(), self.catalog.get_book)
+
+    def get_book(self, book_id):
+        with self.lock:
+            book = self.catalog.get_book(book_id)
+            if book is None:
+                raise ServiceError("Không tìm thấy sách.", 404)
+            return book
+
+    def search_books(self, term="", category=None, offset=0, limit=50):
+        with self.lock:
+            if self.search_cache_version != self.catalog.version:
+                self.search_cache.clear()
+                self.search_cache_version = self.catalog.version
+            ids = self.cached_search(term, category)
+            page = self.page(ids, offset, limit, len(ids), self.catalog.get_book)
+            # Số kết quả theo từng thể loại của cùng từ khóa (không lọc thể loại) để giao diện hiện bộ lọc
+            key = (term, FACETS)
+            facets = self.search_cache.get(key)
+            if facets is None:
+                facets = self.search_index.facets(self.cached_search(term, None) if tokenize(term) else None)
+                self.cache_search(key, facets)
+            else:
+                self.search_cache.move_to_end(key)
+            page["facets"] = dict(facets)
+            return page
+
+    def cached_search(self, term, category):
+        key = (term, category)
+        ids = self.search_cache.get(key)
+        if ids is None:
+            ids = self.search_index.search(term, category)
+            self.cache_search(key, ids)
+        else:
+            self.search_cache.move_to_end(key)
+        return ids
+
+    def cache_search(self, key, value):
+        self.search_cache[key] = value
+        if len(self.search_cache) > SEARCH_CACHE_SIZE:
+            self.search_cache.popitem(last=False)
+
+    def categories(self):
+        with self.lock:
+            return self.search_index.category_names()
+
+    def add_book(self, title, author, category, copies=1):
+        if not all([title, author, category]):
+            raise ServiceError("Vui lòng điền đầy đủ tất cả các trường.")
+        copies = self.copy_count(copies)
+        book_id = str(uuid.uuid4())
+        return self.mutate(lambda: self.catalog.add_book({
+            "id": book_id,
+            "title": title,
+            "author": author,
+            "category": category,
+            "status": "available",
+            "copies": new_copy_ids(book_id, 1, copies),
+            "available": copies
+        }))
+
+    def copy_count(self, count):
+        try:
+            count = int(count)
+        except (TypeError, ValueError):
+            count = 0
+        if count < 1:
+            raise ServiceError("Số bản sao phải là số nguyên dương.")
+        return count
+
+    def add_copies(self, book_id, count=1):
+        # Bản sao mới được giao ngay cho người đặt trước nếu có hàng đợi
+        count = self.copy_count(count)
+
+        def add():
+            book = self.catalog.get_book(book_id)
+            if book is None:
+                raise ServiceError("Không tìm thấy sách.", 404)
+            return self.catalog.add_copies(book_id, new_copy_ids(book_id, len(copies_of(book)) + 1, count))
+        return self.mutate(add)
+
+    def merge_duplicate_titles(self):
+        # Gộp các bản ghi cùng tiêu đề và tác giả (trước đây mỗi bản sao là một sách) thành một đầu sách nhiều bản;
+        # lượt mượn của bản ghi bị gộp chuyển sang đầu sách giữ lại, mã bản sao giữ nguyên
+        def merge():
+            keepers = {}
+            duplicates = []
+            for book in self.catalog.iter_books():
+                keeper = keepers.setdefault((normalize_title(book["title"]), normalize_title(book["author"])), book)
+                if keeper is not book:
+                    duplicates.append((keeper, book))
+            if not duplicates:
+                return 0
+
+            merged_ids = {book["id"] for _, book in duplicates}
+            loans = {}
+            for borrow in self.catalog.iter_borrows():
+                if borrow["book_id"] in merged_ids:
+                    loans.setdefault(borrow["book_id"], []).append(borrow)
+
+            holdings = {}
+            for keeper, book in duplicates:
+                state = holdings.get(keeper["id"])
+                if state is None:
+                    state = holdings[keeper["id"]] = {
+                        "copies": copies_of(keeper), "available": available_of(keeper),
+                        "reservations": dict(keeper.get("reservations", {})), "holds": dict(keeper.get("holds", {}))}
+                state["copies"] = state["copies"] + copies_of(book)
+                state["available"] += available_of(book)
+                for username, since in book.get("reservations", {}).items():
+                    state["reservations"].setdefault(username, since)
+                state["holds"].update(book.get("holds", {}))
+                for borrow in loans.get(book["id"], []):
+                    self.catalog.update_borrow(borrow["id"], book_id=keeper["id"], copy_id=copy_of(borrow))
+                self.catalog.delete_book(book["id"])
+            # Cập nhật đầu sách sau khi xóa bản trùng để chỉ mục chống trùng trỏ về đầu sách giữ lại
+            for keeper_id, state in holdings.items():
+                state["status"] = "available" if state["available"] > 0 else "borrowed"
+                self.catalog.update_book(keeper_id, **state)
+            return len(duplicates)
+        return self.mutate(merge)
+
+    def import_books(self, books):
+        # Bỏ qua sách trùng id, ISBN hoặc tiêu đề chuẩn hóa (kể cả trùng trong cùng lô)
+        def add_new():
+            added = 0
+            for book in books:
+                if self.catalog.get_book(book["id"]) is None and not self.dedup_index.contains(book):
+                    self.catalog.add_book(dict(book))
+                    added += 1
+            return added
+        return self.mutate(add_new)
+
+    def edit_book(self, book_id, title, author, category):
+        if not all([title, author, category]):
+            raise ServiceError("Vui lòng điền đầy đủ tất cả các trường.")
+        def update():
+            book = self.catalog.update_book(book_id, title=title, author=author, category=category)
+            if book is None:
+                raise ServiceError("Không tìm thấy sách.", 404)
+            return book
+        return self.mutate(update)
+
+    def delete_book(self, book_id):
+        def delete():
+            book = self.catalog.get_book(book_id)
+            if book is None:
+                raise ServiceError("Không tìm thấy sách.", 404)
+            # Trạng thái nằm trên chính bản ghi sách nên được kiểm tra phiên bản khi lưu
+            if book["status"] != "available" or self.catalog.active_borrow(book_id):
+                raise ServiceError("Không thể xóa sách đang được mượn.", 409)
+            self.catalog.delete_book(book_id)
+        self.mutate(delete)
+
+    # --- Bổ sung thông tin ---
+
+    def books_to_enrich(self, force=False):
+        # Sách còn thiếu ISBN, mô tả hoặc ảnh bìa (force: mọi sách), chỉ gồm các trường cần để tra cứu
+        with self.lock:
+            return [{field: book[field] for field in ("id", "title", "author") + METADATA_FIELDS if field in book}
+                    for book in self.catalog.iter_books()
+                    if force or not all(book.get(field) for field in ("isbn", "description", "thumbnail"))]
+
+    def update_metadata(self, updates):
+        # updates: [{"id", "isbn"?, "description"?, "cover_url"?, "thumbnail"?}]; bỏ qua sách đã bị xóa
+        def update():
+            updated = 0
+            for item in updates:
+                fields = {field: item[field] for field in METADATA_FIELDS if item.get(field)}
+                if fields and self.catalog.update_book(item["id"], **fields) is not None:
+                    updated += 1
+            return updated
+        return self.mutate(update)
+
+    def thumbnail(self, key):
+        data = self.thumbnails.get(key)
+        if data is None:
+            raise ServiceError("Không tìm thấy ảnh bìa.", 404)
+        return data
+
+    # --- Mượn/trả ---
+
+    def borrow_view(self, borrow_id, today=None):
+        borrow = self.catalog.get_borrow(borrow_id)
+        book = self.catalog.get_book(borrow["book_id"])
+        view = dict(borrow)
+        view["title"] = book["title"] if book else "Không Xác Định"
+        today = today or date.today().isoformat()
+        if not borrow["returned"] and borrow["due_date"] < today:
+            view["days_overdue"] = days_between(borrow["due_date"], today)
+            view["fine"] = view["days_overdue"] * FINE_PER_DAY
+        return view
+
+    def list_borrows(self, offset=0, limit=50, username=None, sort=None, reverse=False):
+        with self.lock:
+            if username is not None:
+                ids = self.catalog.borrow_ids_of(username)
+                total = len(ids)
+            else:
+                ids = self.catalog.borrow_ids()
+                total = self.catalog.borrow_count()
+                if sort in BORROW_SORT_FIELDS:
+                    view = self.borrow_view
+                    ids = self.sorted_ids("borrow", ids, sort, reverse, lambda i: str(view(i)[sort]).casefold())
+            return self.page(ids, offset, limit, total, self.borrow_view)
+
+    def get_borrow(self, borrow_id):
+        with self.lock:
+            if self.catalog.get_borrow(borrow_id) is None:
+                raise ServiceError("Không tìm thấy bản ghi mượn.", 404)
+            return self.borrow_view(borrow_id)
+
+    def borrow_book(self, book_id, username, loan_days=None):
+        loan_days = loan_days or LOAN_DAYS
+
+        def borrow():
+            book = self.catalog.get_book(book_id)
+            if not book:
+                raise ServiceError("Sách không có sẵn để mượn.", 409)
+            # Người đặt trước nhận bản đang được giữ cho mình; người khác lấy một bản rảnh bất kỳ
+            copy_id = book.get("holds", {}).get(username)
+            if copy_id is None:
+                copy_id = self.catalog.free_copy(book_id)
+                if copy_id is None or available_of(book) <= 0:
+                    raise ServiceError("Sách không có sẵn để mượn.", 409)
+            return self.catalog.add_borrow({
+                "id": str(uuid.uuid4()),
+                "book_id": book_id,
+                "copy_id": copy_id,
+                "username": username,
+                "borrow_date": datetime.now().strftime("%Y-%m-%d"),
+                "due_date": (datetime.now() + timedelta(days=loan_days)).strftime("%Y-%m-%d"),
+                "returned": False
+            })
+        return self.mutate(borrow)
+
+    def import_borrows(self, borrows):
+        # Bỏ qua lượt mượn đã có, sách/bản sao không tồn tại, hoặc bản sao đang có lượt mượn khác chưa trả
+        def add_new():
+            added = 0
+            for borrow in borrows:
+                book = self.catalog.get_book(borrow["book_id"])
+                if self.catalog.get_borrow(borrow["id"]) or not book or copy_of(borrow) not in copies_of(book):
+                    continue
+                if not borrow["returned"] and self.catalog.copy_on_loan(copy_of(borrow)):
+                    continue
+                self.catalog.add_borrow(dict(borrow))
+                added += 1
+            return added
+        return self.mutate(add_new)
+
+    def return_book(self, borrow_id):
+        def give_back():
+            borrow, held_for = self.catalog.return_borrow(borrow_id)
+            if not borrow:
+                raise ServiceError("Bản ghi mượn không hợp lệ hoặc đã được trả.", 409)
+            result = dict(borrow)
+            if held_for:
+                result["held_for"] = held_for
+            return result
+        return self.mutate(give_back)
+
+    # --- Đặt trước ---
+
+    def reserve_book(self, book_id, username):
+        def reserve():
+            book = self.catalog.get_book(book_id)
+            if book is None:
+                raise ServiceError("Không tìm thấy sách.", 404)
+            if available_of(book) > 0:
+                raise ServiceError("Sách đang có sẵn, có thể mượn ngay.", 409)
+            if username in book.get("reservations", {}) or username in book.get("holds", {}):
+                raise ServiceError("Bạn đã đặt trước sách này.", 409)
+            borrows = (self.catalog.get_borrow(i) for i in self.catalog.borrow_ids_of(username))
+            if any(borrow["book_id"] == book_id and not borrow["returned"] for borrow in borrows):
+                raise ServiceError("Bạn đang mượn sách này.", 409)
+            return {"book_id": book_id, "position": self.catalog.reserve(book_id, username)}
+        return self.mutate(reserve)
+
+    def cancel_reservation(self, book_id, username):
+        def cancel():
+            if self.catalog.get_book(book_id) is None:
+                raise ServiceError("Không tìm thấy sách.", 404)
+            if not self.catalog.cancel_reservation(book_id, username):
+                raise ServiceError("Không có lượt đặt trước.", 404)
+        self.mutate(cancel)
+
+    # --- Quá hạn ---
+
+    def list_overdue(self, offset=0, limit=50, username=None):
+        with self.lock:
+            today = date.today().isoformat()
+            self.overdue_index.advance(today)
+            if username is not None:
+                overdue = self.overdue_index.overdue
+                ids = sorted((i for i in self.catalog.borrow_ids_of(username) if i in overdue),
+                             key=lambda i: (overdue[i], i))
+            else:
+                ids = self.overdue_index.overdue_ids()
+            return self.page(ids, offset, limit, len(ids), lambda i: self.borrow_view(i, today))
+
+    def check_overdue(self, today=None):
+        # Chỉ lấy các lượt vừa quá hạn kể từ lần kiểm tra trước: O(k log n)
+        with self.lock:
+            today = today or date.today().isoformat()
+            views = [self.borrow_view(i, today) for i in self.overdue_index.advance(today)]
+            for view in views:
+                self.overdue_seq += 1
+                self.overdue_notices_log.append((self.overdue_seq, view))
+            return views
+
+    def overdue_notices(self, after=0):
+        with self.lock:
+            return {"seq": self.overdue_seq, "items": [view for seq, view in self.overdue_notices_log if seq > after]}
+
+    def reminders(self, within_days=REMINDER_DAYS, today=None):
+        # Gom theo độc giả: lượt đã quá hạn và lượt sắp đến hạn trong within_days ngày tới
+        with self.lock:
+            today = today or date.today().isoformat()
+            self.overdue_index.advance(today)
+            limit = (date.fromisoformat(today) + timedelta(days=within_days + 1)).isoformat()
+            batches = {}
+            for group, ids in (("overdue", self.overdue_index.overdue_ids()),
+                               ("due_soon", self.overdue_index.due_before(limit))):
+                for borrow_id in ids:
+                    view = self.borrow_view(borrow_id, today)
+                    batch = batches.get(view["username"])
+                    if batch is None:
+                        user = self.users.get(view["username"]) or {}
+                        batch = batches[view["username"]] = {
+                            "username": view["username"], "email": user.get("email"), "overdue": [], "due_soon": []}
+                    batch[group].append(view)
+            return list(batches.values())
+
+    # --- Người dùng ---
+
+    def has_users(self):
+        with self.lock:
+            return len(self.users) > 0
+
+    def login(self, username, password):
+        # Không giữ self.lock: UserDirectory chỉ khóa khi đọc/ghi, băm mật khẩu không chặn mượn/trả/tìm kiếm
+        user = self.users.authenticate(username, password)
+        if user is None:
+            raise ServiceError("Tên đăng nhập hoặc mật khẩu không đúng.", 401)
+        return public_user(user)
+
+    def register(self, username, password, role, name, phone, email, address):
+        if not all([username, password, name, phone, email, address, role]):
+            raise ServiceError("Vui lòng điền đầy đủ tất cả các trường.")
+        user = self.users.register(username, password, role=role, name=name, phone=phone, email=email, address=address)
+        if user is None:
+            raise ServiceError("Tên đăng nhập đã tồn tại.", 409)
+        return public_user(user)
+
+    # --- Thống kê ---
+
+    def stats(self):
+        with self.lock:
+            return self.stats_aggregator.snapshot()
+
+    def stats_chart(self, width=600, height=300):
+        # Vẽ ngoài self.lock: các quầy khác không phải chờ matplotlib
+        return self.stats_aggregator.chart_png(self.stats(), (width, height))
+
+    def date_range(self, start, end):
+        # Chuỗi rỗng hoặc None là không giới hạn
+        try:
+            start = date.fromisoformat(start).isoformat() if start else None
+            end = date.fromisoformat(end).isoformat() if end else None
+        except ValueError:
+            raise ServiceError("Ngày không hợp lệ, vui lòng nhập theo dạng YYYY-MM-DD.")
+        if start and end and start > end:
+            raise ServiceError("Ngày bắt đầu phải trước ngày kết thúc.")
+        return start, end
+
+    def analytics(self, start=None, end=None, today=None):
+        # Lượt mượn theo ngày/tuần, sách và độc giả mượn nhiều nhất, thời gian mượn trung bình, tỉ lệ quá hạn
+        if not NUMPY_AVAILABLE:
+            raise ServiceError("Chưa cài đặt NumPy, không thể phân tích lịch sử mượn.")
+        start, end = self.date_range(start, end)
+        with self.lock:
+            return self.borrow_analytics.report(self.catalog, start, end, today)
+
+    def analytics_chart(self, start=None, end=None, width=600, height=300):
+        report = self.analytics(start, end)
+        return self.borrow_analytics.chart_png(report, (width, height))
+
+
+def local_service(branch=BRANCH):
+    # Kho chung trong data/, hoặc các kho chi nhánh khi đặt LIBRARY_BRANCHES (branch: chỉ nạp trước chi nhánh này,
+    # None: cả hệ thống)
+    if BRANCHES:
+        from shards import ShardedService
+        return ShardedService(BRANCHES, branch)
+    return LibraryService()
+
+
+def open_service():
+    if SERVER_URL:
+        from client import RemoteService
+        return RemoteService(SERVER_URL)
+    service = local_service()
+    service.start_scheduler()
+    return service
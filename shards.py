@@ -0,0 +1,436 @@
+# Kho chia theo chi nhánh: mỗi chi nhánh là một LibraryService trên kho riêng (data/branches/<tên>/), các kho nạp
+# song song trên nhóm luồng. ShardedService có cùng giao diện với LibraryService: đọc thì hỏi mọi kho trong phạm vi
+# rồi gộp kết quả, ghi thì chuyển đến kho đang giữ sách/lượt mượn đó. Quầy chi nhánh chỉ nạp kho của mình,
+# phạm vi toàn hệ thống nạp thêm các kho còn lại khi cần
+# Chạy: python shards.py split --branches q1,q3,thuduc   (chia kho chung trong data/ thành các kho chi nhánh)
+import argparse
+import heapq
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from itertools import islice, zip_longest
+
+from analytics import TOP_COUNT, BorrowAnalytics
+from config import BRANCH, BRANCH_DIR, BRANCHES, OVERDUE_CHECK_SECONDS, REMINDER_DAYS, STORAGE_BACKEND
+from metrics import instrumented
+from service import (BOOK_SORT_FIELDS, BORROW_SORT_FIELDS, MAX_OVERDUE_NOTICES, OPERATIONS, LibraryService, ServiceError,
+                     public_user)
+from stats import StatsAggregator
+from storage import open_storage, write_catalog
+from thumbnails import ThumbnailCache
+from users import UserDirectory
+
+
+def branch_directory(branch):
+    return os.path.join(BRANCH_DIR, branch)
+
+
+def open_branch_storage(branch, backend=STORAGE_BACKEND):
+    return open_storage(backend, branch_directory(branch))
+
+
+def branch_of(book_id, branches):
+    # Chia đều ổn định theo id: cùng một sách luôn về cùng chi nhánh, không phụ thuộc thứ tự trong file
+    return branches[zlib.crc32(book_id.encode("utf-8")) % len(branches)]
+
+
+def tagged(item, branch):
+    # Bản sao kèm tên chi nhánh; không sửa bản ghi trong catalog
+    return dict(item, branch=branch)
+
+
+def merge_counts(parts):
+    counts = {}
+    for part in parts:
+        for key, value in part.items():
+            counts[key] = counts.get(key, 0) + value
+    return counts
+
+
+def merge_reports(reports, readers):
+    # Gộp báo cáo analytics của các kho. Sách chỉ thuộc một kho nên gộp danh sách đầu bảng là đủ; độc giả mượn
+    # ở nhiều chi nhánh nên cộng số lượt đầy đủ của từng kho (readers) rồi mới xếp hạng
+    merged = {"version": tuple(report["version"] for report in reports), "start": reports[0]["start"],
+              "end": reports[0]["end"]}
+    for field in ("total", "timed_loans", "loan_days", "late_loans", "judged_loans"):
+        merged[field] = sum(report[field] for report in reports)
+    for field in ("per_day", "per_week"):
+        merged[field] = sorted(merge_counts(dict(report[field]) for report in reports).items())
+    merged["top_titles"] = sorted((item for report in reports for item in report["top_titles"]),
+                                  key=lambda item: -item["count"])[:TOP_COUNT]
+    merged["top_readers"] = [{"username": username, "count": count} for username, count in
+                             heapq.nsmallest(TOP_COUNT, merge_counts(readers).items(), key=lambda item: -item[1])]
+    merged["avg_loan_days"] = round(merged["loan_days"] / merged["timed_loans"], 2) if merged["timed_loans"] else None
+    merged["overdue_rate"] = round(merged["late_loans"] / merged["judged_loans"], 4) if merged["judged_loans"] else None
+    return merged
+
+
+# Thao tác nghiệp vụ được đo dưới tên "shards.<tên>" (không đo fan_out, owner, active...); từng kho vẫn đo
+# riêng dưới "service.<tên>"
+@instrumented("shards", names=OPERATIONS)
+class ShardedService:
+    def __init__(self, branches=BRANCHES, home=BRANCH, open_branch=open_branch_storage, users_storage=None,
+                 workers=None):
+        if not branches:
+            raise ValueError("Cần ít nhất một chi nhánh")
+        if home is not None and home not in branches:
+            raise ValueError(f"Không có chi nhánh: {home}")
+        self.branches = list(branches)
+        self.home = home
+        self.open_branch = open_branch
+        # Nạp kho và chạy truy vấn gộp trên cùng nhóm luồng; mỗi kho có khóa riêng nên các kho chạy đồng thời
+        self.pool = ThreadPoolExecutor(max_workers=workers or len(self.branches), thread_name_prefix="shard")
+        self.futures = {}
+        self.scope = []
+        self.lock = threading.RLock()
+        # Người dùng dùng chung mọi chi nhánh, lưu trong kho chung
+        self.users_storage = users_storage or open_storage()
+        self.users = UserDirectory(self.users_storage, self.lock)
+        self.thumbnails = ThumbnailCache()
+        self.merged_stats = StatsAggregator()
+        self.merged_analytics = BorrowAnalytics()
+        self.overdue_notices_log = deque(maxlen=MAX_OVERDUE_NOTICES)
+        self.overdue_seq = 0
+        self.scheduler = None
+        self.scheduler_stop = threading.Event()
+        self.set_global_view(home is None)
+
+    def load_branch(self, branch):
+        service = LibraryService(self.open_branch(branch))
+        service.users = self.users
+        return service
+
+    def shard(self, branch):
+        # Nạp kho khi cần lần đầu; các lần sau trả ngay
+        with self.lock:
+            future = self.futures.get(branch)
+            if future is None:
+                future = self.futures[branch] = self.pool.submit(self.load_branch, branch)
+        return future.result()
+
+    def set_global_view(self, enabled):
+        # Toàn hệ thống: mọi chi nhánh, kho chưa nạp bắt đầu nạp song song ở nền; không thì chỉ chi nhánh của quầy
+        with self.lock:
+            self.scope = list(self.branches) if enabled or self.home is None else [self.home]
+            for branch in self.scope:
+                if branch not in self.futures:
+                    self.futures[branch] = self.pool.submit(self.load_branch, branch)
+
+    def active(self):
+        # [(chi nhánh, dịch vụ)] trong phạm vi hiện tại; chờ các kho còn đang nạp
+        with self.lock:
+            scope = list(self.scope)
+        return [(branch, self.shard(branch)) for branch in scope]
+
+    def fan_out(self, call, shards=None):
+        # call(chi nhánh, dịch vụ, ...) chạy song song trên từng kho; kết quả theo thứ tự chi nhánh
+        shards = self.active() if shards is None else shards
+        if len(shards) == 1:
+            return [call(*shards[0])]
+        return list(self.pool.map(lambda shard: call(*shard), shards))
+
+    def owner(self, kind, record_id):
+        # Mỗi sách/lượt mượn nằm ở đúng một kho: tra lần lượt các kho trong phạm vi (chỉ là tra dict)
+        for branch, service in self.active():
+            catalog = service.catalog
+            if (catalog.get_book if kind == "book" else catalog.get_borrow)(record_id) is not None:
+                return branch, service
+        raise ServiceError("Không tìm thấy sách." if kind == "book" else "Không tìm thấy bản ghi mượn.", 404)
+
+    def target(self, branch=None):
+        # Sách mới vào chi nhánh được chỉ định, mặc định chi nhánh của quầy (máy chủ: chi nhánh đầu tiên)
+        branch = branch or self.home or self.branches[0]
+        if branch not in self.branches:
+            raise ServiceError("Không có chi nhánh này.", 404)
+        return branch, self.shard(branch)
+
+    def refresh(self):
+        self.fan_out(lambda branch, service: service.refresh())
+
+    def close(self):
+        self.scheduler_stop.set()
+        if self.scheduler is not None:
+            self.scheduler.join()
+        with self.lock:
+            futures = list(self.futures.values())
+        for future in futures:
+            future.result().close()
+        self.pool.shutdown()
+        self.users_storage.close()
+
+    def start_scheduler(self, interval=OVERDUE_CHECK_SECONDS):
+        # Một luồng kiểm tra quá hạn cho mọi kho trong phạm vi, thông báo đánh số chung như LibraryService
+        def run():
+            while not self.scheduler_stop.is_set():
+                self.check_overdue()
+                self.scheduler_stop.wait(interval)
+
+        if self.scheduler is None:
+            self.scheduler = threading.Thread(target=run, name="overdue-scheduler", daemon=True)
+            self.scheduler.start()
+
+    # --- Gộp trang ---
+
+    def concat_page(self, call, offset, limit):
+        # Không sắp xếp: nối kết quả các kho theo thứ tự chi nhánh. Lượt đầu chỉ lấy tổng số,
+        # lượt sau chỉ hỏi các kho có dòng rơi vào trang cần lấy
+        shards = self.active()
+        totals = self.fan_out(lambda branch, service: call(service, 0, 0)["total"], shards)
+        wanted, start = [], 0
+        for (branch, service), total in zip(shards, totals):
+            first, last = max(offset - start, 0), min(offset + limit - start, total)
+            if first < last:
+                wanted.append((branch, service, first, last - first))
+            start += total
+        pages = self.fan_out(lambda branch, service, first, count: [
+            tagged(item, branch) for item in call(service, first, count)["items"]], wanted) if wanted else []
+        return {"total": sum(totals), "items": [item for page in pages for item in page]}
+
+    def sorted_page(self, call, offset, limit, key, reverse=False):
+        # Mỗi kho trả offset + limit dòng đầu đã sắp xếp rồi trộn k đường; trang càng sâu càng tốn
+        pages = self.fan_out(lambda branch, service: (branch, call(service, 0, offset + limit)))
+        streams = [[(branch, item) for item in page["items"]] for branch, page in pages]
+        merged = heapq.merge(*streams, key=lambda pair: key(pair[1]), reverse=reverse)
+        return {"total": sum(page["total"] for _, page in pages),
+                "items": [tagged(item, branch) for branch, item in islice(merged, offset, offset + limit)]}
+
+    def ranked_page(self, call, offset, limit):
+        # Điểm BM25 của các kho không so được với nhau (idf tính trên từng kho): xen kẽ theo hạng
+        pages = self.fan_out(lambda branch, service: (branch, call(service, 0, offset + limit)))
+        streams = [[(branch, item) for item in page["items"]] for branch, page in pages]
+        merged = (pair for rank in zip_longest(*streams) for pair in rank if pair is not None)
+        return {"total": sum(page["total"] for _, page in pages),
+                "items": [tagged(item, branch) for branch, item in islice(merged, offset, offset + limit)],
+                "facets": merge_counts(page["facets"] for _, page in pages)}
+
+    # --- Sách ---
+
+    def list_books(self, offset=0, limit=50, sort=None, reverse=False):
+        call = lambda service, offset, limit: service.list_books(offset, limit, sort, reverse)
+        if sort in BOOK_SORT_FIELDS:
+            return self.sorted_page(call, offset, limit, lambda book: str(book[sort]).casefold(), reverse)
+        return self.concat_page(call, offset, limit)
+
+    def get_book(self, book_id):
+        branch, service = self.owner("book", book_id)
+        return tagged(service.get_book(book_id), branch)
+
+    def search_books(self, term="", category=None, offset=0, limit=50):
+        return self.ranked_page(lambda service, offset, limit: service.search_books(term, category, offset, limit),
+                                offset, limit)
+
+    def categories(self):
+        return sorted(set().union(*self.fan_out(lambda branch, service: service.categories())))
+
+    def add_book(self, title, author, category, copies=1, branch=None):
+        branch, service = self.target(branch)
+        return tagged(service.add_book(title, author, category, copies), branch)
+
+    def add_copies(self, book_id, count=1):
+        return self.owner("book", book_id)[1].add_copies(book_id, count)
+
+    def merge_duplicate_titles(self):
+        # Chỉ gộp trong từng chi nhánh: cùng đầu sách ở hai chi nhánh là hai kho sách thật khác nhau
+        return sum(self.fan_out(lambda branch, service: service.merge_duplicate_titles()))
+
+    def import_books(self, books, branch=None):
+        return self.target(branch)[1].import_books(books)
+
+    def edit_book(self, book_id, title, author, category):
+        return self.owner("book", book_id)[1].edit_book(book_id, title, author, category)
+
+    def delete_book(self, book_id):
+        return self.owner("book", book_id)[1].delete_book(book_id)
+
+    def books_to_enrich(self, force=False):
+        return [book for books in self.fan_out(lambda branch, service: service.books_to_enrich(force))
+                for book in books]
+
+    def update_metadata(self, updates):
+        groups = {}
+        for item in updates:
+            try:
+                groups.setdefault(self.owner("book", item["id"]), []).append(item)
+            except ServiceError:
+                pass
+        return sum(self.fan_out(lambda branch, service, items: service.update_metadata(items),
+                                [(branch, service, items) for (branch, service), items in groups.items()]))
+
+    def thumbnail(self, key):
+        data = self.thumbnails.get(key)
+        if data is None:
+            raise ServiceError("Không tìm thấy ảnh bìa.", 404)
+        return data
+
+    # --- Mượn/trả ---
+
+    def list_borrows(self, offset=0, limit=50, username=None, sort=None, reverse=False):
+        call = lambda service, offset, limit: service.list_borrows(offset, limit, username, sort, reverse)
+        if username is None and sort in BORROW_SORT_FIELDS:
+            return self.sorted_page(call, offset, limit, lambda view: str(view[sort]).casefold(), reverse)
+        return self.concat_page(call, offset, limit)
+
+    def get_borrow(self, borrow_id):
+        branch, service = self.owner("borrow", borrow_id)
+        return tagged(service.get_borrow(borrow_id), branch)
+
+    def borrow_book(self, book_id, username, loan_days=None):
+        return self.owner("book", book_id)[1].borrow_book(book_id, username, loan_days)
+
+    def import_borrows(self, borrows):
+        # Mỗi lượt mượn vào kho của sách được mượn; sách không có ở kho nào thì bỏ qua như LibraryService
+        groups = {}
+        for borrow in borrows:
+            try:
+                groups.setdefault(self.owner("book", borrow["book_id"]), []).append(borrow)
+            except ServiceError:
+                pass
+        return sum(self.fan_out(lambda branch, service, items: service.import_borrows(items),
+                                [(branch, service, items) for (branch, service), items in groups.items()]))
+
+    def return_book(self, borrow_id):
+        return self.owner("borrow", borrow_id)[1].return_book(borrow_id)
+
+    # --- Đặt trước ---
+
+    def reserve_book(self, book_id, username):
+        return self.owner("book", book_id)[1].reserve_book(book_id, username)
+
+    def cancel_reservation(self, book_id, username):
+        return self.owner("book", book_id)[1].cancel_reservation(book_id, username)
+
+    # --- Quá hạn ---
+
+    def list_overdue(self, offset=0, limit=50, username=None):
+        return self.sorted_page(lambda service, offset, limit: service.list_overdue(offset, limit, username),
+                                offset, limit, lambda view: (view["due_date"], view["id"]))
+
+    def check_overdue(self, today=None):
+        today = today or date.today().isoformat()
+        views = [tagged(view, branch) for branch, part in
+                 self.fan_out(lambda branch, service: (branch, service.check_overdue(today))) for view in part]
+        with self.lock:
+            for view in views:
+                self.overdue_seq += 1
+                self.overdue_notices_log.append((self.overdue_seq, view))
+        return views
+
+    def overdue_notices(self, after=0):
+        with self.lock:
+            return {"seq": self.overdue_seq, "items": [view for seq, view in self.overdue_notices_log if seq > after]}
+
+    def reminders(self, within_days=REMINDER_DAYS, today=None):
+        # Độc giả mượn ở nhiều chi nhánh nhận một thư gộp
+        batches = {}
+        for branch, part in self.fan_out(lambda branch, service: (branch, service.reminders(within_days, today))):
+            for batch in part:
+                merged = batches.setdefault(batch["username"], {
+                    "username": batch["username"], "email": batch["email"], "overdue": [], "due_soon": []})
+                for group in ("overdue", "due_soon"):
+                    merged[group].extend(tagged(view, branch) for view in batch[group])
+        return list(batches.values())
+
+    # --- Người dùng ---
+
+    def has_users(self):
+        with self.lock:
+            return len(self.users) > 0
+
+    def login(self, username, password):
+        user = self.users.authenticate(username, password)
+        if user is None:
+            raise ServiceError("Tên đăng nhập hoặc mật khẩu không đúng.", 401)
+        return public_user(user)
+
+    def register(self, username, password, role, name, phone, email, address):
+        if not all([username, password, name, phone, email, address, role]):
+            raise ServiceError("Vui lòng điền đầy đủ tất cả các trường.")
+        user = self.users.register(username, password, role=role, name=name, phone=phone, email=email, address=address)
+        if user is None:
+            raise ServiceError("Tên đăng nhập đã tồn tại.", 409)
+        return public_user(user)
+
+    # --- Thống kê ---
+
+    def stats(self):
+        parts = self.fan_out(lambda branch, service: service.stats())
+        return {
+            "version": tuple(part["version"] for part in parts),
+            "categories": merge_counts(part["categories"] for part in parts),
+            "statuses": merge_counts(part["statuses"] for part in parts),
+        }
+
+    def stats_chart(self, width=600, height=300):
+        # StatsAggregator riêng chỉ để giữ bộ đệm ảnh theo nội dung của số liệu đã gộp; vẽ ngoài self.lock
+        # (cũng là khóa của UserDirectory) để đăng nhập không phải chờ matplotlib
+        return self.merged_stats.chart_png(self.stats(), (width, height))
+
+    def analytics(self, start=None, end=None, today=None):
+        def report(branch, service):
+            result = service.analytics(start, end, today)
+            with service.lock:
+                return result, service.borrow_analytics.reader_counts(service.catalog, result["start"], result["end"])
+
+        reports, readers = zip(*self.fan_out(report))
+        return merge_reports(reports, readers)
+
+    def analytics_chart(self, start=None, end=None, width=600, height=300):
+        report = self.analytics(start, end)
+        return self.merged_analytics.chart_png(report, (width, height))
+
+
+def split_catalog(source, branches, open_branch=open_branch_storage):
+    # Sách có trường "branch" khớp tên chi nhánh thì vào đó, còn lại chia theo branch_of(id);
+    # lượt mượn đi theo sách. Các kho chi nhánh phải còn trống và được ghi song song
+    books, borrows = source.load()
+    shards = {branch: ([], []) for branch in branches}
+    for book in books:
+        branch = book.get("branch")
+        shards[branch if branch in shards else branch_of(book["id"], branches)][0].append(book)
+    home = {book["id"]: branch for branch, (branch_books, _) in shards.items() for book in branch_books}
+    for borrow in borrows:
+        shards[home.get(borrow["book_id"]) or branch_of(borrow["book_id"], branches)][1].append(borrow)
+
+    def write(branch):
+        target = open_branch(branch)
+        try:
+            if any(target.load()):
+                raise ValueError(f"Kho chi nhánh {branch} đã có dữ liệu, không ghi đè.")
+            write_catalog(target, *shards[branch])
+        finally:
+            target.close()
+        return branch, len(shards[branch][0]), len(shards[branch][1])
+
+    with ThreadPoolExecutor(max_workers=len(branches), thread_name_prefix="shard-split") as pool:
+        return list(pool.map(write, branches))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chia kho chung trong data/ thành các kho chi nhánh")
+    parser.add_argument("action", choices=["split"])
+    parser.add_argument("--branches", default=",".join(BRANCHES), help="tên chi nhánh, cách nhau bởi dấu phẩy")
+    parser.add_argument("--backend", default=STORAGE_BACKEND, choices=["json", "journal", "sqlite"])
+    args = parser.parse_args()
+    branches = [name.strip() for name in args.branches.split(",") if name.strip()]
+    if not branches:
+        parser.error("cần danh sách chi nhánh (--branches hoặc LIBRARY_BRANCHES)")
+
+    source = open_storage(args.backend)
+    try:
+        start = time.perf_counter()
+        for branch, books, borrows in split_catalog(source, branches,
+                                                    lambda branch: open_branch_storage(branch, args.backend)):
+            print(f"{branch}: {books} sách, {borrows} lượt mượn -> {branch_directory(branch)}")
+        print(f"Xong trong {time.perf_counter() - start:.2f}s; đặt LIBRARY_BRANCHES={','.join(branches)} để dùng")
+    except ValueError as e:
+        print(f"Lỗi: {e}")
+    finally:
+        source.close()
+
+
+if __name__ == "__main__":
+    main()
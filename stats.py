@@ -0,0 +1,114 @@
+# Thống kê sách cập nhật tăng dần theo thay đổi của Catalog, biểu đồ vẽ vào bộ nhớ và lưu đệm theo nội dung
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from importlib.util import find_spec
+
+from metrics import timed
+
+# Chỉ kiểm tra đã cài chưa; matplotlib được nhập khi vẽ biểu đồ lần đầu (mất cả giây lúc khởi động)
+MATPLOTLIB_AVAILABLE = find_spec("matplotlib") is not None
+
+CHART_CACHE_SIZE = 8
+
+
+class StatsAggregator:
+    def __init__(self):
+        self.categories = {}
+        self.statuses = {"available": 0, "borrowed": 0}
+        self.book_state = {}
+        self.version = 0
+        # Biểu đồ được vẽ ngoài khóa của dịch vụ: bộ đệm ảnh có khóa nhỏ riêng
+        self.charts = OrderedDict()
+        self.charts_lock = threading.Lock()
+
+    def on_load(self, catalog):
+        self.categories = {}
+        self.statuses = {"available": 0, "borrowed": 0}
+        self.book_state = {}
+        for book in catalog.iter_books():
+            self.add(book)
+        self.version += 1
+
+    def on_change(self, kind, record_id, record):
+        if kind != "book":
+            return
+        state = self.book_state.get(record_id)
+        if record is not None and state == (record["category"], record["status"]):
+            return
+        self.remove(record_id)
+        if record is not None:
+            self.add(record)
+        self.version += 1
+
+    def add(self, book):
+        category, status = book["category"], book["status"]
+        self.book_state[book["id"]] = (category, status)
+        self.categories[category] = self.categories.get(category, 0) + 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def remove(self, book_id):
+        state = self.book_state.pop(book_id, None)
+        if state is None:
+            return
+        category, status = state
+        self.categories[category] -= 1
+        if not self.categories[category]:
+            del self.categories[category]
+        self.statuses[status] -= 1
+
+    def snapshot(self):
+        # Bản sao số liệu, lấy trong khóa của dịch vụ; vẽ biểu đồ từ bản sao này sau khi đã nhả khóa
+        return {"version": self.version, "categories": dict(self.categories), "statuses": dict(self.statuses)}
+
+    def content_hash(self, stats, size):
+        data = json.dumps([stats["categories"], stats["statuses"], size], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def chart_png(self, stats, size=(600, 300)):
+        # stats: snapshot(); trả về ảnh PNG đúng kích thước cần hiển thị, None nếu chưa cài matplotlib
+        if not MATPLOTLIB_AVAILABLE:
+            return None
+        key = self.content_hash(stats, size)
+        with self.charts_lock:
+            png = self.charts.get(key)
+            if png is not None:
+                self.charts.move_to_end(key)
+                return png
+        png = self.render_chart(stats, size)
+        with self.charts_lock:
+            self.charts[key] = png
+            if len(self.charts) > CHART_CACHE_SIZE:
+                self.charts.popitem(last=False)
+        return png
+
+    @timed("stats.render_chart")
+    def render_chart(self, stats, size, dpi=100):
+        categories, statuses = stats["categories"], stats["statuses"]
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+
+        ax = fig.add_subplot(1, 2, 1)
+        ax.bar(list(categories.keys()), list(categories.values()), color='skyblue')
+        ax.set_title("Sách Theo Thể Loại", fontsize=9)
+        ax.set_xlabel("Thể Loại", fontsize=8)
+        ax.set_ylabel("Số Lượng Sách", fontsize=8)
+        ax.tick_params(labelsize=7)
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_horizontalalignment("right")
+
+        ax = fig.add_subplot(1, 2, 2)
+        ax.bar(["Có Sẵn", "Đang Mượn"], [statuses.get("available", 0), statuses.get("borrowed", 0)], color='lightgreen')
+        ax.set_title("Sách Theo Trạng Thái", fontsize=9)
+        ax.set_xlabel("Trạng Thái", fontsize=8)
+        ax.set_ylabel("Số Lượng Sách", fontsize=8)
+        ax.tick_params(labelsize=7)
+
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi)
+        return buf.getvalue()
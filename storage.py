@@ -0,0 +1,393 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from config import BORROW_FILE, DATA_FILE, DB_FILE, JOURNAL_FILE, STORAGE_BACKEND, USER_FILE
+from metrics import instrumented
+from records import plain
+from serializers import read_snapshot, write_snapshot
+
+
+class ConflictError(Exception):
+    # Bản ghi đã bị tiến trình khác đổi sau khi ta đọc; updates là trạng thái mới nhất cần áp lại
+    def __init__(self, keys, updates=(), reload=None):
+        super().__init__(f"Xung đột khi ghi {len(keys)} bản ghi")
+        self.keys = keys
+        self.updates = list(updates)
+        self.reload = reload
+
+    def apply(self, catalog):
+        if self.reload is not None:
+            catalog.load(*self.reload)
+        for kind, record_id, record in self.updates:
+            catalog.replace(kind, record_id, record)
+
+
+def record_version(record):
+    return None if record is None else record.get("version", 0)
+
+
+def find_conflicts(changes, current):
+    # current(kind, id) -> bản ghi đang lưu; khác phiên bản gốc nghĩa là ai đó đã ghi chen vào
+    return [key for key, (_, base) in changes.items() if record_version(current(*key)) != record_version(base)]
+
+
+class FileLock:
+    # Khóa độc quyền giữa các tiến trình (flock/msvcrt), cho phép lồng nhau trong cùng tiến trình
+    def __init__(self, path):
+        self.path = path
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            self.file = open(self.path, "a+b")
+            if os.name == "nt":
+                import msvcrt
+                self.file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.01)
+            else:
+                import fcntl
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            if os.name == "nt":
+                import msvcrt
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+        self.thread_lock.release()
+
+
+@instrumented("storage.json", names=("load", "commit", "sync", "load_users", "save_user"))
+class JsonStorage:
+    # Mỗi lần commit ghi lại toàn bộ file sách/lượt mượn (bulk.py dựa vào đây để gom cả lần nhập thành một lần lưu)
+    rewrites_snapshot = True
+
+    def __init__(self, book_file=DATA_FILE, borrow_file=BORROW_FILE, user_file=USER_FILE):
+        self.book_file = book_file
+        self.borrow_file = borrow_file
+        self.user_file = user_file
+        self.lock = FileLock(os.path.join(os.path.dirname(book_file) or ".", "library.lock"))
+        # Dấu (inode, mtime, kích thước) của hai file lúc ta đọc/ghi lần cuối
+        self.stamps = None
+
+    def _stamps(self):
+        stamps = []
+        for path in (self.book_file, self.borrow_file):
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return stamps
+
+    def _read_tables(self):
+        return {"book": {b["id"]: b for b in read_snapshot(self.book_file, [])},
+                "borrow": {b["id"]: b for b in read_snapshot(self.borrow_file, [])}}
+
+    def load(self):
+        with self.lock:
+            self.stamps = self._stamps()
+            return read_snapshot(self.book_file, []), read_snapshot(self.borrow_file, [])
+
+    def commit(self, catalog, changes):
+        if not changes:
+            return
+        kinds = {kind for kind, _ in changes}
+        with self.lock:
+            if self._stamps() == self.stamps:
+                # Không ai ghi chen từ lần trước: catalog trong bộ nhớ là bản mới nhất
+                tables = {"book": catalog.books_by_id, "borrow": catalog.borrows_by_id}
+            else:
+                # Tiến trình khác đã ghi: đọc lại file, so phiên bản, ghép thay đổi của ta vào
+                tables = self._read_tables()
+                conflicts = find_conflicts(changes, lambda kind, record_id: tables[kind].get(record_id))
+                if conflicts:
+                    raise ConflictError(conflicts, [(kind, i, tables[kind].get(i)) for kind, i in conflicts])
+                for (kind, record_id), (record, _) in changes.items():
+                    if record is None:
+                        tables[kind].pop(record_id, None)
+                    else:
+                        tables[kind][record_id] = record
+            if "book" in kinds:
+                write_snapshot(self.book_file, list(tables["book"].values()))
+            if "borrow" in kinds:
+                write_snapshot(self.borrow_file, list(tables["borrow"].values()))
+            if tables["book"] is not catalog.books_by_id:
+                self._merge(catalog, tables)
+            self.stamps = self._stamps()
+
+    def sync(self, catalog):
+        with self.lock:
+            stamps = self._stamps()
+            if stamps != self.stamps:
+                self._merge(catalog, self._read_tables())
+                self.stamps = stamps
+
+    def _merge(self, catalog, tables):
+        # Nhận các thay đổi của tiến trình khác: chỉ áp bản ghi có phiên bản khác trong bộ nhớ
+        for kind, get, ids in (("book", catalog.get_book, catalog.book_ids),
+                               ("borrow", catalog.get_borrow, catalog.borrow_ids)):
+            table = tables[kind]
+            for record_id in [i for i in ids() if i not in table]:
+                catalog.replace(kind, record_id, None)
+            for record_id, record in table.items():
+                if record_version(get(record_id)) != record_version(record):
+                    catalog.replace(kind, record_id, record)
+
+    def load_users(self):
+        # Người dùng mới/cập nhật được nối vào file phụ; gộp vào users.json một lần khi khởi động
+        with self.lock:
+            users = {u["username"]: u for u in read_snapshot(self.user_file, [])}
+            log_file = self.user_file + ".log"
+            if os.path.exists(log_file):
+                with open(log_file, "rb") as f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        user = json.loads(line)
+                        users[user["username"]] = user
+                write_snapshot(self.user_file, list(users.values()))
+                os.remove(log_file)
+            return list(users.values())
+
+    def save_user(self, user):
+        with self.lock, open(self.user_file + ".log", "a", encoding="utf-8") as f:
+            f.write(json.dumps(user, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        pass
+
+
+@instrumented("storage.sqlite", names=("load", "commit", "sync", "load_users", "save_user"))
+class SqliteStorage:
+    rewrites_snapshot = False
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS books (
+            id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS borrows (
+            id TEXT PRIMARY KEY,
+            book_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            returned INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS borrows_username ON borrows (username);
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        for table in ("books", "borrows"):
+            # CSDL tạo trước khi có cột phiên bản
+            columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+            if "version" not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self.data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load(self):
+        books = [json.loads(row[0]) for row in self.conn.execute("SELECT data FROM books ORDER BY rowid")]
+        borrows = [json.loads(row[0]) for row in self.conn.execute("SELECT data FROM borrows ORDER BY rowid")]
+        return books, borrows
+
+    def commit(self, catalog, changes):
+        if not changes:
+            return
+        # BEGIN IMMEDIATE khóa ghi cả CSDL; mỗi câu lệnh chỉ ghi khi phiên bản còn như lúc đọc
+        conflicts = []
+        try:
+            with self.transaction() as cur:
+                for (kind, record_id), (record, base) in changes.items():
+                    if not self._compare_and_set(cur, kind, record_id, record, record_version(base)):
+                        conflicts.append((kind, record_id))
+                if conflicts:
+                    raise ConflictError(conflicts)
+        except ConflictError as e:
+            e.updates = [(kind, i, self.fetch(kind, i)) for kind, i in conflicts]
+            raise
+
+    def sync(self, catalog):
+        # data_version chỉ tăng khi kết nối khác ghi; khi đó so phiên bản từng dòng và áp phần khác biệt
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self.data_version:
+            return
+        self.data_version = data_version
+        for kind, table, get, ids in (("book", "books", catalog.get_book, catalog.book_ids),
+                                      ("borrow", "borrows", catalog.get_borrow, catalog.borrow_ids)):
+            versions = dict(self.conn.execute(f"SELECT id, version FROM {table}"))
+            for record_id in [i for i in ids() if i not in versions]:
+                catalog.replace(kind, record_id, None)
+            for record_id, version in versions.items():
+                if record_version(get(record_id)) != version:
+                    catalog.replace(kind, record_id, self.fetch(kind, record_id))
+
+    def fetch(self, kind, record_id):
+        table = "books" if kind == "book" else "borrows"
+        row = self.conn.execute(f"SELECT data FROM {table} WHERE id = ?", (record_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _compare_and_set(self, cur, kind, record_id, record, expected):
+        table = "books" if kind == "book" else "borrows"
+        if expected is None:
+            if record is None:
+                return cur.execute(f"SELECT 1 FROM {table} WHERE id = ?", (record_id,)).fetchone() is None
+            if kind == "book":
+                cur.execute("INSERT OR IGNORE INTO books (id, version, data) VALUES (?, ?, ?)",
+                            (record_id, record["version"], json.dumps(record, default=plain)))
+            else:
+                cur.execute(
+                    "INSERT OR IGNORE INTO borrows (id, book_id, username, returned, version, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (record_id, record["book_id"], record["username"], int(record["returned"]),
+                     record["version"], json.dumps(record, default=plain)),
+                )
+        elif record is None:
+            cur.execute(f"DELETE FROM {table} WHERE id = ? AND version = ?", (record_id, expected))
+        elif kind == "book":
+            cur.execute("UPDATE books SET version = ?, data = ? WHERE id = ? AND version = ?",
+                        (record["version"], json.dumps(record, default=plain), record_id, expected))
+        else:
+            cur.execute(
+                "UPDATE borrows SET book_id = ?, returned = ?, version = ?, data = ? WHERE id = ? AND version = ?",
+                (record["book_id"], int(record["returned"]), record["version"], json.dumps(record, default=plain),
+                 record_id, expected),
+            )
+        return cur.rowcount == 1
+
+    @contextmanager
+    def transaction(self):
+        cur = self.conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            yield cur
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+        else:
+            cur.execute("COMMIT")
+        finally:
+            cur.close()
+
+    def _write_book(self, cur, book_id, book):
+        if book is None:
+            cur.execute("DELETE FROM books WHERE id = ?", (book_id,))
+        else:
+            cur.execute(
+                "INSERT INTO books (id, version, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET version = excluded.version, data = excluded.data",
+                (book_id, record_version(book), json.dumps(book, default=plain)),
+            )
+
+    def _write_borrow(self, cur, borrow_id, borrow):
+        if borrow is None:
+            cur.execute("DELETE FROM borrows WHERE id = ?", (borrow_id,))
+        else:
+            cur.execute(
+                "INSERT INTO borrows (id, book_id, username, returned, version, data) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET book_id = excluded.book_id, returned = excluded.returned, "
+                "version = excluded.version, data = excluded.data",
+                (borrow_id, borrow["book_id"], borrow["username"], int(borrow["returned"]),
+                 record_version(borrow), json.dumps(borrow, default=plain)),
+            )
+
+    def load_users(self):
+        return [json.loads(row[0]) for row in self.conn.execute("SELECT data FROM users ORDER BY rowid")]
+
+    def save_user(self, user):
+        with self.transaction() as cur:
+            self._write_user(cur, user)
+
+    def _write_user(self, cur, user):
+        cur.execute(
+            "INSERT INTO users (username, data) VALUES (?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET data = excluded.data",
+            (user["username"], json.dumps(user)),
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+def open_storage(backend=STORAGE_BACKEND, directory=None):
+    # directory: kho riêng của một chi nhánh (shards.py), cùng tên file như trong data/
+    def path(default):
+        return default if directory is None else os.path.join(directory, os.path.basename(default))
+
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    if backend == "sqlite":
+        return SqliteStorage(path(DB_FILE))
+    if backend == "journal":
+        from journal import JournalStorage
+        return JournalStorage(path(DATA_FILE), path(BORROW_FILE), path(USER_FILE), path(JOURNAL_FILE))
+    if backend == "json":
+        return JsonStorage(path(DATA_FILE), path(BORROW_FILE), path(USER_FILE))
+    raise ValueError(f"Không hỗ trợ kiểu lưu trữ: {backend}")
+
+
+def write_catalog(target, books, borrows):
+    # Ghi thẳng toàn bộ sách/lượt mượn vào một kho còn trống, không qua Catalog (tách kho chi nhánh)
+    if isinstance(target, SqliteStorage):
+        with target.transaction() as cur:
+            for book in books:
+                target._write_book(cur, book["id"], book)
+            for borrow in borrows:
+                target._write_borrow(cur, borrow["id"], borrow)
+    else:
+        with target.lock:
+            write_snapshot(target.book_file, books)
+            write_snapshot(target.borrow_file, borrows)
+
+
+def migrate_json_to_sqlite(source, target):
+    books, borrows = source.load()
+    users = source.load_users()
+    with target.transaction() as cur:
+        for book in books:
+            target._write_book(cur, book["id"], book)
+        for borrow in borrows:
+            target._write_borrow(cur, borrow["id"], borrow)
+        for user in users:
+            target._write_user(cur, user)
+    return len(books), len(borrows), len(users)
+
+
+if __name__ == "__main__":
+    # Chuyển dữ liệu một lần: python storage.py
+    os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+    target = SqliteStorage()
+    counts = migrate_json_to_sqlite(JsonStorage(), target)
+    target.close()
+    print("Đã chuyển %d sách, %d lượt mượn, %d người dùng sang %s" % (counts + (DB_FILE,)))
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Các module nằm ở gốc repo, không đóng gói: cho pytest nhập được khi chạy từ bất kỳ đâu;
+# benchmarks/ để dùng lại máy chủ giả lập Google Books (fixture_server.py)
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, "benchmarks"))
@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from analytics import BorrowAnalytics
+from catalog import Catalog
+
+TODAY = "2024-01-20"
+BOOKS = [
+    {"id": "b1", "title": "Dế Mèn", "author": "Tô Hoài", "category": "Văn học", "status": "available",
+     "copies": ["b1", "b1-2", "b1-3"], "available": 3},
+    {"id": "b2", "title": "Truyện Kiều", "author": "Nguyễn Du", "category": "Văn học", "status": "available",
+     "copies": ["b2", "b2-2"], "available": 2},
+]
+
+
+def loan(borrow_id, book_id, username, borrowed, due, returned_on=None, returned=None, copy_id=None):
+    return {"id": borrow_id, "book_id": book_id, "copy_id": copy_id or book_id, "username": username,
+            "borrow_date": borrowed, "due_date": due, "returned": bool(returned_on) if returned is None else returned,
+            "return_date": returned_on}
+
+
+BORROWS = [
+    loan("m1", "b1", "an", "2024-01-01", "2024-01-08", "2024-01-05"),      # trả đúng hạn sau 4 ngày
+    loan("m2", "b1", "binh", "2024-01-01", "2024-01-08", "2024-01-10"),    # trả trễ, 9 ngày
+    loan("m3", "b2", "an", "2024-01-03", "2024-01-10"),                    # chưa trả, đã quá hạn
+    loan("m4", "b1", "chi", "2024-01-09", "2024-01-25", copy_id="b1-3"),   # chưa trả, còn hạn
+    loan("m5", "b2", "an", "2024-01-09", "2024-01-16", returned=True, copy_id="b2-2"),  # dữ liệu cũ: không có ngày trả
+]
+
+
+def analytics_of(borrows):
+    catalog = Catalog(BOOKS, borrows)
+    analytics = BorrowAnalytics()
+    catalog.subscribe(analytics)
+    return catalog, analytics
+
+
+def test_report_numbers():
+    catalog, analytics = analytics_of(BORROWS)
+    report = analytics.report(catalog, today=TODAY)
+    assert report["total"] == 5
+    assert report["per_day"] == [("2024-01-01", 2), ("2024-01-03", 1), ("2024-01-09", 2)]
+    # Tuần bắt đầu từ thứ Hai (2024-01-01 là thứ Hai)
+    assert report["per_week"] == [("2024-01-01", 3), ("2024-01-08", 2)]
+    assert report["avg_loan_days"] == 6.5
+    # Trễ: m2 (trả sau hạn), m3 (quá hạn chưa trả); m5 không rõ ngày trả nên không xét
+    assert (report["late_loans"], report["judged_loans"], report["overdue_rate"]) == (2, 4, 0.5)
+    assert [(t["title"], t["count"]) for t in report["top_titles"]] == [("Dế Mèn", 3), ("Truyện Kiều", 2)]
+    assert [(r["username"], r["count"]) for r in report["top_readers"]] == [("an", 3), ("binh", 1), ("chi", 1)]
+
+
+def test_report_filters_by_borrow_date():
+    catalog, analytics = analytics_of(BORROWS)
+    report = analytics.report(catalog, "2024-01-02", "2024-01-09", TODAY)
+    assert report["total"] == 3 and report["per_week"] == [("2024-01-01", 1), ("2024-01-08", 2)]
+    assert report["avg_loan_days"] is None and report["overdue_rate"] == 0.5
+    assert analytics.report(catalog, "2025-01-01", None, TODAY)["top_titles"] == []
+
+
+def test_incremental_updates_match_a_fresh_build():
+    catalog, analytics = analytics_of(BORROWS[:2])
+    analytics.report(catalog, today=TODAY)
+    for borrow in BORROWS[2:]:
+        catalog.add_borrow(dict(borrow))
+        analytics.report(catalog, today=TODAY)
+    catalog.return_borrow("m3", "2024-01-12")
+    catalog.update_book("b2", title="Kim Vân Kiều")
+    catalog.drain_changes()
+    updated = analytics.report(catalog, today=TODAY)
+
+    fresh_catalog, fresh = analytics_of(list(catalog.iter_borrows()))
+    fresh_catalog.update_book("b2", title="Kim Vân Kiều")
+    expected = fresh.report(fresh_catalog, today=TODAY)
+    assert {k: v for k, v in updated.items() if k != "version"} == {k: v for k, v in expected.items() if k != "version"}
+    assert updated["top_titles"][1]["title"] == "Kim Vân Kiều"
+    assert updated["late_loans"] == 2 and updated["timed_loans"] == 3
+
+
+def test_columns_grow_geometrically():
+    catalog, analytics = analytics_of([])
+    analytics.report(catalog, today=TODAY)
+    columns = analytics.columns
+    capacities = set()
+    for i in range(200):
+        catalog.add_borrow(loan(f"n{i}", "b1", f"u{i % 7}", "2024-01-01", "2024-01-08", "2024-01-02"))
+        analytics.ensure(catalog)
+        capacities.add(len(columns.buffers["live"]))
+    assert len(columns) == 200 and len(capacities) <= 9
+    assert columns.live.all() and (columns.book == columns.book_codes["b1"]).all()
+    assert analytics.report(catalog, today=TODAY)["per_day"] == [("2024-01-01", 200)]
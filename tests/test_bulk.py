@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from bulk import import_rows
+from service import LibraryService
+from storage import open_storage
+
+
+def write_books(path, count, duplicate_every=0):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            title = "Trùng" if duplicate_every and i % duplicate_every == 0 else f"Sách {i}"
+            f.write(json.dumps({"title": title, "author": f"Tác giả {i}", "copies": 2}, ensure_ascii=False) + "\n")
+        f.write("dòng hỏng\n")
+
+
+@pytest.mark.parametrize("backend, commits", [("json", 1), ("journal", 5), ("sqlite", 5)])
+def test_import_batches_by_backend(tmp_path, backend, commits):
+    path = tmp_path / "books.jsonl"
+    write_books(path, 50, duplicate_every=10)
+    service = LibraryService(open_storage(backend, str(tmp_path / "data")))
+    calls, batches = [], []
+    commit = service.storage.commit
+    service.storage.commit = lambda catalog, changes: calls.append(len(changes)) or commit(catalog, changes)
+    import_books = service.import_books
+    service.import_books = lambda books: batches.append(len(books)) or import_books(books)
+    try:
+        counts = import_rows(service, "books", str(path), batch_size=10, report=lambda message: None)
+        assert counts == dict(counts, rows=51, added=46, skipped=4, invalid=1)
+        assert len(calls) == commits
+        # Kể cả khi chỉ lưu một lần, các dòng vẫn được áp theo lô chứ không giữ cả file trong bộ nhớ
+        assert max(batches) == 10
+    finally:
+        service.close()
+
+    reopened = LibraryService(open_storage(backend, str(tmp_path / "data")))
+    try:
+        assert reopened.list_books(0, 1)["total"] == 46
+    finally:
+        reopened.close()
+
+
+def test_deferred_import_failure_saves_nothing(tmp_path):
+    path = tmp_path / "books.jsonl"
+    write_books(path, 30)
+    service = LibraryService(open_storage("json", str(tmp_path / "data")))
+    import_books = service.import_books
+    calls = []
+
+    def failing(books):
+        calls.append(len(books))
+        if len(calls) == 2:
+            raise OSError("hết bộ nhớ")
+        return import_books(books)
+
+    service.import_books = failing
+    try:
+        with pytest.raises(OSError):
+            import_rows(service, "books", str(path), batch_size=10, report=lambda message: None)
+        assert service.list_books(0, 1)["total"] == 0
+    finally:
+        service.close()
+    reopened = LibraryService(open_storage("json", str(tmp_path / "data")))
+    try:
+        assert reopened.list_books(0, 1)["total"] == 0
+    finally:
+        reopened.close()
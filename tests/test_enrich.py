@@ -0,0 +1,42 @@
+import fixture_server
+from enrich import BookEnricher, enrich_catalog
+from service import LibraryService
+from storage import open_storage
+from thumbnails import ThumbnailCache
+
+TITLES = [("Dế Mèn", "Tô Hoài"), ("Số Đỏ", "Vũ Trọng Phụng"), ("Tắt Đèn", "Ngô Tất Tố"), ("Chí Phèo", "Nam Cao")]
+
+
+def test_enrich_fills_metadata_and_thumbnails(tmp_path):
+    server, api_url = fixture_server.start(covers=2)
+    thumbnails = ThumbnailCache(str(tmp_path / "thumbnails"))
+    service = LibraryService(open_storage("json", str(tmp_path / "data")))
+    service.thumbnails = thumbnails
+    try:
+        ids = [service.add_book(title, author, "Văn học")["id"] for title, author in TITLES]
+
+        def run():
+            enricher = BookEnricher(api_url, max_workers=2, processes=1, thumbnails=thumbnails, backoff=0.001)
+            try:
+                return enrich_catalog(service, enricher, report=lambda message: None)
+            finally:
+                enricher.session.close()
+
+        counts = run()
+        assert counts == dict(counts, books=4, updated=4, errors=0)
+        assert service.books_to_enrich() == []
+        books = [service.get_book(book_id) for book_id in ids]
+        assert all(book["isbn"] and book["description"] for book in books)
+        # Chỉ có 2 ảnh bìa khác nhau trên máy chủ: kho ảnh theo mã băm nội dung lưu đúng 2 file
+        keys = {book["thumbnail"] for book in books}
+        assert len(keys) <= 2 and all(service.thumbnail(key)[:2] == b"\xff\xd8" for key in keys)
+
+        # Lần sau không còn sách thiếu thông tin: không gửi yêu cầu nào
+        requests = server.requests
+        again = run()
+        assert again["books"] == 0 and again["updated"] == 0
+        assert server.requests == requests
+    finally:
+        service.close()
+        server.shutdown()
+        server.server_close()
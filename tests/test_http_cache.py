@@ -0,0 +1,93 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import http_cache
+from http_cache import HttpCache
+
+URL = "https://example.org/books"
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", etag=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {"ETag": etag} if etag else {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeSession:
+    # Máy chủ giả: trả 304 khi ETag khớp, ghi lại header của từng yêu cầu
+    def __init__(self, etag='"v1"'):
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        if self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            return FakeResponse(304)
+        return FakeResponse(200, json.dumps({"url": url, "n": len(self.requests)}), self.etag)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_fresh_entry_is_served_without_request(tmp_path, clock):
+    cache, session = HttpCache(str(tmp_path), ttl=60), FakeSession()
+    first = cache.get(session, URL, {"q": "python"})
+    assert first.status_code == 200
+    again = cache.get(session, URL, {"q": "python"})
+    assert again.json() == first.json() and len(session.requests) == 1
+    cache.get(session, URL, {"q": "java"})
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_expired_entry_is_revalidated_with_etag(tmp_path, clock):
+    cache, session = HttpCache(str(tmp_path), ttl=60), FakeSession()
+    body = cache.get(session, URL).json()
+    clock[0] += 61
+    assert cache.get(session, URL).json() == body
+    assert session.requests[-1][1] == {"If-None-Match": '"v1"'}
+    # 304 làm mới thời điểm lưu: trong TTL tiếp theo không hỏi lại máy chủ
+    clock[0] += 30
+    cache.get(session, URL)
+    assert len(session.requests) == 2
+    assert cache.stats() == dict(cache.stats(), hits=1, misses=1, revalidated=1)
+
+
+def test_expired_entry_without_etag_is_fetched_again(tmp_path, clock):
+    cache, session = HttpCache(str(tmp_path), ttl=60), FakeSession(etag=None)
+    cache.get(session, URL)
+    clock[0] += 61
+    assert cache.get(session, URL).json()["n"] == 2
+    assert session.requests[-1][1] == {}
+    assert cache.stats()["misses"] == 2 and cache.stats()["revalidated"] == 0
+
+
+def test_lru_eviction_keeps_recently_used_entries(tmp_path, clock):
+    session = FakeSession()
+    probe = HttpCache(str(tmp_path / "do"), ttl=60)
+    probe.get(session, URL, {"q": "a"})
+    size = probe.stats()["bytes"]
+
+    cache = HttpCache(str(tmp_path / "lru"), ttl=60, max_bytes=2 * size + size // 2)
+    for q in ("a", "b"):
+        cache.get(session, URL, {"q": q})
+    cache.get(session, URL, {"q": "a"})  # "b" thành cũ nhất
+    cache.get(session, URL, {"q": "c"})
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 2 and stats["bytes"] <= cache.max_bytes
+    requests_before = len(session.requests)
+    cache.get(session, URL, {"q": "a"})
+    assert len(session.requests) == requests_before
+    cache.get(session, URL, {"q": "b"})
+    assert len(session.requests) == requests_before + 1
+    assert len([name for name in os.listdir(tmp_path / "lru") if name.endswith(".json")]) == 2
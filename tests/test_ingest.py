@@ -0,0 +1,65 @@
+import pytest
+
+import fixture_server
+from ingest import BookIngestor
+from service import LibraryService
+from storage import open_storage
+
+QUERIES = ["intitle:Dế Mèn inauthor:Tô Hoài", "intitle:Số Đỏ inauthor:Vũ Trọng Phụng",
+           "intitle:Dế Mèn inauthor:Tô Hoài", "intitle:Tắt Đèn inauthor:Ngô Tất Tố"]
+
+
+@pytest.fixture
+def api(request):
+    options = getattr(request, "param", {})
+    server, api_url = fixture_server.start(**options)
+    yield server, api_url
+    server.shutdown()
+    server.server_close()
+
+
+def crawl(api_url, queries=QUERIES, **options):
+    ingestor = BookIngestor(api_url, backoff=0.001, **options)
+    events = []
+    try:
+        ingestor.run(queries, lambda kind, payload: events.append((kind, payload)))
+    finally:
+        ingestor.session.close()
+    books = [book for kind, payload in events if kind == "books" for book in payload]
+    errors = [payload for kind, payload in events if kind == "error"]
+    return books, errors, events
+
+
+def test_crawl_dedups_and_imports(api, tmp_path):
+    server, api_url = api
+    books, errors, events = crawl(api_url)
+    assert errors == []
+    assert sorted(book["title"] for book in books) == ["Dế Mèn", "Số Đỏ", "Tắt Đèn"]
+    assert all(book["isbn"].startswith("978") and book["cover_url"].startswith(server.base_url) for book in books)
+    assert events[-1] == ("done", None)
+    assert ("progress", (4, 4)) in events
+
+    service = LibraryService(open_storage("json", str(tmp_path)))
+    try:
+        assert service.import_books(books) == 3
+        assert service.import_books(crawl(api_url)[0]) == 0
+        assert [b["title"] for b in service.search_books("de men")["items"]] == ["Dế Mèn"]
+    finally:
+        service.close()
+
+
+@pytest.mark.parametrize("api", [{"error_rate": 0.5, "seed": 7}], indirect=True)
+def test_crawl_retries_transient_errors(api):
+    server, api_url = api
+    books, errors, _ = crawl(api_url, retries=12)
+    assert errors == [] and len(books) == 3
+    assert server.requests > len(QUERIES)
+
+
+@pytest.mark.parametrize("api", [{"error_rate": 1.0}], indirect=True)
+def test_crawl_reports_exhausted_retries(api):
+    _, api_url = api
+    books, errors, events = crawl(api_url, retries=1)
+    assert books == [] and len(errors) == len(QUERIES)
+    assert all("503" in error for error in errors)
+    assert events[-1] == ("done", None)
@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import wait
+
+from live_query import LiveQuery
+
+
+class FakeRoot:
+    # Thay cho Tk: after() chỉ ghi lại lần hẹn, test tự gọi fire() để "trôi" thời gian
+    def __init__(self):
+        self.timers = {}
+        self.next_id = 0
+
+    def after(self, ms, func, *args):
+        self.next_id += 1
+        self.timers[self.next_id] = (func, args)
+        return self.next_id
+
+    def after_cancel(self, timer):
+        self.timers.pop(timer, None)
+
+    def fire(self):
+        timers, self.timers = self.timers, {}
+        for func, args in timers.values():
+            func(*args)
+
+    def drain(self, query, limit=500):
+        for _ in range(limit):
+            if not self.timers:
+                return
+            if query.future is not None:
+                wait([query.future], timeout=5)
+            self.fire()
+        raise AssertionError("truy vấn không kết thúc")
+
+
+def test_keystrokes_within_delay_run_only_last_query():
+    root, calls, results = FakeRoot(), [], []
+    query = LiveQuery(root, lambda term: calls.append(term) or term.upper(), results.append)
+    try:
+        for term in ("d", "de", "de m", "de men"):
+            query.schedule(term)
+        assert len(root.timers) == 1
+        root.drain(query)
+    finally:
+        query.close()
+    assert calls == ["de men"] and results == ["DE MEN"]
+
+
+def test_result_of_superseded_query_is_dropped():
+    root, results = FakeRoot(), []
+    started, release = threading.Event(), threading.Event()
+
+    def run(term):
+        if term == "cu":
+            started.set()
+            release.wait(5)
+        return term
+
+    query = LiveQuery(root, run, results.append)
+    try:
+        query.now("cu")
+        assert started.wait(5)
+        # Truy vấn cũ đang chạy dở khi người dùng gõ tiếp: kết quả cũ không được hiện
+        query.now("moi")
+        release.set()
+        root.drain(query)
+    finally:
+        query.close()
+    assert results == ["moi"]
+
+
+def test_errors_go_to_on_error_and_cancel_stops_pending_query():
+    root, errors, results = FakeRoot(), [], []
+
+    def run(term):
+        raise ValueError(term)
+
+    query = LiveQuery(root, run, results.append, on_error=errors.append)
+    try:
+        query.now("hong")
+        root.drain(query)
+        query.schedule("bo")
+        query.cancel()
+        root.drain(query)
+    finally:
+        query.close()
+    assert [str(e) for e in errors] == ["hong"] and results == []
@@ -0,0 +1,25 @@
+from metrics import REGISTRY, instrumented, timed
+from service import OPERATIONS, LibraryService
+from shards import ShardedService
+
+
+def test_instrumented_wraps_only_named_methods():
+    @instrumented("thu", names=("run",))
+    class Job:
+        def run(self):
+            return self.step() + 1
+
+        def step(self):
+            return 1
+
+    before = REGISTRY.histogram("thu.run").summary()["count"]
+    assert Job().run() == 2
+    assert REGISTRY.histogram("thu.run").summary()["count"] == before + 1
+    assert "thu.step" not in REGISTRY.snapshot()
+
+
+def test_services_time_operations_not_helpers():
+    wrapper_code = timed("thu.mau")(lambda: None).__code__
+    for cls in (LibraryService, ShardedService):
+        wrapped = {name for name, value in vars(cls).items() if getattr(value, "__code__", None) is wrapper_code}
+        assert wrapped == set(OPERATIONS)
@@ -0,0 +1,60 @@
+from overdue import OverdueIndex
+
+
+def borrow(borrow_id, due, returned=False):
+    return {"id": borrow_id, "due_date": due, "returned": returned}
+
+
+def index_of(*borrows):
+    index = OverdueIndex()
+    for item in borrows:
+        index.on_change("borrow", item["id"], item)
+    return index
+
+
+def test_advance_reports_each_loan_once_in_due_order():
+    index = index_of(borrow("c", "2024-01-03"), borrow("a", "2024-01-01"), borrow("b", "2024-01-01"),
+                     borrow("d", "2024-01-10"))
+    assert index.advance("2024-01-01") == []
+    assert index.advance("2024-01-02") == ["a", "b"]
+    assert index.advance("2024-01-02") == []
+    assert index.advance("2024-01-05") == ["c"]
+    assert index.overdue_ids() == ["a", "b", "c"]
+    assert index.due_before("2024-01-11") == ["d"]
+
+
+def test_due_before_skips_overdue_returned_and_later_loans():
+    index = index_of(*(borrow(f"m{i:02d}", f"2024-02-{i:02d}") for i in range(1, 21)))
+    index.advance("2024-02-03")
+    index.on_change("borrow", "m05", borrow("m05", "2024-02-05", returned=True))
+    assert index.due_before("2024-02-08") == ["m03", "m04", "m06", "m07"]
+
+
+def test_return_and_borrow_update_overdue_order():
+    index = index_of(borrow("a", "2024-01-01"), borrow("b", "2024-01-02"))
+    index.advance("2024-01-05")
+    assert index.overdue_ids() == ["a", "b"]
+
+    # Trả sách: bỏ khỏi danh sách quá hạn và không báo lại
+    index.on_change("borrow", "a", borrow("a", "2024-01-01", returned=True))
+    assert index.overdue_ids() == ["b"]
+    # Mượn mới đã quá hạn sẵn (hạn cũ hơn) phải chen đúng chỗ, không chỉ nối vào cuối
+    index.on_change("borrow", "c", borrow("c", "2023-12-30"))
+    index.on_change("borrow", "d", borrow("d", "2024-01-04"))
+    assert index.advance("2024-01-05") == ["c", "d"]
+    assert index.overdue_ids() == ["c", "b", "d"]
+    # Gia hạn: lượt quá hạn trở lại heap với hạn mới
+    index.on_change("borrow", "b", borrow("b", "2024-01-20"))
+    assert index.overdue_ids() == ["c", "d"]
+    assert index.due_before("2024-01-21") == ["b"]
+    assert index.advance("2024-01-21") == ["b"]
+    assert index.overdue_ids() == ["c", "d", "b"]
+
+
+def test_overdue_ids_is_cached_until_order_changes():
+    index = index_of(borrow("a", "2024-01-01"), borrow("b", "2024-01-03"))
+    index.advance("2024-01-02")
+    first = index.overdue_ids()
+    assert index.overdue_ids() is first
+    index.advance("2024-01-04")
+    assert index.overdue_ids() is first and first == ["a", "b"]
@@ -0,0 +1,71 @@
+from search import SearchIndex, fold, tokenize
+
+
+def book(book_id, title, author="Tác Giả", category="Chung"):
+    return {"id": book_id, "title": title, "author": author, "category": category}
+
+
+def index_of(*books):
+    index = SearchIndex()
+    for item in books:
+        index.add(item)
+    return index
+
+
+def test_fold_removes_vietnamese_diacritics():
+    assert fold("Lập Trình Đồ Họa") == "lap trinh do hoa"
+    assert tokenize("Khoa-học Máy tính!") == ["khoa", "hoc", "may", "tinh"]
+
+
+def test_query_without_diacritics_matches():
+    index = index_of(book("1", "Lập Trình Python"), book("2", "Nấu Ăn"))
+    assert index.search("lap trinh") == ["1"]
+    assert index.search("LẬP") == ["1"]
+
+
+def test_prefix_matching_more_terms_than_old_cap_returns_every_book():
+    index = index_of(*(book(str(i), f"sach{i:03d}") for i in range(200)))
+    assert sorted(index.search("sach"), key=int) == [str(i) for i in range(200)]
+    assert len(index.search("s")) == 200
+
+
+def test_every_token_must_match():
+    index = index_of(book("1", "Lập Trình Python"), book("2", "Lập Trình Java"))
+    assert index.search("lap java") == ["2"]
+    assert index.search("lap ruby") == []
+
+
+def test_bm25_ranks_rarer_and_denser_matches_first():
+    index = index_of(book("short", "Python"), book("long", "Python cho người mới bắt đầu học lập trình"),
+                     book("other", "Toán"))
+    assert index.search("python") == ["short", "long"]
+    assert index.search("python", limit=1) == ["short"]
+
+
+def test_category_filter_and_incremental_updates():
+    index = index_of(book("1", "Lập Trình", category="Tin Học"), book("2", "Lập Trình Web", category="Web"))
+    assert index.search("lap", category="Web") == ["2"]
+    index.update(book("2", "Thiết Kế", category="Web"))
+    assert index.search("lap") == ["1"]
+    index.remove("1")
+    assert index.search("lap") == []
+    assert index.category_names() == ["Web"]
+
+
+def test_bulk_load_matches_incremental_adds():
+    class FakeCatalog:
+        def __init__(self, books):
+            self.books = books
+
+        def iter_books(self):
+            return iter(self.books)
+
+    books = [book(str(i), f"Sách {i % 37} tập {i}", f"Tác giả {i % 11}") for i in range(300)]
+    loaded = SearchIndex()
+    loaded.on_load(FakeCatalog(books))
+    incremental = index_of(*books)
+    assert loaded.vocab == incremental.vocab == sorted(incremental.postings)
+    assert loaded.search("sach 1") == incremental.search("sach 1")
+    loaded.add(book("new", "Zebra"))
+    loaded.remove("0")
+    assert loaded.vocab == sorted(loaded.postings)
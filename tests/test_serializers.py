@@ -0,0 +1,51 @@
+import pytest
+
+import serializers
+from records import Book, Borrow
+from serializers import detect, get_serializer, read_snapshot, write_snapshot
+
+ROWS = [
+    {"id": "b1", "title": "Truyện Kiều", "author": "Nguyễn Du", "category": "Văn học", "status": "available",
+     "copies": ["b1", "b1-2"], "available": 2, "reservations": {"an": "2024-01-01"}, "holds": {}},
+    {"id": "m1", "book_id": "b1", "copy_id": "b1", "username": "an", "borrow_date": "2024-01-01",
+     "due_date": "2024-01-15", "returned": False, "return_date": None},
+]
+
+
+def serializer_for(fmt):
+    # Định dạng cần thư viện tùy chọn thì bỏ qua khi chưa cài
+    if fmt == "json-std":
+        return serializers.JsonSerializer(fast=False)
+    if fmt == "json" and serializers.orjson is None:
+        pytest.skip("chưa cài orjson")
+    if fmt == "msgpack":
+        pytest.importorskip("msgpack")
+    return get_serializer(fmt)
+
+
+@pytest.mark.parametrize("fmt", ["json", "json-std", "json-indent", "msgpack", "pickle"])
+def test_round_trip_keeps_records_and_unicode(tmp_path, fmt):
+    path = str(tmp_path / "data.bin")
+    data = [Book(ROWS[0]), Borrow(ROWS[1])]
+    write_snapshot(path, data, serializer_for(fmt))
+    assert read_snapshot(path, None) == ROWS
+    assert not (tmp_path / "data.bin.tmp").exists()
+
+
+@pytest.mark.parametrize("fmt, name", [("json", "json"), ("json-indent", "json"), ("msgpack", "msgpack"),
+                                       ("pickle", "pickle")])
+def test_format_is_detected_from_content(fmt, name):
+    raw = serializer_for(fmt).dumps(ROWS)
+    assert detect(raw).name == name
+    assert detect(raw).loads(raw) == ROWS
+
+
+def test_missing_or_empty_file_returns_default(tmp_path):
+    assert read_snapshot(str(tmp_path / "khong-co.json"), []) == []
+    (tmp_path / "rong.json").write_bytes(b"  \n")
+    assert read_snapshot(str(tmp_path / "rong.json"), {}) == {}
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        get_serializer("yaml")
@@ -0,0 +1,132 @@
+import asyncio
+import gc
+import socket
+import threading
+
+import pytest
+
+from client import RemoteService
+from server import LibraryServer
+from service import LibraryService, ServiceError
+from storage import open_storage
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def connect(tmp_path):
+    # Máy chủ thật trên luồng nền, dữ liệu JSON trong thư mục tạm
+    service = LibraryService(open_storage("json", str(tmp_path)))
+    server = LibraryServer(service, workers=4)
+    port = free_port()
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    async def serve():
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", port)
+        started.set()
+        async with listener:
+            await listener.serve_forever()
+
+    async def stop():
+        # Máy khách đã đóng kết nối: chờ các coroutine handle tự kết thúc trước khi dừng vòng lặp
+        serving.cancel()
+        await asyncio.wait(asyncio.all_tasks() - {asyncio.current_task()}, timeout=5)
+
+    serving = loop.create_task(serve())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    assert started.wait(5)
+    remotes = []
+
+    def connect(username=None, password="mat-khau"):
+        remote = RemoteService(f"http://127.0.0.1:{port}")
+        remotes.append(remote)
+        if username:
+            remote.login(username, password)
+        return remote
+
+    yield connect
+    # Traceback của ServiceError trong pytest.raises giữ tham chiếu vòng tới socket: dọn trước khi đóng kết nối
+    gc.collect()
+    for remote in remotes:
+        remote.close()
+    asyncio.run_coroutine_threadsafe(stop(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+    server.pool.shutdown()
+    service.close()
+
+
+def register(remote, username, role):
+    remote.register(username, "mat-khau", role, username, "0900", f"{username}@x.vn", "HN")
+
+
+@pytest.fixture
+def accounts(connect):
+    register(connect(), "quantri", "admin")
+    register(connect("quantri"), "thuthu", "thuthu")
+    register(connect(), "an", "docgia")
+    register(connect(), "binh", "docgia")
+    return {name: connect(name) for name in ("quantri", "thuthu", "an", "binh")}
+
+
+def status_of(call, *args):
+    with pytest.raises(ServiceError) as error:
+        call(*args)
+    return error.value.status
+
+
+def test_login_issues_token(connect, accounts):
+    remote = connect()
+    user = remote.login("an", "mat-khau")
+    assert user["username"] == "an" and "token" not in user
+    assert remote.token
+    assert status_of(connect().login, "an", "sai") == 401
+
+
+def test_requests_without_session_are_rejected(connect, accounts):
+    anonymous = connect()
+    assert anonymous.has_users() is True
+    assert status_of(anonymous.list_books) == 401
+    assert status_of(anonymous.import_books, [{"title": "A", "author": "B", "category": "C"}]) == 401
+    anonymous.token = "gia-mao"
+    assert status_of(anonymous.list_books) == 401
+
+
+def test_admin_only_routes(accounts):
+    rows = [{"id": "nhap-1", "title": "Sách nhập", "author": "Tác giả", "category": "Chung", "status": "available",
+             "copies": ["nhap-1-1"], "available": 1}]
+    for name in ("an", "thuthu"):
+        assert status_of(accounts[name].import_books, rows) == 403
+        assert status_of(accounts[name].import_borrows, []) == 403
+        assert status_of(accounts[name].request, "POST", "/debug/profile", None, {}) == 403
+    assert accounts["quantri"].import_books(rows) == 1
+
+
+def test_staff_roles_need_admin_to_register(connect, accounts):
+    assert status_of(connect().register, "gia", "mat-khau", "admin", "G", "0900", "g@x.vn", "HN") == 403
+    assert status_of(accounts["an"].register, "gia", "mat-khau", "thuthu", "G", "0900", "g@x.vn", "HN") == 403
+
+
+def test_reader_acts_only_for_self(accounts):
+    book = accounts["thuthu"].add_book("Dế Mèn", "Tô Hoài", "Văn học", 2)
+    an, binh = accounts["an"], accounts["binh"]
+    assert status_of(an.add_book, "A", "B", "C", 1) == 403
+    assert status_of(an.borrow_book, book["id"], "binh") == 403
+
+    borrow = an.borrow_book(book["id"], "an")
+    assert borrow["username"] == "an"
+    assert [b["id"] for b in binh.list_borrows(0, 50, None)["items"]] == []
+    assert status_of(binh.list_borrows, 0, 50, "an") == 403
+    assert status_of(binh.return_book, borrow["id"]) == 403
+    assert len(accounts["thuthu"].list_borrows(0, 50, None)["items"]) == 1
+
+    # Thủ thư cho mượn thay độc giả tại quầy
+    assert accounts["thuthu"].borrow_book(book["id"], "binh")["username"] == "binh"
+    an.return_book(borrow["id"])
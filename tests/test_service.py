@@ -0,0 +1,224 @@
+from datetime import date, timedelta
+
+import pytest
+
+import service as service_module
+from service import LibraryService, ServiceError
+from storage import open_storage
+
+BACKENDS = ("json", "journal", "sqlite")
+
+
+@pytest.fixture(params=BACKENDS)
+def open_service(request, tmp_path):
+    # Nhiều LibraryService trên cùng một kho, như nhiều quầy/tiến trình dùng chung thư mục dữ liệu
+    services = []
+
+    def open_service():
+        service = LibraryService(open_storage(request.param, str(tmp_path)))
+        services.append(service)
+        return service
+
+    yield open_service
+    for service in services:
+        service.close()
+
+
+def race_before_commit(service, write):
+    # Chạy write() (quầy khác ghi) ngay trước lần commit đầu tiên của service, sau khi nó đã sync và sửa catalog
+    commit = service.storage.commit
+    raced = []
+
+    def racing(catalog, changes):
+        if not raced:
+            raced.append(True)
+            write()
+        return commit(catalog, changes)
+
+    service.storage.commit = racing
+    return raced
+
+
+def test_conflict_loser_gets_fresh_answer(open_service):
+    first, second = open_service(), open_service()
+    book = first.add_book("Dế Mèn", "Tô Hoài", "Văn học", 1)
+    raced = race_before_commit(second, lambda: first.borrow_book(book["id"], "binh"))
+    second.refresh()
+
+    with pytest.raises(ServiceError) as error:
+        second.borrow_book(book["id"], "an")
+    assert raced and error.value.status == 409
+    assert [b["username"] for b in second.list_borrows(0, 10)["items"]] == ["binh"]
+    assert second.get_book(book["id"])["available"] == 0
+
+
+def test_conflict_is_retried_on_fresh_data(open_service):
+    first, second = open_service(), open_service()
+    book = first.add_book("Dế Mèn", "Tô Hoài", "Văn học", 2)
+    raced = race_before_commit(second, lambda: first.borrow_book(book["id"], "binh"))
+    second.refresh()
+
+    borrow = second.borrow_book(book["id"], "an")
+    assert raced and borrow["username"] == "an"
+
+    third = open_service()
+    borrows = third.list_borrows(0, 10)["items"]
+    assert sorted(b["username"] for b in borrows) == ["an", "binh"]
+    assert len({b["copy_id"] for b in borrows}) == 2
+    assert third.get_book(book["id"])["available"] == 0
+
+
+def test_failed_save_rolls_back_catalog(open_service):
+    service = open_service()
+    book = service.add_book("Dế Mèn", "Tô Hoài", "Văn học", 1)
+    commit = service.storage.commit
+
+    def broken(catalog, changes):
+        raise OSError("đầy đĩa")
+
+    service.storage.commit = broken
+    with pytest.raises(OSError):
+        service.borrow_book(book["id"], "an")
+    assert service.get_book(book["id"])["available"] == 1
+    assert service.list_borrows(0, 10)["total"] == 0
+
+    service.storage.commit = commit
+    service.edit_book(book["id"], "Dế Mèn phiêu lưu ký", "Tô Hoài", "Văn học")
+    reopened = open_service()
+    assert reopened.list_borrows(0, 10)["total"] == 0
+    assert reopened.get_book(book["id"])["title"] == "Dế Mèn phiêu lưu ký"
+
+
+def test_failed_operation_leaves_no_pending_changes(open_service):
+    service = open_service()
+    book = service.add_book("Dế Mèn", "Tô Hoài", "Văn học", 1)
+
+    def half_done():
+        service.catalog.update_book(book["id"], title="Sửa dở")
+        raise ServiceError("Dữ liệu không hợp lệ.")
+
+    with pytest.raises(ServiceError):
+        service.mutate(half_done)
+    assert service.get_book(book["id"])["title"] == "Dế Mèn"
+    service.add_book("Khác", "Ai đó", "Chung", 1)
+    assert open_service().get_book(book["id"])["title"] == "Dế Mèn"
+
+
+def test_cannot_reserve_a_book_already_on_loan(open_service):
+    service = open_service()
+    book = service.add_book("Dế Mèn", "Tô Hoài", "Văn học", 1)
+    borrow = service.borrow_book(book["id"], "an")
+    with pytest.raises(ServiceError) as error:
+        service.reserve_book(book["id"], "an")
+    assert error.value.status == 409
+    assert service.reserve_book(book["id"], "binh")["position"] == 1
+
+    service.return_book(borrow["id"])
+    service.borrow_book(book["id"], "binh")
+    assert service.reserve_book(book["id"], "an")["position"] == 1
+
+
+def test_search_returns_category_facets(open_service):
+    service = open_service()
+    service.add_book("Lập trình Python", "An", "Tin học")
+    service.add_book("Python cho trẻ em", "Bình", "Thiếu nhi")
+    service.add_book("Lập trình C", "Chi", "Tin học")
+    page = service.search_books("python", "Tin học", 0, 10)
+    assert page["total"] == 1
+    # Bộ đếm thể loại không bị thu hẹp bởi bộ lọc đang chọn
+    assert page["facets"] == {"Tin học": 1, "Thiếu nhi": 1}
+    assert service.search_books("", None, 0, 10)["facets"] == {"Tin học": 2, "Thiếu nhi": 1}
+    service.add_book("Python nâng cao", "Dũng", "Tin học")
+    assert service.search_books("python", None, 0, 10)["facets"] == {"Tin học": 2, "Thiếu nhi": 1}
+
+
+def test_search_cache_is_dropped_when_catalog_changes(open_service):
+    service = open_service()
+    book = service.add_book("Lập trình Python", "An", "Tin học")
+    ids = lambda term: [b["id"] for b in service.search_books(term, None, 0, 10)["items"]]
+    assert ids("python") == [book["id"]]
+    assert ("python", None) in service.search_cache
+
+    added = service.add_book("Python nâng cao", "Bình", "Tin học")
+    assert sorted(ids("python")) == sorted([book["id"], added["id"]])
+    service.edit_book(book["id"], "Lập trình Java", "An", "Tin học")
+    assert ids("python") == [added["id"]] and ids("java") == [book["id"]]
+    service.delete_book(added["id"])
+    assert ids("python") == []
+
+
+def test_search_cache_evicts_least_recently_used(open_service, monkeypatch):
+    monkeypatch.setattr(service_module, "SEARCH_CACHE_SIZE", 4)
+    service = open_service()
+    service.add_book("Lập trình Python", "An", "Tin học")
+    # Mỗi từ khóa chiếm hai mục: kết quả và bộ đếm thể loại; dùng lại "lap" để "python" thành cũ nhất
+    for term in ("lap", "python", "lap", "trinh"):
+        service.search_books(term, None, 0, 10)
+    assert list(service.search_cache) == [("lap", None), ("lap", service_module.FACETS),
+                                          ("trinh", None), ("trinh", service_module.FACETS)]
+
+def test_charts_render_outside_service_lock(open_service):
+    from test_users import lock_free_from_other_thread
+
+    service = open_service()
+    book = service.add_book("Dế Mèn", "Tô Hoài", "Văn học", 1)
+    service.borrow_book(book["id"], "an")
+    seen = []
+    for aggregator in (service.stats_aggregator, service.borrow_analytics):
+        render = aggregator.render_chart
+        aggregator.render_chart = lambda *args, render=render: seen.append(
+            lock_free_from_other_thread(service.lock)) or render(*args)
+    assert service.stats_chart(300, 200).startswith(b"\x89PNG")
+    assert service.analytics_chart(None, None, 300, 200).startswith(b"\x89PNG")
+    assert seen == [True, True]
+    # Lần sau lấy từ bộ đệm, không vẽ lại
+    service.stats_chart(300, 200)
+    assert len(seen) == 2
+
+
+def test_returned_copy_is_held_for_next_reader_in_line(open_service):
+    service = open_service()
+    book = service.add_book("Dế Mèn", "Tô Hoài", "Văn học", 1)
+    loan = service.borrow_book(book["id"], "an")
+    assert service.reserve_book(book["id"], "binh")["position"] == 1
+    assert service.reserve_book(book["id"], "chi")["position"] == 2
+
+    assert service.return_book(loan["id"])["held_for"] == "binh"
+    held = service.get_book(book["id"])
+    assert held["holds"] == {"binh": loan["copy_id"]} and list(held["reservations"]) == ["chi"]
+    # Bản đang giữ không cho người khác mượn, kể cả người xếp sau
+    for username in ("an", "chi"):
+        with pytest.raises(ServiceError):
+            service.borrow_book(book["id"], username)
+
+    borrow = service.borrow_book(book["id"], "binh")
+    assert borrow["copy_id"] == loan["copy_id"]
+    assert service.get_book(book["id"])["holds"] == {}
+    assert service.return_book(borrow["id"])["held_for"] == "chi"
+
+
+def test_catalog_reservation_on_unknown_book():
+    from catalog import Catalog
+
+    catalog = Catalog()
+    catalog.load([], [])
+    assert catalog.reserve("khong-co", "an") is None
+    assert catalog.cancel_reservation("khong-co", "an") is False
+
+
+def test_reminders_follow_borrow_and_return(open_service):
+    service = open_service()
+    book = service.add_book("Dế Mèn", "Tô Hoài", "Văn học", 3)
+    first = service.borrow_book(book["id"], "an", loan_days=1)
+    second = service.borrow_book(book["id"], "an", loan_days=5)
+    later = (date.today() + timedelta(days=3)).isoformat()
+
+    [batch] = service.reminders(within_days=2, today=later)
+    assert [v["id"] for v in batch["overdue"]] == [first["id"]]
+    assert [v["id"] for v in batch["due_soon"]] == [second["id"]]
+
+    service.return_book(first["id"])
+    third = service.borrow_book(book["id"], "binh", loan_days=4)
+    batches = {b["username"]: b for b in service.reminders(within_days=2, today=later)}
+    assert batches["an"]["overdue"] == [] and [v["id"] for v in batches["an"]["due_soon"]] == [second["id"]]
+    assert [v["id"] for v in batches["binh"]["due_soon"]] == [third["id"]]
@@ -0,0 +1,111 @@
+import pytest
+
+from service import ServiceError
+from shards import ShardedService, branch_of, merge_reports, split_catalog
+from storage import open_storage, write_catalog
+
+BRANCHES = ["q1", "q3"]
+
+
+def book(book_id, title, category="Chung", **more):
+    return dict({"id": book_id, "title": title, "author": "Tác giả", "category": category, "status": "available",
+                 "copies": [book_id], "available": 1}, **more)
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    # Hai chi nhánh, mỗi chi nhánh một thư mục tạm; người dùng ở kho chung riêng
+    service = ShardedService(BRANCHES, None, lambda branch: open_storage("json", str(tmp_path / branch)),
+                             users_storage=open_storage("json", str(tmp_path / "chung")))
+    yield service
+    service.close()
+
+
+def test_split_catalog_follows_branch_field_and_book_home(tmp_path):
+    books = [book(f"s{i}", f"Sách {i}") for i in range(10)] + [book("ghim", "Sách ghim", branch="q3")]
+    borrows = [{"id": f"m-{b['id']}", "book_id": b["id"], "copy_id": b["id"], "username": "an",
+                "borrow_date": "2024-01-01", "due_date": "2024-01-15", "returned": False} for b in books]
+    source = open_storage("json", str(tmp_path / "chung"))
+    write_catalog(source, books, borrows)
+    open_branch = lambda branch: open_storage("json", str(tmp_path / branch))
+
+    counts = split_catalog(source, BRANCHES, open_branch)
+    assert [branch for branch, _, _ in counts] == BRANCHES
+    assert sum(n for _, n, _ in counts) == 11 and sum(n for _, _, n in counts) == 11
+    for branch in BRANCHES:
+        target = open_branch(branch)
+        branch_books, branch_borrows = target.load()
+        target.close()
+        ids = {b["id"] for b in branch_books}
+        assert ids == {b["id"] for b in books if b.get("branch", branch_of(b["id"], BRANCHES)) == branch}
+        assert {b["book_id"] for b in branch_borrows} == ids
+    assert "ghim" in ids
+    # Kho chi nhánh đã có dữ liệu thì không ghi đè
+    with pytest.raises(ValueError):
+        split_catalog(source, BRANCHES, open_branch)
+    source.close()
+
+
+def test_concat_page_offsets_span_branches(sharded):
+    for i in range(3):
+        sharded.add_book(f"Q1 sách {i}", "A", "Chung", branch="q1")
+    for i in range(2):
+        sharded.add_book(f"Q3 sách {i}", "A", "Chung", branch="q3")
+    everything = sharded.list_books(0, 10)
+    assert everything["total"] == 5
+    assert [b["branch"] for b in everything["items"]] == ["q1"] * 3 + ["q3"] * 2
+    page = sharded.list_books(2, 2)
+    assert page["total"] == 5 and page["items"] == everything["items"][2:4]
+    assert sharded.list_books(4, 10)["items"] == everything["items"][4:]
+    assert sharded.list_books(5, 10)["items"] == []
+
+
+def test_sorted_page_merges_branches_in_order(sharded):
+    for title, branch in [("Cam", "q1"), ("An", "q3"), ("Dừa", "q3"), ("Bưởi", "q1"), ("Ổi", "q1")]:
+        sharded.add_book(title, "A", "Chung", branch=branch)
+    titles = lambda page: [(b["title"], b["branch"]) for b in page["items"]]
+    assert titles(sharded.list_books(1, 3, "title")) == [("Bưởi", "q1"), ("Cam", "q1"), ("Dừa", "q3")]
+    assert titles(sharded.list_books(0, 2, "title", reverse=True)) == [("Ổi", "q1"), ("Dừa", "q3")]
+    assert sharded.list_books(0, 2, "title")["total"] == 5
+
+
+def test_writes_go_to_owning_branch(sharded):
+    here = sharded.add_book("Dế Mèn", "Tô Hoài", "Văn học", branch="q3")
+    assert here["branch"] == "q3" and sharded.owner("book", here["id"])[0] == "q3"
+    borrow = sharded.borrow_book(here["id"], "an")
+    assert sharded.get_borrow(borrow["id"])["branch"] == "q3"
+    assert sharded.shard("q1").catalog.get_borrow(borrow["id"]) is None
+    sharded.return_book(borrow["id"])
+    assert sharded.shard("q3").get_book(here["id"])["available"] == 1
+    with pytest.raises(ServiceError) as error:
+        sharded.owner("book", "khong-co")
+    assert error.value.status == 404
+    with pytest.raises(ServiceError):
+        sharded.add_book("Lạc", "A", "Chung", branch="q9")
+
+
+def test_search_merges_facets_across_branches(sharded):
+    sharded.add_book("Lập trình Python", "An", "Tin học", branch="q1")
+    sharded.add_book("Python cho trẻ em", "Bình", "Thiếu nhi", branch="q3")
+    sharded.add_book("Python nâng cao", "Chi", "Tin học", branch="q3")
+    page = sharded.search_books("python", "Tin học", 0, 10)
+    assert page["total"] == 2 and {b["branch"] for b in page["items"]} == {"q1", "q3"}
+    assert page["facets"] == {"Tin học": 2, "Thiếu nhi": 1}
+
+
+def test_merge_reports_sums_counts_and_reranks_readers():
+    def report(per_day, top_titles, loan_days, timed, late, judged):
+        return {"version": 1, "start": None, "end": None, "total": sum(n for _, n in per_day),
+                "per_day": per_day, "per_week": [("2024-01-01", sum(n for _, n in per_day))],
+                "top_titles": top_titles, "timed_loans": timed, "loan_days": loan_days, "late_loans": late,
+                "judged_loans": judged}
+
+    q1 = report([("2024-01-01", 2), ("2024-01-02", 1)], [{"title": "A", "count": 3}], 10, 2, 1, 3)
+    q3 = report([("2024-01-02", 4)], [{"title": "B", "count": 4}], 20, 3, 0, 2)
+    merged = merge_reports([q1, q3], [{"an": 2, "binh": 1}, {"binh": 3, "chi": 1}])
+    assert merged["total"] == 7 and merged["version"] == (1, 1)
+    assert merged["per_day"] == [("2024-01-01", 2), ("2024-01-02", 5)]
+    assert merged["per_week"] == [("2024-01-01", 7)]
+    assert [t["title"] for t in merged["top_titles"]] == ["B", "A"]
+    assert merged["top_readers"][0] == {"username": "binh", "count": 4}
+    assert merged["avg_loan_days"] == 6.0 and merged["overdue_rate"] == 0.2
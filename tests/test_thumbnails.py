@@ -0,0 +1,50 @@
+import io
+
+from PIL import Image
+
+from metrics import REGISTRY
+from thumbnails import ThumbnailCache, ThumbnailLoader
+
+
+def jpeg(size=(120, 180)):
+    out = io.BytesIO()
+    Image.new("RGB", size, (200, 40, 40)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+def test_cache_is_content_addressed(tmp_path):
+    cache = ThumbnailCache(str(tmp_path))
+    key = cache.put(jpeg())
+    assert cache.put(jpeg()) == key
+    assert cache.get(key) == jpeg()
+    assert cache.get("../" + key) is None
+    assert cache.get("0" * 64) is None
+
+
+def test_loader_reports_broken_image_through_ready_queue():
+    data = {"a" * 64: b"khong phai anh", "b" * 64: jpeg()}
+    loader = ThumbnailLoader(None, data.get, lambda: None, size=(32, 48))
+    errors = REGISTRY.histogram("thumbnails.load_error").summary()["count"]
+    try:
+        loader.load("a" * 64)
+        loader.load("b" * 64)
+    finally:
+        loader.close()
+    assert loader.ready.get_nowait() == ("a" * 64, None)
+    key, image = loader.ready.get_nowait()
+    assert key == "b" * 64 and max(image.size) <= 48
+    assert REGISTRY.histogram("thumbnails.load_error").summary()["count"] == errors + 1
+
+
+def test_loader_always_answers_even_when_fetch_fails():
+    def fetch(key):
+        raise RuntimeError("mat ket noi")
+
+    loader = ThumbnailLoader(None, fetch, lambda: None)
+    try:
+        loader.load("c" * 64)
+    except RuntimeError:
+        pass
+    finally:
+        loader.close()
+    assert loader.ready.get_nowait() == ("c" * 64, None)
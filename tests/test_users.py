@@ -0,0 +1,87 @@
+import threading
+
+import users
+from users import UserDirectory, hash_password, verify_password
+
+
+class MemoryStorage:
+    def __init__(self, initial=()):
+        self.saved = list(initial)
+
+    def load_users(self):
+        return list(self.saved)
+
+    def save_user(self, user):
+        self.saved.append(dict(user))
+
+
+def lock_free_from_other_thread(lock):
+    result = []
+
+    def probe():
+        acquired = lock.acquire(timeout=0)
+        if acquired:
+            lock.release()
+        result.append(acquired)
+
+    thread = threading.Thread(target=probe)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_register_and_authenticate():
+    directory = UserDirectory(MemoryStorage())
+    assert directory.register("an", "mat-khau", role="docgia")["role"] == "docgia"
+    assert directory.register("an", "khac") is None
+    assert directory.authenticate("an", "mat-khau")["username"] == "an"
+    assert directory.authenticate("an", "sai") is None
+
+
+def test_unknown_user_still_spends_a_password_check(monkeypatch):
+    checked = []
+    real_verify = users.verify_password
+    monkeypatch.setattr(users, "verify_password", lambda pw, stored: checked.append(stored) or real_verify(pw, stored))
+    directory = UserDirectory(MemoryStorage())
+    assert directory.authenticate("khong-co", "") is None
+    assert checked == [users.dummy_hash()]
+
+
+def test_hashing_runs_outside_the_directory_lock(monkeypatch):
+    lock = threading.RLock()
+    directory = UserDirectory(MemoryStorage(), lock)
+    seen = []
+    real_hash = users.hash_password
+    real_verify = users.verify_password
+
+    def hash_unlocked(pw, scheme=None):
+        seen.append(lock_free_from_other_thread(lock))
+        return real_hash(pw, scheme)
+
+    def verify_unlocked(pw, stored):
+        seen.append(lock_free_from_other_thread(lock))
+        return real_verify(pw, stored)
+
+    monkeypatch.setattr(users, "hash_password", hash_unlocked)
+    monkeypatch.setattr(users, "verify_password", verify_unlocked)
+    with lock:
+        pass
+    directory.register("binh", "mat-khau")
+    directory.authenticate("binh", "mat-khau")
+    assert seen and all(seen)
+
+
+def test_legacy_md5_hash_is_upgraded_on_login():
+    import hashlib
+
+    storage = MemoryStorage([{"username": "cu", "password": hashlib.md5(b"123").hexdigest()}])
+    directory = UserDirectory(storage)
+    assert directory.authenticate("cu", "123") is not None
+    upgraded = directory.get("cu")["password"]
+    assert upgraded.startswith(("scrypt$", "pbkdf2_sha256$"))
+    assert storage.saved[-1]["password"] == upgraded
+    assert verify_password("123", upgraded) == (True, False)
+
+
+def test_hash_password_is_salted():
+    assert hash_password("x") != hash_password("x")
@@ -0,0 +1,140 @@
+# Ảnh bìa thu nhỏ: kho trên đĩa đánh địa chỉ theo mã băm nội dung (ảnh giống nhau chỉ lưu một lần, không bao giờ
+# cần làm mới), hàm thu nhỏ chạy được trong tiến trình con, và bộ nạp nền cho các dòng đang hiện trên bảng
+import hashlib
+import io
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ROW_THUMBNAIL_SIZE, THUMBNAIL_DIR, THUMBNAIL_SIZE
+from metrics import REGISTRY
+
+KEY_RE = re.compile(r"[0-9a-f]{64}$")
+PHOTO_CACHE_SIZE = 256
+
+
+def make_thumbnail(data, size=THUMBNAIL_SIZE):
+    # Chạy trong ProcessPoolExecutor: nhận byte ảnh gốc, trả về JPEG đã thu nhỏ
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        # draft() để bộ giải mã JPEG bỏ bớt điểm ảnh ngay khi đọc, nhanh hơn nhiều so với giải mã đủ rồi thu nhỏ
+        img.draft("RGB", size)
+        img = img.convert("RGB")
+        img.thumbnail(size, Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=85, optimize=True)
+    return out.getvalue()
+
+
+class ThumbnailCache:
+    def __init__(self, directory=THUMBNAIL_DIR):
+        self.directory = directory
+
+    def path(self, key):
+        # Chia thư mục theo hai ký tự đầu để mỗi thư mục không quá nhiều file
+        return os.path.join(self.directory, key[:2], key + ".jpg")
+
+    def put(self, data):
+        key = hashlib.sha256(data).hexdigest()
+        path = self.path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return key
+
+    def get(self, key):
+        if not KEY_RE.match(key or ""):
+            return None
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+class ThumbnailLoader:
+    # photo(key) trả về PhotoImage nếu đã nạp, nếu chưa thì xếp hàng nạp ở luồng nền và trả về None;
+    # khi có ảnh mới, on_ready() được gọi trên luồng Tk để bảng vẽ lại các dòng đang hiện
+    def __init__(self, root, fetch, on_ready, size=ROW_THUMBNAIL_SIZE, workers=2, poll=50):
+        self.root = root
+        self.fetch = fetch
+        self.on_ready = on_ready
+        self.size = size
+        self.poll_ms = poll
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail-loader")
+        self.photos = OrderedDict()
+        self.pending = set()
+        self.missing = set()
+        self.ready = queue.Queue()
+        self.polling = False
+
+    def photo(self, key):
+        if not key or key in self.missing:
+            return None
+        photo = self.photos.get(key)
+        if photo is not None:
+            self.photos.move_to_end(key)
+            return photo
+        if key not in self.pending:
+            self.pending.add(key)
+            self.pool.submit(self.load, key)
+            if not self.polling:
+                self.polling = True
+                self.root.after(self.poll_ms, self.poll)
+        return None
+
+    def load(self, key):
+        # Luồng nền: tải và giải mã; PhotoImage chỉ được tạo trên luồng Tk
+        from PIL import Image
+
+        start = time.perf_counter()
+        image = None
+        try:
+            data = self.fetch(key)
+            if data:
+                decoded = Image.open(io.BytesIO(data))
+                decoded.thumbnail(self.size)
+                decoded.load()
+                image = decoded
+            REGISTRY.observe("thumbnails.load", time.perf_counter() - start)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Ảnh hỏng/không đọc được: đếm trong số liệu "thumbnails.load_error", dòng đó hiện không có ảnh
+            REGISTRY.observe("thumbnails.load_error", time.perf_counter() - start)
+        finally:
+            # Luôn trả kết quả về luồng Tk, kể cả lỗi ngoài dự kiến, để khóa không kẹt mãi trong pending
+            self.ready.put((key, image))
+
+    def poll(self):
+        from PIL import ImageTk
+
+        loaded = False
+        try:
+            while True:
+                key, image = self.ready.get_nowait()
+                self.pending.discard(key)
+                if image is None:
+                    self.missing.add(key)
+                    continue
+                self.photos[key] = ImageTk.PhotoImage(image)
+                if len(self.photos) > PHOTO_CACHE_SIZE:
+                    self.photos.popitem(last=False)
+                loaded = True
+        except queue.Empty:
+            pass
+        if loaded:
+            self.on_ready()
+        if self.pending:
+            self.root.after(self.poll_ms, self.poll)
+        else:
+            self.polling = False
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
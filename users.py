@@ -0,0 +1,95 @@
+# Danh bạ người dùng: nạp một lần, tra cứu theo tên đăng nhập, mật khẩu băm có muối
+import hashlib
+import hmac
+import os
+import threading
+from functools import lru_cache
+
+from config import PASSWORD_SCHEME, PBKDF2_ITERATIONS, SCRYPT_N, SCRYPT_P, SCRYPT_R
+
+
+def hash_password(pw, scheme=None):
+    scheme = scheme or PASSWORD_SCHEME
+    salt = os.urandom(16)
+    if scheme == "scrypt" and hasattr(hashlib, "scrypt"):
+        digest = _scrypt(pw, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+    digest = hashlib.pbkdf2_hmac("sha256", pw.encode(), salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${salt.hex()}${digest.hex()}"
+
+
+def _scrypt(pw, salt, n, r, p):
+    return hashlib.scrypt(pw.encode(), salt=salt, n=n, r=r, p=p, maxmem=128 * n * r * p + 1024 * 1024)
+
+
+def verify_password(pw, stored, scheme=None):
+    # Trả về (đúng mật khẩu, cần băm lại theo cấu hình hiện tại)
+    scheme = scheme or PASSWORD_SCHEME
+    parts = stored.split("$")
+    if parts[0] == "scrypt":
+        n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+        digest = _scrypt(pw, bytes.fromhex(parts[4]), n, r, p)
+        ok = hmac.compare_digest(digest.hex(), parts[5])
+        outdated = scheme != "scrypt" or (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    elif parts[0] == "pbkdf2_sha256":
+        iterations = int(parts[1])
+        digest = hashlib.pbkdf2_hmac("sha256", pw.encode(), bytes.fromhex(parts[2]), iterations)
+        ok = hmac.compare_digest(digest.hex(), parts[3])
+        outdated = scheme != "pbkdf2_sha256" or iterations != PBKDF2_ITERATIONS
+    else:
+        # Mật khẩu cũ: MD5 không muối
+        ok = hmac.compare_digest(hashlib.md5(pw.encode()).hexdigest(), stored)
+        outdated = True
+    return ok, ok and outdated
+
+
+@lru_cache(maxsize=None)
+def dummy_hash(scheme=None):
+    # Băm giả để tên đăng nhập không tồn tại vẫn tốn đúng một lần kiểm tra: thời gian phản hồi không lộ tài khoản nào có
+    return hash_password("", scheme)
+
+
+class UserDirectory:
+    # lock chỉ bảo vệ danh bạ và kho lưu trữ (LibraryService truyền khóa của mình vào);
+    # băm/kiểm tra mật khẩu tốn hàng chục ms nên luôn chạy ngoài khóa
+    def __init__(self, storage, lock=None):
+        self.storage = storage
+        self.lock = lock or threading.RLock()
+        self.users = {user["username"]: user for user in storage.load_users()}
+
+    def __len__(self):
+        return len(self.users)
+
+    def get(self, username):
+        return self.users.get(username)
+
+    def exists(self, username):
+        return username in self.users
+
+    def register(self, username, password, **fields):
+        if username in self.users:
+            return None
+        user = {"username": username, "password": hash_password(password)}
+        user.update(fields)
+        with self.lock:
+            # Kiểm tra lại: luồng khác có thể vừa đăng ký cùng tên trong lúc ta băm
+            if username in self.users:
+                return None
+            self.users[username] = user
+            self.storage.save_user(user)
+        return user
+
+    def authenticate(self, username, password):
+        with self.lock:
+            user = self.users.get(username)
+            stored = user["password"] if user is not None else dummy_hash()
+        ok, needs_upgrade = verify_password(password, stored)
+        if user is None or not ok:
+            return None
+        if needs_upgrade:
+            upgraded = hash_password(password)
+            with self.lock:
+                if user["password"] == stored:
+                    user["password"] = upgraded
+                    self.storage.save_user(user)
+        return user
@@ -0,0 +1,227 @@
+# Bảng ảo: chỉ tạo dòng Treeview cho phần đang hiển thị, dữ liệu lấy theo trang từ nguồn
+from tkinter import ttk
+
+from metrics import timed
+
+
+class ListSource:
+    def __init__(self, keys, render):
+        self.keys = list(keys)
+        self.render = render
+
+    def count(self):
+        return len(self.keys)
+
+    def rows(self, start, stop):
+        return [(key, self.render(key)) for key in self.keys[start:stop]]
+
+    def row(self, key):
+        return self.render(key)
+
+    def sort(self, column, reverse=False):
+        self.keys.sort(key=lambda key: str(self.render(key)[column]).casefold(), reverse=reverse)
+
+    def invalidate(self):
+        pass
+
+
+class PagedSource:
+    # fetch(offset, limit, sort, reverse) -> {"total", "items"}; get(key) -> bản ghi; render(bản ghi) -> giá trị các cột
+    # first: trang đầu đã tải sẵn (vd. ở luồng nền), dùng cho lần vẽ đầu tiên thay vì gọi fetch
+    def __init__(self, fetch, get, render, sort_fields=None, first=None):
+        self.fetch = fetch
+        self.get = get
+        self.render = render
+        self.sort_fields = sort_fields
+        self.sort_field = None
+        self.reverse = False
+        self.first = first
+        self.total = first["total"] if first else None
+
+    def count(self):
+        if self.total is None:
+            self.total = self.fetch(0, 0, self.sort_field, self.reverse)["total"]
+        return self.total
+
+    def rows(self, start, stop):
+        first = self.first
+        if first is not None and start == 0 and (stop <= len(first["items"]) or len(first["items"]) == first["total"]):
+            items = first["items"][:stop]
+        else:
+            page = self.fetch(start, max(0, stop - start), self.sort_field, self.reverse)
+            self.total = page["total"]
+            items = page["items"]
+        return [(item["id"], self.render(item)) for item in items]
+
+    def row(self, key):
+        return self.render(self.get(key))
+
+    def sort(self, column, reverse=False):
+        if self.sort_fields:
+            self.sort_field = self.sort_fields[column]
+            self.reverse = reverse
+            self.first = None
+
+    def invalidate(self):
+        self.total = None
+        self.first = None
+
+
+class VirtualTable(ttk.Frame):
+    # image(key) -> ảnh cho cột đầu dòng hoặc None; chỉ được gọi cho các dòng đang hiện
+    def __init__(self, master, columns, source=None, height=10, buffer=20, width=120, image=None, row_height=None):
+        super().__init__(master)
+        self.image = image
+        self.height = height
+        self.buffer = buffer
+        self.source = source or ListSource([], lambda key: ())
+        self.offset = 0
+        self.window_start = 0
+        self.window_rows = None
+        self.slot_keys = {}
+        self.current_key = None
+        self.sort_column = None
+        self.sort_reverse = False
+
+        options = {}
+        if row_height:
+            ttk.Style().configure(f"Rows{row_height}.Treeview", rowheight=row_height)
+            options["style"] = f"Rows{row_height}.Treeview"
+        self.tree = ttk.Treeview(self, columns=columns, show="tree headings" if image else "headings", height=height,
+                                 selectmode="browse", **options)
+        if image:
+            self.tree.column("#0", width=(row_height or 20) + 8, stretch=False)
+        for i, col in enumerate(columns):
+            self.tree.heading(col, text=col, command=lambda c=i: self.sort_by(c))
+            self.tree.column(col, width=width)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.height))
+        self.tree.bind("<Next>", lambda e: self.scroll(self.height))
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0))
+        self.tree.bind("<End>", lambda e: self.scroll_to(self.source.count()))
+
+        self.render()
+
+    # --- Nguồn dữ liệu ---
+
+    @property
+    def page_size(self):
+        # Số dòng lần vẽ đầu tiên lấy từ nguồn: phần nhìn thấy cộng vùng đệm
+        return self.height + self.buffer
+
+    def set_source(self, source):
+        self.source = source
+        self.offset = 0
+        if self.sort_column is not None:
+            self.source.sort(self.sort_column, self.sort_reverse)
+        # Nguồn mới chưa có gì để bỏ: không gọi invalidate để giữ trang đầu tải sẵn (nếu có)
+        self.window_rows = None
+        self.current_key = None
+        self.render()
+
+    def refresh(self):
+        # Số dòng thay đổi (thêm/xóa): bỏ bộ đệm, chỉ vẽ lại phần nhìn thấy
+        self.source.invalidate()
+        self.window_rows = None
+        self.current_key = None
+        self.render()
+
+    def refresh_rows(self, keys):
+        keys = set(keys)
+        if self.window_rows is not None:
+            for i, (key, _) in enumerate(self.window_rows):
+                if key in keys:
+                    self.window_rows[i] = (key, self.source.row(key))
+        self.render()
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self.source.sort(column, self.sort_reverse)
+        self.offset = 0
+        self.refresh()
+
+    def selected_key(self):
+        return self.current_key
+
+    def on_select(self, event):
+        selected = self.tree.selection()
+        if selected:
+            self.current_key = self.slot_keys.get(selected[0])
+
+    # --- Cuộn ---
+
+    def scroll(self, rows):
+        self.scroll_to(self.offset + rows)
+        return "break"
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, self.source.count() - self.height))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+        return "break"
+
+    def on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.source.count()))
+        elif unit == "pages":
+            self.scroll(int(amount) * self.height)
+        else:
+            self.scroll(int(amount))
+
+    # --- Vẽ ---
+
+    def visible_rows(self):
+        count = self.source.count()
+        self.offset = max(0, min(self.offset, count - self.height))
+        stop = min(count, self.offset + self.height)
+        window = self.window_rows
+        if window is None or self.offset < self.window_start or stop > self.window_start + len(window):
+            self.window_start = max(0, self.offset - self.buffer)
+            self.window_rows = self.source.rows(self.window_start, stop + self.buffer)
+        begin = self.offset - self.window_start
+        return self.window_rows[begin:begin + stop - self.offset]
+
+    @timed("table.render")
+    def render(self):
+        rows = self.visible_rows()
+        self.slot_keys = {}
+        for i in range(self.height):
+            slot = f"row{i}"
+            if i < len(rows):
+                key, values = rows[i]
+                self.slot_keys[slot] = key
+                options = {"values": values}
+                if self.image is not None:
+                    options["image"] = self.image(key) or ""
+                if self.tree.exists(slot):
+                    self.tree.item(slot, **options)
+                else:
+                    self.tree.insert("", "end", iid=slot, **options)
+                if key == self.current_key:
+                    self.tree.selection_set(slot)
+                elif slot in self.tree.selection():
+                    self.tree.selection_remove(slot)
+            elif self.tree.exists(slot):
+                self.tree.delete(slot)
+
+        count = self.source.count()
+        if count:
+            self.scrollbar.set(self.offset / count, min(1.0, (self.offset + self.height) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)